@@ -0,0 +1,446 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import hashlib
+import numpy
+
+#
+# Exact diagonalization of an isolated atom and its Green's function in the Lehmann representation
+#
+#   G_ab(z) = sum_p R^p_ab / (z - w_p)
+#
+# The spin-orbital index runs as index = spin*norb + orbital, and the Hamiltonian reads
+#
+#   H = sum_ab e_ab c^dag_a c_b + 1/2 sum_{ijkl,ss'} U_ijkl c^dag_is c^dag_js' c_ls' c_ks
+#
+
+
+def level_shift(ealmat):
+    """
+    Uniform shift of the atomic levels (the mean of the diagonal elements).
+    The chemical potential changes only this shift.
+
+    Parameters
+    ----------
+    ealmat : complex array [2*norb, 2*norb]
+        Atomic levels
+
+    Returns
+    -------
+    float
+    """
+    ealmat = numpy.asarray(ealmat)
+    return float(numpy.trace(ealmat).real) / ealmat.shape[0]
+
+
+def cache_key(ealmat, u_mat, beta, decimals=10):
+    """
+    Hash of the parameters of the atomic problem.
+    The uniform shift of the atomic levels (level_shift) is excluded,
+    because it is applied to the Lehmann representation without diagonalization.
+
+    Parameters
+    ----------
+    ealmat : complex array [2*norb, 2*norb]
+        Atomic levels
+    u_mat : array [norb, norb, norb, norb]
+        Coulomb interaction
+    beta : float
+        Inverse temperature
+    decimals : int, optional
+        Parameters are rounded to this number of decimals before hashing
+
+    Returns
+    -------
+    string
+    """
+    ealmat = numpy.asarray(ealmat, dtype=numpy.complex_)
+    ealmat = ealmat - level_shift(ealmat) * numpy.identity(ealmat.shape[0])
+    h = hashlib.sha1()
+    for x in [ealmat, u_mat, beta]:
+        # Adding 0.0 turns -0.0 into 0.0
+        h.update((numpy.round(numpy.asarray(x, dtype=numpy.complex_), decimals) + 0.0).tobytes())
+    return h.hexdigest()
+
+
+def _popcount(states, n_bits):
+    count = numpy.zeros(states.shape, dtype=int)
+    for i in range(n_bits):
+        count += (states >> i) & 1
+    return count
+
+
+class _FockSpace(object):
+    """
+    Fock space of n_so spin-orbitals divided into sectors of conserved quantum numbers
+    (the particle number, or the particle numbers of each spin if spin_conserved),
+    and the action of the creation/annihilation operators between the sectors
+    """
+
+    def __init__(self, n_so, spin_conserved):
+        self.n_so = n_so
+        norb = n_so // 2
+        all_states = numpy.arange(2**n_so, dtype=numpy.int64)
+        n_up = _popcount(all_states & ((1 << norb) - 1), norb)
+        n_dn = _popcount(all_states >> norb, n_so - norb)
+        if spin_conserved:
+            labels = list(zip(n_up, n_dn))
+        else:
+            labels = list(zip(n_up + n_dn))
+        self.labels = sorted(set(labels))
+        label_index = dict((label, isec) for isec, label in enumerate(self.labels))
+        sector_of_state = numpy.array([label_index[label] for label in labels])
+        self.states = [all_states[sector_of_state == isec] for isec in range(len(self.labels))]
+        self.n_particles = [int(numpy.sum(label)) for label in self.labels]
+
+        # cdag[isec][a] = (sector of c^dag_a|s>, its index in that sector, sign) for each state s in the sector isec
+        # c[isec][a]    = (sector of c_a|s>, ...)
+        # The sector is -1 if c^dag_a (c_a) always vanishes, and the index is -1 for vanishing states.
+        self.cdag = []
+        self.c = []
+        for states in self.states:
+            cdag_sec = []
+            c_sec = []
+            for a in range(n_so):
+                occupied = ((states >> a) & 1) == 1
+                sign = 1 - 2 * (_popcount(states & ((1 << a) - 1), a) % 2)
+                target = states ^ (1 << a)
+                for table, mask in [(cdag_sec, ~occupied), (c_sec, occupied)]:
+                    idx = -numpy.ones(len(states), dtype=int)
+                    if numpy.any(mask):
+                        target_sec = sector_of_state[target[mask][0]]
+                        idx[mask] = numpy.searchsorted(self.states[target_sec], target[mask])
+                    else:
+                        target_sec = -1
+                    table.append((target_sec, idx, sign))
+            self.cdag.append(cdag_sec)
+            self.c.append(c_sec)
+
+    def apply_string(self, ops, isec):
+        """
+        Matrix elements of a product of operators starting from the sector isec
+
+        Parameters
+        ----------
+        ops : list of (int, bool)
+            (spin-orbital, creation) from left to right
+        isec : int
+            Sector of the initial states
+
+        Returns
+        -------
+        target_sec : int
+            Sector of the final states (-1 if the product vanishes)
+        rows, cols, signs : int arrays
+        """
+        dim = len(self.states[isec])
+        cols = numpy.arange(dim)
+        cur = cols.copy()
+        sign = numpy.ones(dim, dtype=int)
+        valid = numpy.ones(dim, dtype=bool)
+        for a, dag in reversed(ops):
+            target_sec, idx, sgn = self.cdag[isec][a] if dag else self.c[isec][a]
+            if target_sec < 0:
+                return -1, None, None, None
+            safe = numpy.where(valid, cur, 0)
+            cur = idx[safe]
+            sign *= sgn[safe]
+            valid &= cur >= 0
+            isec = target_sec
+        return isec, cur[valid], cols[valid], sign[valid]
+
+    def apply(self, a, dag, isec, vecs):
+        """
+        Apply c^dag_a (dag=True) or c_a (dag=False) to the vectors (columns of vecs) in the sector isec
+        """
+        target_sec, idx, sign = self.cdag[isec][a] if dag else self.c[isec][a]
+        result = numpy.zeros((len(self.states[target_sec]), vecs.shape[1]), dtype=vecs.dtype)
+        valid = idx >= 0
+        result[idx[valid], :] = sign[valid, None] * vecs[valid, :]
+        return result
+
+
+class AtomicLehmann(object):
+    """
+    Green's function of an isolated atom in the Lehmann representation.
+
+    The poles and residues are computed once by the exact diagonalization
+    and the Green's function can be evaluated at any frequencies afterwards.
+
+    A uniform shift of the atomic levels by d (e.g. a change of the chemical potential)
+    shifts the energies by d*N and does not change the eigenstates.
+    Therefore, the residue of each pole is kept as the contributions of the initial (N particles)
+    and the final (N+1 particles) states, with the Boltzmann weights at the reference shift,
+    and the representation can be moved to another shift by set_shift.
+    """
+
+    def __init__(self, key, beta, shift, poles, res_initial, res_final, pole_particles,
+                 energies, n_particles, spin_z, tol=1e-12):
+        self.key = key
+        self.beta = beta
+        # Data at the reference shift of the atomic levels
+        self._shift0 = shift
+        self._poles0 = poles
+        self._res_initial = res_initial
+        self._res_final = res_final
+        self._pole_particles = pole_particles
+        self._energies0 = energies
+        self._spin_z = spin_z
+        self._tol = tol
+        self.n_particles = n_particles
+        self.set_shift(shift)
+
+    def set_shift(self, shift, tol=1e-8):
+        """
+        Move the representation to the atomic levels shifted uniformly by shift (see level_shift).
+
+        The transitions between the states whose Boltzmann weights are negligible at the reference shift
+        have been dropped. If the weight of any of these states exceeds tol (relative to the ground state)
+        at the new shift, nothing is changed.
+
+        Parameters
+        ----------
+        shift : float
+            Uniform shift of the atomic levels
+        tol : float, optional
+            Threshold of the weights of the dropped states
+
+        Returns
+        -------
+        bool
+            False if the representation is not valid at this shift and the diagonalization must be done again
+        """
+        d = shift - self._shift0
+        e0 = self._energies0
+        e = e0 + d * self.n_particles
+        weights0 = numpy.exp(-self.beta * (e0 - numpy.amin(e0)))
+        weights = numpy.exp(-self.beta * (e - numpy.amin(e)))
+        if numpy.any((weights0 <= self._tol) & (weights > tol)):
+            return False
+        z_part = numpy.sum(weights)
+        # Ratio of the new weights to those at the reference shift for each particle number
+        factor = numpy.exp(-self.beta * (d * numpy.arange(numpy.amax(self.n_particles) + 2)
+                                         + numpy.amin(e0) - numpy.amin(e))) / z_part
+        n = self._pole_particles
+        self.shift = shift
+        self.energies = e
+        self.poles = self._poles0 + d
+        self.residues = factor[n, None, None] * self._res_initial + factor[n + 1, None, None] * self._res_final
+        self.occupation = numpy.sum(weights * self.n_particles) / z_part
+        self.magnetization = numpy.sum(weights * self._spin_z) / z_part
+        return True
+
+    def gf(self, z):
+        """
+        Green's function at the complex frequencies z
+
+        Returns
+        -------
+        complex array [2*norb, 2*norb, len(z)]
+        """
+        z = numpy.asarray(z, dtype=numpy.complex_)
+        n_pole, n_so = self.residues.shape[0], self.residues.shape[1]
+        gf = numpy.dot(self.residues.reshape(n_pole, n_so*n_so).T, 1.0 / (self.poles[:, None] - z[None, :]))
+        return -gf.reshape(n_so, n_so, len(z))
+
+    def moments(self, n_moments):
+        """
+        High-frequency moments M_k = sum_p R^p w_p^k, i.e. G(z) = sum_k M_k / z^(k+1)
+
+        Returns
+        -------
+        list of complex array [2*norb, 2*norb]
+        """
+        return [numpy.einsum('pab,p->ab', self.residues, self.poles**k) for k in range(n_moments)]
+
+    def to_dict(self):
+        """
+        Data to be stored in an HDF5 file
+        """
+        return {'key': self.key, 'beta': self.beta, 'shift': self._shift0, 'poles': self._poles0,
+                'res_initial': self._res_initial, 'res_final': self._res_final,
+                'pole_particles': self._pole_particles, 'energies': self._energies0,
+                'n_particles': self.n_particles, 'spin_z': self._spin_z, 'tol': self._tol}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(str(data['key']), data['beta'], data['shift'], numpy.asarray(data['poles']),
+                   numpy.asarray(data['res_initial']), numpy.asarray(data['res_final']),
+                   numpy.asarray(data['pole_particles']), numpy.asarray(data['energies']),
+                   numpy.asarray(data['n_particles']), numpy.asarray(data['spin_z']), data['tol'])
+
+
+def diagonalize(ealmat, u_mat, beta, tol=1e-12):
+    """
+    Diagonalize the atomic Hamiltonian and construct the Lehmann representation of G.
+
+    Only the transitions involving states with Boltzmann weights larger than tol
+    (relative to the ground state) are kept, and degenerate poles are merged.
+
+    Parameters
+    ----------
+    ealmat : complex array [2*norb, 2*norb]
+        Atomic levels
+    u_mat : array [norb, norb, norb, norb]
+        Coulomb interaction
+    beta : float
+        Inverse temperature
+    tol : float, optional
+        Threshold of the Boltzmann weights and of the residues
+
+    Returns
+    -------
+    AtomicLehmann
+    """
+    ealmat = numpy.asarray(ealmat, dtype=numpy.complex_)
+    u_mat = numpy.asarray(u_mat, dtype=numpy.complex_)
+    n_so = ealmat.shape[0]
+    norb = n_so // 2
+    spin_conserved = numpy.all(numpy.abs(ealmat[0:norb, norb:]) <= tol)
+    is_real = numpy.all(numpy.abs(ealmat.imag) <= tol) and numpy.all(numpy.abs(u_mat.imag) <= tol)
+    dtype = numpy.float_ if is_real else numpy.complex_
+    fock = _FockSpace(n_so, spin_conserved)
+    n_sec = len(fock.states)
+
+    #
+    # List of the terms in the Hamiltonian
+    #
+    terms = []
+    for a, b in numpy.argwhere(numpy.abs(ealmat) > tol):
+        terms.append((ealmat[a, b], [(int(a), True), (int(b), False)]))
+    for i, j, k, l in numpy.argwhere(numpy.abs(u_mat) > tol):
+        for s1 in range(2):
+            for s2 in range(2):
+                a, b, c, d = s1*norb+i, s2*norb+j, s1*norb+k, s2*norb+l
+                if a == b or c == d:
+                    continue
+                terms.append((0.5 * u_mat[i, j, k, l], [(int(a), True), (int(b), True), (int(d), False), (int(c), False)]))
+
+    #
+    # Diagonalization in each sector
+    #
+    eigvals = []
+    eigvecs = []
+    for isec in range(n_sec):
+        dim = len(fock.states[isec])
+        ham = numpy.zeros((dim, dim), dtype=numpy.complex_)
+        for coeff, ops in terms:
+            target_sec, rows, cols, signs = fock.apply_string(ops, isec)
+            if target_sec == isec:
+                ham[rows, cols] += coeff * signs
+        if is_real:
+            ham = ham.real
+        e, v = numpy.linalg.eigh(ham)
+        eigvals.append(e)
+        eigvecs.append(v.astype(dtype))
+
+    e_min = min([numpy.amin(e) for e in eigvals])
+    weights = [numpy.exp(-beta * (e - e_min)) for e in eigvals]
+    populated = [numpy.where(w > tol)[0] for w in weights]
+
+    #
+    # Transitions from the sector isec to jsec by c^dag_b
+    #   <jsec, p|c^dag_b|isec, m>, where m or p is a populated state.
+    # The products of the matrix elements are weighted separately with the Boltzmann weights
+    # of m (res_initial) and p (res_final), which are not normalized by the partition function.
+    #
+    poles = []
+    res_initial = []
+    res_final = []
+    pole_particles = []
+    for isec in range(n_sec):
+        targets = {}
+        for b in range(n_so):
+            jsec = fock.cdag[isec][b][0]
+            if jsec >= 0:
+                targets.setdefault(jsec, []).append(b)
+        for jsec, orbs in targets.items():
+            e0, e1 = eigvals[isec], eigvals[jsec]
+            v0, v1 = eigvecs[isec], eigvecs[jsec]
+            w0, w1 = weights[isec], weights[jsec]
+            pop0, pop1 = populated[isec], populated[jsec]
+            n_b = len(orbs)
+
+            # (products of the matrix elements [pole, b, b'], weight of m, weight of p, pole)
+            res_sec = []
+            # m is populated
+            if len(pop0) > 0:
+                x = numpy.array([numpy.dot(v1.conj().T, fock.apply(b, True, isec, v0[:, pop0])) for b in orbs])
+                res = numpy.einsum('apm,bpm->pmab', x.conj(), x).reshape(-1, n_b, n_b)
+                res_sec.append((res, numpy.tile(w0[pop0], len(e1)), numpy.repeat(w1, len(pop0)),
+                                (e1[:, None] - e0[None, pop0]).reshape(-1)))
+
+            # p is populated but m is not
+            not_pop0 = numpy.setdiff1d(numpy.arange(len(e0)), pop0)
+            if len(pop1) > 0 and len(not_pop0) > 0:
+                # <m|c_b|p> = conj(<p|c^dag_b|m>)
+                y = numpy.array([numpy.dot(v0[:, not_pop0].conj().T, fock.apply(b, False, jsec, v1[:, pop1]))
+                                 for b in orbs])
+                res = numpy.einsum('amp,bmp->pmab', y, y.conj()).reshape(-1, n_b, n_b)
+                res_sec.append((res, numpy.tile(w0[not_pop0], len(pop1)), numpy.repeat(w1[pop1], len(not_pop0)),
+                                (e1[pop1, None] - e0[None, not_pop0]).reshape(-1)))
+
+            for res, weight0, weight1, pole in res_sec:
+                # Remove vanishing matrix elements
+                nonzero = numpy.amax(numpy.abs(res), axis=(1, 2)) > tol
+                res, weight0, weight1, pole = res[nonzero], weight0[nonzero], weight1[nonzero], pole[nonzero]
+                res_full = numpy.zeros((res.shape[0], n_so, n_so), dtype=numpy.complex_)
+                res_full[:, numpy.array(orbs)[:, None], numpy.array(orbs)[None, :]] = res
+                res_initial.append(weight0[:, None, None] * res_full)
+                res_final.append(weight1[:, None, None] * res_full)
+                poles.append(pole)
+                pole_particles.append(numpy.full(len(pole), fock.n_particles[isec], dtype=int))
+
+    poles = numpy.concatenate(poles)
+    res_initial = numpy.concatenate(res_initial)
+    res_final = numpy.concatenate(res_final)
+    pole_particles = numpy.concatenate(pole_particles)
+
+    #
+    # Merge degenerate poles between the same particle numbers
+    #
+    merged_poles = []
+    merged_initial = []
+    merged_final = []
+    merged_particles = []
+    for n in numpy.unique(pole_particles):
+        in_n = pole_particles == n
+        unique_poles, inverse = numpy.unique(numpy.round(poles[in_n], 10), return_inverse=True)
+        for res, merged in [(res_initial, merged_initial), (res_final, merged_final)]:
+            res_merged = numpy.zeros((len(unique_poles), n_so, n_so), dtype=numpy.complex_)
+            numpy.add.at(res_merged, inverse, res[in_n])
+            merged.append(res_merged)
+        merged_poles.append(unique_poles)
+        merged_particles.append(numpy.full(len(unique_poles), n, dtype=int))
+
+    #
+    # Particle number and magnetization of each eigenstate
+    #
+    n_particles = numpy.concatenate([numpy.full(len(e), fock.n_particles[isec], dtype=int)
+                                     for isec, e in enumerate(eigvals)])
+    spin_z = []
+    for isec in range(n_sec):
+        states = fock.states[isec]
+        sz = _popcount(states & ((1 << norb) - 1), norb) - _popcount(states >> norb, norb)
+        spin_z.append(numpy.dot(sz, numpy.abs(eigvecs[isec])**2))
+
+    return AtomicLehmann(cache_key(ealmat, u_mat, beta), beta, level_shift(ealmat), numpy.concatenate(merged_poles),
+                         numpy.concatenate(merged_initial), numpy.concatenate(merged_final),
+                         numpy.concatenate(merged_particles), numpy.concatenate(eigvals), n_particles,
+                         numpy.concatenate(spin_z), tol)
@@ -0,0 +1,176 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+import pytriqs.utility.mpi as mpi
+
+
+def trace_g2_matsubara(iw, g_data, beta):
+    """
+    (1/beta) sum_n Tr G(iw_n)^2 over all Matsubara frequencies.
+    The frequencies outside the mesh are included with the leading tail G ~ 1/iw.
+
+    Parameters
+    ----------
+    iw : complex array [n_iw]
+        Matsubara frequencies of the mesh
+    g_data : complex array [n_iw, dim, dim]
+        G(iw_n)
+    beta : float
+        Inverse temperature
+
+    Returns
+    -------
+    complex
+    """
+    dim = g_data.shape[1]
+    s = numpy.einsum('nij,nji->', g_data, g_data)
+    # sum_n 1/(iw_n)^2 = -beta^2/4 over all n
+    rest = -beta**2 / 4.0 - numpy.sum(1.0 / iw**2).real
+    return (s + dim * rest) / beta
+
+
+def lattice_density(sk, mu, with_dc=True):
+    """
+    Total number of electrons N and dN/dmu in a single pass over k.
+    dN/dmu = -(1/beta) sum_n sum_k w_k Tr G(k, iw_n)^2 is obtained from the same G(k, iw_n) as N.
+
+    Parameters
+    ----------
+    sk : SumkDFT
+        Sigma must have been set
+    mu : float
+        Chemical potential
+    with_dc : bool, optional
+        Whether or not the double counting is subtracted
+
+    Returns
+    -------
+    density : float
+    dndmu : float
+    """
+    dens = 0.0
+    dndmu = 0.0
+    iw = None
+    for ik in mpi.slice_array(numpy.arange(sk.n_k)):
+        g_latt = sk.lattice_gf(ik=ik, mu=mu, iw_or_w="iw", with_Sigma=True, with_dc=with_dc)
+        dens += sk.bz_weights[ik] * g_latt.total_density()
+        for bname, g in g_latt:
+            if iw is None:
+                iw = numpy.array([complex(x) for x in g.mesh])
+                beta = g.mesh.beta
+            dndmu -= sk.bz_weights[ik] * trace_g2_matsubara(iw, g.data, beta).real
+    dens = mpi.all_reduce(mpi.world, dens, lambda x, y: x + y)
+    dndmu = mpi.all_reduce(mpi.world, dndmu, lambda x, y: x + y)
+    return dens.real, dndmu
+
+
+class ChemicalPotentialSolver(object):
+    """
+    Chemical potential for a given number of electrons by the Newton iteration with the analytic dN/dmu,
+    safeguarded by a bracket (secant step inside the bracket, bisection as the last resort).
+    The search starts from the chemical potential of the previous iteration, so that it takes
+    only a few density evaluations once the DMFT loop is converging.
+    dN/dmu of the previous call is used where the current one vanishes (e.g. in a gap).
+    """
+
+    def __init__(self, density, precision, max_step=0.5, max_loops=100):
+        """
+        Parameters
+        ----------
+        density : function
+            density(mu) returns N and dN/dmu
+        precision : float
+            Tolerance on N
+        max_step : float, optional
+            Largest change of mu by one step until the solution is bracketed
+        max_loops : int, optional
+            Maximum number of density evaluations
+        """
+        self._density = density
+        self._precision = precision
+        self._max_step = max_step
+        self._max_loops = max_loops
+        # dN/dmu at the solution of the previous call
+        self._last_dndmu = None
+        self.n_evaluations = 0
+
+    def solve(self, n_target, mu):
+        """
+        Find mu such that |N(mu) - n_target| < precision
+
+        Parameters
+        ----------
+        n_target : float
+            Number of electrons
+        mu : float
+            Initial guess (e.g. the chemical potential of the previous iteration)
+
+        Returns
+        -------
+        mu : float
+        density : float
+            N(mu)
+        """
+        self.n_evaluations = 0
+        max_step = self._max_step
+        lo = None  # (mu, N) with N < n_target
+        hi = None  # (mu, N) with N > n_target
+        while True:
+            n, dndmu = self._density(mu)
+            self.n_evaluations += 1
+            if abs(n - n_target) < self._precision:
+                break
+            if self.n_evaluations >= self._max_loops:
+                mpi.report("Warning ! The chemical potential is not converged within {0} evaluations.".format(
+                    self._max_loops))
+                break
+            if n < n_target:
+                lo = (mu, n)
+            else:
+                hi = (mu, n)
+            #
+            # Newton step with the analytic derivative (or that of the previous call in a gap)
+            #
+            if dndmu <= 0.0 and self._last_dndmu is not None:
+                dndmu = self._last_dndmu
+            if dndmu > 0.0:
+                step = (n_target - n) / dndmu
+            else:
+                step = numpy.sign(n_target - n) * max_step
+            if lo is None or hi is None:
+                #
+                # Not bracketed yet: limit the step, and expand the limit for the next one
+                #
+                mu_new = mu + numpy.clip(step, -max_step, max_step)
+                max_step *= 2.0
+            else:
+                mu_new = mu + step
+                width = hi[0] - lo[0]
+                inside = min(lo[0], hi[0]) + 0.01 * abs(width) < mu_new < max(lo[0], hi[0]) - 0.01 * abs(width)
+                if not inside:
+                    # Secant in the bracket, or bisection if the secant is too close to its ends
+                    mu_new = lo[0] + (n_target - lo[1]) * width / (hi[1] - lo[1])
+                    t = (mu_new - lo[0]) / width
+                    if not (0.05 < t < 0.95):
+                        mu_new = 0.5 * (lo[0] + hi[0])
+            mu = mu_new
+        if dndmu > 0.0:
+            self._last_dndmu = dndmu
+        return mu, n
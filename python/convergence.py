@@ -0,0 +1,334 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+
+
+def _sigma_data(sigma, w_max=None):
+    """
+    Sigma_iw of all inequivalent shells at the positive Matsubara frequencies
+
+    Parameters
+    ----------
+    sigma : list of BlockGf
+    w_max : float, optional
+        Only the frequencies below w_max are returned
+
+    Returns
+    -------
+    list of complex array [n_iw, dim, dim]
+    """
+    data = []
+    for sigma_sh in sigma:
+        for bname, g in sigma_sh:
+            n_iw = g.data.shape[0] // 2
+            d = g.data[n_iw:, :, :]
+            if w_max is not None:
+                iw = numpy.array([complex(x) for x in g.mesh])[n_iw:]
+                d = d[iw.imag < w_max]
+            data.append(d)
+    return data
+
+
+def sigma_distance(sigma_in, sigma_out):
+    """
+    Root mean square of Sigma_out(iw_n) - Sigma_in(iw_n) over the frequencies and the matrix elements
+
+    Parameters
+    ----------
+    sigma_in : list of BlockGf
+    sigma_out : list of BlockGf
+
+    Returns
+    -------
+    float
+    """
+    diff = numpy.concatenate([(d_out - d_in).ravel()
+                              for d_in, d_out in zip(_sigma_data(sigma_in), _sigma_data(sigma_out))])
+    return numpy.sqrt(numpy.mean(numpy.abs(diff)**2))
+
+
+def sigma_noise(sigma, w_max=None):
+    """
+    Statistical noise of Sigma(iw_n) estimated from its fourth differences along the frequency.
+    Sigma is smooth on the Matsubara mesh, where the upper half of the measured positive frequencies
+    is used, while the fourth difference of white noise of the standard deviation s has the standard deviation
+    sqrt(70) s.
+
+    Parameters
+    ----------
+    sigma : list of BlockGf
+    w_max : float, optional
+        Upper limit of the measured frequencies. Sigma above fit_min_w is replaced by the analytic tail by tail_fit,
+        and must be excluded.
+
+    Returns
+    -------
+    float
+        Estimated standard deviation of each element (0 if there are less than 10 measured frequencies)
+    """
+    data = [d[d.shape[0] // 2:] for d in _sigma_data(sigma, w_max) if d.shape[0] >= 10]
+    if len(data) == 0:
+        return 0.0
+    diff4 = numpy.concatenate([(d[4:] - 4.0 * d[3:-1] + 6.0 * d[2:-2] - 4.0 * d[1:-3] + d[:-4]).ravel()
+                               for d in data])
+    return numpy.sqrt(numpy.mean(numpy.abs(diff4)**2) / 70.0)
+
+
+def legendre_matsubara_weight(n_l, x):
+    """
+    sum_{l < n_l} (2l+1) j_l(x)^2, which is the squared norm of the row of the transformation
+    from the Legendre coefficients G_l to G(iw_n) with x = (2n+1)pi/2.
+    The spherical Bessel functions j_l are obtained by the downward recurrence (Miller's algorithm)
+    normalized with sum_{l >= 0} (2l+1) j_l(x)^2 = 1.
+
+    Parameters
+    ----------
+    n_l : int
+    x : float array
+        Positive arguments
+
+    Returns
+    -------
+    float array
+    """
+    x = numpy.asarray(x, dtype=numpy.float_)
+    l_start = n_l + int(numpy.amax(x)) + 50
+    j_next = numpy.zeros_like(x)
+    j = numpy.full_like(x, 1.0e-30)
+    total = numpy.zeros_like(x)
+    partial = numpy.zeros_like(x)
+    for l in range(l_start, 0, -1):
+        j_next, j = j, (2 * l + 1) / x * j - j_next
+        # j is now j_{l-1} (unnormalized)
+        total += (2 * l - 1) * j**2
+        if l - 1 < n_l:
+            partial += (2 * l - 1) * j**2
+        big = numpy.abs(j) > 1.0e100
+        if numpy.any(big):
+            j[big] *= 1.0e-100
+            j_next[big] *= 1.0e-100
+            total[big] *= 1.0e-200
+            partial[big] *= 1.0e-200
+    return partial / total
+
+
+def legendre_sigma_noise(g_l, g_iw):
+    """
+    Statistical noise of Sigma(iw_n) obtained from the Legendre coefficients G_l by the Dyson equation.
+    The noise s of G_l is estimated from the upper half of l, where the coefficients of
+    a converged expansion are negligible. G(iw_n) has the noise s * sqrt(legendre_matsubara_weight),
+    and Sigma = G0^-1 - G^-1 has dSigma = G^-1 dG G^-1, whose root mean square over the elements is
+    |dG| ||G^-1||_F^2 / dim.
+
+    Parameters
+    ----------
+    g_l : list of BlockGf
+        G_l of each inequivalent shell
+    g_iw : list of BlockGf
+        G_iw of each inequivalent shell
+
+    Returns
+    -------
+    float
+        Root mean square over the positive frequencies and the elements
+    """
+    dsigma = []
+    for g_l_sh, g_iw_sh in zip(g_l, g_iw):
+        for (bname, gl), (bname2, giw) in zip(g_l_sh, g_iw_sh):
+            n_l = gl.data.shape[0]
+            s = numpy.sqrt(numpy.mean(numpy.abs(gl.data[n_l // 2:])**2))
+            n_iw = giw.data.shape[0] // 2
+            iw = numpy.array([complex(x) for x in giw.mesh])[n_iw:]
+            beta = numpy.pi / iw[0].imag
+            dg = s * numpy.sqrt(legendre_matsubara_weight(n_l, iw.imag * beta / 2.0))
+            ginv = numpy.linalg.inv(giw.data[n_iw:])
+            dsigma.append(dg * numpy.sum(numpy.abs(ginv)**2, axis=(1, 2)) / giw.data.shape[1])
+    return numpy.sqrt(numpy.mean(numpy.concatenate(dsigma)**2))
+
+
+class ConvergenceChecker(object):
+    """
+    Convergence criteria of the DMFT loop.
+    A criterion with a non-positive threshold is not used, and the loop is regarded as converged
+    when all the other criteria are satisfied at an iteration.
+    """
+
+    def __init__(self, tol_sigma, tol_mu, tol_occupation, noise_factor):
+        """
+        Parameters
+        ----------
+        tol_sigma : float
+            Threshold of sigma_distance between the input and the output of an iteration
+        tol_mu : float
+            Threshold of the change of the chemical potential
+        tol_occupation : float
+            Threshold of the change of the occupation of each inequivalent shell
+        noise_factor : float
+            For noisy (QMC) solvers, the threshold on Sigma is raised to noise_factor times the noise of Sigma
+        """
+        self._tol_sigma = tol_sigma
+        self._tol_mu = tol_mu
+        self._tol_occupation = tol_occupation
+        self._noise_factor = noise_factor
+        self._mu = None
+        self._occupation = None
+
+    @property
+    def enabled(self):
+        """
+        Whether or not any criterion is used
+        """
+        return self._tol_sigma > 0.0 or self._tol_mu > 0.0 or self._tol_occupation > 0.0
+
+    def set_previous(self, metrics):
+        """
+        Restore the chemical potential and the occupations of the previous run
+
+        Parameters
+        ----------
+        metrics : dict
+            Metrics of the last iteration returned by check()
+        """
+        self._mu = metrics['chemical_potential']
+        self._occupation = numpy.array(metrics['occupation'])
+
+    def check(self, sigma_in, sigma_out, chemical_potential, occupation, noise=0.0):
+        """
+        Compute the metrics of an iteration and test the convergence
+
+        Parameters
+        ----------
+        sigma_in : list of BlockGf
+            Sigma_iw with which the impurity problems were set up
+        sigma_out : list of BlockGf
+            Sigma_iw from the impurity solvers
+        chemical_potential : float
+        occupation : list of float
+            Number of electrons in each inequivalent shell
+        noise : float, optional
+            Statistical noise of Sigma_out (e.g. sigma_noise, legendre_sigma_noise, 0 for a deterministic solver)
+
+        Returns
+        -------
+        metrics : dict
+            'sigma', 'sigma_noise', 'sigma_threshold', 'mu', 'occupation_change' (changes from the previous iteration,
+            or -1.0 if not available), 'chemical_potential', 'occupation', 'converged'
+        """
+        occupation = numpy.array(occupation, dtype=numpy.float_)
+        metrics = {
+            'sigma': sigma_distance(sigma_in, sigma_out),
+            'sigma_noise': noise,
+            'mu': -1.0 if self._mu is None else abs(chemical_potential - self._mu),
+            'occupation_change': -1.0 if self._occupation is None
+            else float(numpy.amax(numpy.abs(occupation - self._occupation))),
+            'chemical_potential': chemical_potential,
+            'occupation': occupation,
+        }
+        metrics['sigma_threshold'] = max(self._tol_sigma, self._noise_factor * metrics['sigma_noise'])
+        converged = self.enabled
+        if self._tol_sigma > 0.0:
+            converged = converged and metrics['sigma'] < metrics['sigma_threshold']
+        if self._tol_mu > 0.0:
+            converged = converged and 0.0 <= metrics['mu'] < self._tol_mu
+        if self._tol_occupation > 0.0:
+            converged = converged and 0.0 <= metrics['occupation_change'] < self._tol_occupation
+        metrics['converged'] = bool(converged)
+        self._mu = chemical_potential
+        self._occupation = occupation
+        return metrics
+
+
+class CycleSchedule(object):
+    """
+    Number of Monte Carlo cycles of QMC solvers at each iteration.
+    It starts from a small number and grows geometrically up to the given maximum
+    when more statistics is needed to go further, i.e.
+    when the change of Sigma becomes comparable to its statistical noise,
+    or when the change of Sigma stagnates (this does not rely on the estimate of the noise).
+    """
+
+    def __init__(self, n_cycles_initial, n_cycles_max, growth, ratio, stagnation=0.9):
+        """
+        Parameters
+        ----------
+        n_cycles_initial : int
+            Number of cycles at the first iteration
+        n_cycles_max : int
+            Maximum number of cycles (n_cycles in [impurity_solver])
+        growth : float
+            Factor by which the number of cycles grows
+        ratio : float
+            The number of cycles grows when sigma_distance < ratio * (noise of Sigma)
+        stagnation : float, optional
+            The number of cycles grows when sigma_distance > stagnation * (sigma_distance of the previous iteration)
+        """
+        if growth <= 1.0:
+            raise RuntimeError("n_cycles_growth must be larger than 1.")
+        self._n_cycles = min(n_cycles_initial, n_cycles_max)
+        self._n_cycles_max = n_cycles_max
+        self._growth = growth
+        self._ratio = ratio
+        self._stagnation = stagnation
+        # sigma_distance of the previous iteration with the current number of cycles
+        self._last_sigma = None
+
+    @property
+    def n_cycles(self):
+        """
+        Number of cycles for the next iteration
+        """
+        return self._n_cycles
+
+    @property
+    def at_max(self):
+        """
+        Whether or not the number of cycles has reached the maximum
+        """
+        return self._n_cycles >= self._n_cycles_max
+
+    def restore(self, n_cycles, sigma=None):
+        """
+        Restore the number of cycles and sigma_distance of the previous run
+        """
+        n_cycles_new = min(max(n_cycles, self._n_cycles), self._n_cycles_max)
+        if n_cycles_new == n_cycles:
+            self._last_sigma = sigma
+        self._n_cycles = n_cycles_new
+
+    def update(self, metrics):
+        """
+        Update the number of cycles from the metrics of an iteration (See ConvergenceChecker.check)
+
+        Returns
+        -------
+        bool
+            Whether or not the number of cycles is changed
+        """
+        if self.at_max:
+            return False
+        noise_limited = metrics['sigma'] < self._ratio * metrics['sigma_noise']
+        stagnated = self._last_sigma is not None and metrics['sigma'] > self._stagnation * self._last_sigma
+        if not (noise_limited or stagnated):
+            self._last_sigma = metrics['sigma']
+            return False
+        self._n_cycles = min(int(self._n_cycles * self._growth + 0.5), self._n_cycles_max)
+        # The change of Sigma with the new number of cycles is compared afresh
+        self._last_sigma = None
+        return True
@@ -23,6 +23,8 @@ from pytriqs.applications.dft.sumk_dft_tools import *
 from matplotlib.gridspec import GridSpec
 
 from program_options import *
+from output_archive import sigma_iterations, convergence_history, timings_history
+from timing import total_timings, print_timings
 
 
 def dcore_check(filename, fileplot=None):
@@ -58,18 +60,23 @@ def dcore_check(filename, fileplot=None):
     output_group = 'dmft_out'
     beta = p["system"]["beta"]
     omega_check = p['tool']['omega_check']
-    gs = GridSpec(2, 1)
 
     if fileplot is not None:  # if graph is to be printed in a file
         import matplotlib
         matplotlib.use('Agg')  # do not plot on x11
     from pytriqs.plot.mpl_interface import oplot, plt
-    plt.figure(figsize=(8, 10))
     #
     # Chemical potential
     #
     ar = HDFArchive(output_file, 'r')
     iteration_number = ar[output_group]['iterations']
+    convergence = convergence_history(ar[output_group])
+    if len(convergence) > 0:
+        gs = GridSpec(3, 1)
+        plt.figure(figsize=(8, 14))
+    else:
+        gs = GridSpec(2, 1)
+        plt.figure(figsize=(8, 10))
     perform_tail_fit = p["system"]["perform_tail_fit"] and \
         not ar[output_group]['parameters']["system"]["perform_tail_fit"]
     nsh = solver.SK.n_inequiv_shells
@@ -78,37 +85,56 @@ def dcore_check(filename, fileplot=None):
     for itr in range(1, iteration_number+1):
         print("  {0} {1}".format(itr, ar[output_group]['chemical_potential'][str(itr)]))
     #
+    # Metrics of the convergence (See ConvergenceChecker)
+    #
+    if len(convergence) > 0:
+        print("\n  Iter  |Sigma_out-Sigma_in|  Threshold  d(mu)  d(occupation)  Converged"
+              + ("  n_cycles" if 'n_cycles' in convergence[0][1] else ""))
+        for itr, metrics in convergence:
+            print("  {0} {1:.3e} {2:.3e} {3:.3e} {4:.3e} {5}".format(
+                itr, metrics['sigma'], metrics['sigma_threshold'], metrics['mu'], metrics['occupation_change'],
+                metrics['converged']) + (" {0}".format(metrics['n_cycles']) if 'n_cycles' in metrics else ""))
+    #
+    # Timings of the phases of the DMFT loop (See TimerRegistry)
+    #
+    timings = timings_history(ar[output_group])
+    if len(timings) > 0:
+        print("\n  Timings summed over {0} iterations (sec). Min/mean/max over the processes.".format(len(timings)))
+        print_timings(total_timings([t for itr, t in timings]))
+        print("\n  Timings of the last iteration (sec)")
+        print_timings(total_timings([timings[-1][1]]))
+    #
     # Read Sigma and average it
+    # Only the iterations kept in the file are available (See sigma_history)
     #
     sigma_ave = []
     sigma_fit = []
     nsigma = 0
     itr_sigma = [0]*7
-    for itr in range(1, iteration_number+1):
-        if itr > iteration_number - 7:
-            itr_sigma[nsigma] = itr
-            sigma_ave.append(GfImFreq(indices=[0], beta=beta, n_points=p["system"]["n_iw"]))
-            sigma_fit.append(GfImFreq(indices=[0], beta=beta, n_points=p["system"]["n_iw"]))
-            sigma_ave[nsigma].data[:, 0, 0] = 0.0
-            sigma_fit[nsigma].data[:, 0, 0] = 0.0
-            norb_tot = 0
-            for ish in range(nsh):
-                spn = solver.SK.spin_block_names[solver.SK.corr_shells[solver.SK.inequiv_to_corr[ish]]['SO']]
-                norb = solver.SK.corr_shells[solver.SK.inequiv_to_corr[ish]]['dim']
-                sol[ish].Sigma_iw << ar[output_group]['Sigma_iw'][str(itr)][str(ish)]
-                sigma_iw_fit = sol[ish].Sigma_iw.copy()
-                if perform_tail_fit:
-                    tail_fit(sigma_iw_fit, fit_max_moment=p["system"]["fit_max_moment"],
-                             fit_min_w=p["system"]["fit_min_w"], fit_max_w=p["system"]["fit_max_w"])
-                for isp in spn:
-                    for iorb in range(norb):
-                        norb_tot += 1
-                        for jorb in range(norb):
-                            sigma_ave[nsigma].data[:, 0, 0] += sol[ish].Sigma_iw[isp].data[:, iorb, jorb]
-                            sigma_fit[nsigma].data[:, 0, 0] += sigma_iw_fit[isp].data[:, iorb, jorb]
-            sigma_ave[nsigma].data[:, 0, 0] /= norb_tot
-            sigma_fit[nsigma].data[:, 0, 0] /= norb_tot
-            nsigma += 1
+    for itr in sigma_iterations(ar[output_group])[-7:]:
+        itr_sigma[nsigma] = itr
+        sigma_ave.append(GfImFreq(indices=[0], beta=beta, n_points=p["system"]["n_iw"]))
+        sigma_fit.append(GfImFreq(indices=[0], beta=beta, n_points=p["system"]["n_iw"]))
+        sigma_ave[nsigma].data[:, 0, 0] = 0.0
+        sigma_fit[nsigma].data[:, 0, 0] = 0.0
+        norb_tot = 0
+        for ish in range(nsh):
+            spn = solver.SK.spin_block_names[solver.SK.corr_shells[solver.SK.inequiv_to_corr[ish]]['SO']]
+            norb = solver.SK.corr_shells[solver.SK.inequiv_to_corr[ish]]['dim']
+            sol[ish].Sigma_iw << ar[output_group]['Sigma_iw'][str(itr)][str(ish)]
+            sigma_iw_fit = sol[ish].Sigma_iw.copy()
+            if perform_tail_fit:
+                tail_fit(sigma_iw_fit, fit_max_moment=p["system"]["fit_max_moment"],
+                         fit_min_w=p["system"]["fit_min_w"], fit_max_w=p["system"]["fit_max_w"])
+            for isp in spn:
+                for iorb in range(norb):
+                    norb_tot += 1
+                    for jorb in range(norb):
+                        sigma_ave[nsigma].data[:, 0, 0] += sol[ish].Sigma_iw[isp].data[:, iorb, jorb]
+                        sigma_fit[nsigma].data[:, 0, 0] += sigma_iw_fit[isp].data[:, iorb, jorb]
+        sigma_ave[nsigma].data[:, 0, 0] /= norb_tot
+        sigma_fit[nsigma].data[:, 0, 0] /= norb_tot
+        nsigma += 1
     #
     # Real part
     #
@@ -127,6 +153,20 @@ def dcore_check(filename, fileplot=None):
         if perform_tail_fit:
             oplot(sigma_fit[itr], '-o', mode='I', x_window=(0.0, omega_check), name='S_fit-%s' % itr_sigma[itr])
     plt.legend(loc=0)
+    #
+    # Convergence
+    #
+    if len(convergence) > 0:
+        plt.subplot(gs[2])
+        itrs = [itr for itr, metrics in convergence]
+        plt.semilogy(itrs, [metrics['sigma'] for itr, metrics in convergence], '-o', label='|Sigma_out-Sigma_in|')
+        plt.semilogy(itrs, [metrics['sigma_threshold'] for itr, metrics in convergence], '--', label='Threshold')
+        itrs_mu = [itr for itr, metrics in convergence if metrics['mu'] > 0.0]
+        if len(itrs_mu) > 0:
+            plt.semilogy(itrs_mu, [metrics['mu'] for itr, metrics in convergence if metrics['mu'] > 0.0], '-s',
+                         label='d(mu)')
+        plt.xlabel('Iteration')
+        plt.legend(loc=0)
 
     plt.show()
     if fileplot is not None:
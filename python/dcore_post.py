@@ -20,15 +20,22 @@ from __future__ import print_function
 import os
 import argparse
 import re
+import hashlib
 from dmft_core import DMFTCoreSolver
 from program_options import create_parser
 from pytriqs.applications.dft.sumk_dft_tools import *
-from pytriqs.applications.dft.converters.wannier90_converter import Wannier90Converter
 from warnings import warn
+from wannier90_model import fourier_ham
+from hr_reader import read_wannier90_hr
+from output_archive import OutputArchive, sigma_iterations
+from atomic_lehmann import AtomicLehmann
+from post_output import PostOutput
+from lattice_spectrum import spectral_ksum, dc_to_global
+from pade import pade_from_matsubara, pade_evaluate_mpi
 
 
 class DMFTCoreTools:
-    def __init__(self, seedname, params, n_k, xk):
+    def __init__(self, seedname, params, n_k, xk, bands_fingerprint=None):
         """
         Class of posting tool for DCore.
 
@@ -42,6 +49,8 @@ class DMFTCoreTools:
             Number of k points
         :param xk:  integer array
             x-position for plotting band
+        :param bands_fingerprint: string
+            Fingerprint of dft_bands_input. If given, A(k,w) is cached in seedname.out.h5
         """
 
         self._params = copy.deepcopy(params)
@@ -55,43 +64,48 @@ class DMFTCoreTools:
         self._seedname = seedname
         self._n_k = n_k
         self._xk = xk
+        self._bands_fingerprint = bands_fingerprint
         self.SKT = SumkDFTTools(hdf_file=self._seedname + '.h5', use_dft_blocks=False)
         self._solver = DMFTCoreSolver(seedname, params)
+        if mpi.is_master_node():
+            self._output = PostOutput(seedname, params['tool']['output_format'])
 
-    def print_dos(self, dos, dosproj_orb, filename):
+    def print_dos(self, dos, dosproj_orb, quantity):
         """
         Print DOS to file
+
+        Parameters
+        ----------
+        dos : dict
+            Total DOS of each spin
+        dosproj_orb : list of dict
+            Orbital-resolved DOS at each inequivalent shell
+        quantity : string
+            'dos' or 'dos0'
         """
         skt = self.SKT
         nsh = skt.n_inequiv_shells
+        spn = skt.spin_block_names[skt.SO]
         #
         om_mesh = numpy.linspace(self._omega_min, self._omega_max, self._Nomega)
         if mpi.is_master_node():
-            with open(filename, 'w') as f:
-                #
-                # Description of columns
-                #
-                print("# [1] Energy", file=f)
-                ii = 1
-                for isp in skt.spin_block_names[skt.SO]:
-                    ii += 1
-                    print("# [%d] Total DOS of spin %s" % (ii, isp), file=f)
-                for ish in range(nsh):
-                    for isp in skt.spin_block_names[skt.SO]:
-                        for iorb in range(skt.corr_shells[skt.inequiv_to_corr[ish]]['dim']):
-                            ii += 1
-                            print("# [%d] PDOS of shell%d,spin %s,band%d" % (ii, ish, isp, iorb), file=f)
-                #
-                for iom in range(self._Nomega):
-                    print("%f" % om_mesh[iom], file=f, end="")
-                    for isp in skt.spin_block_names[skt.SO]:
-                        print(" %f" % dos[isp][iom], file=f, end="")
-                    for ish in range(nsh):
-                        for isp in skt.spin_block_names[skt.SO]:
-                            for iorb in range(skt.corr_shells[skt.inequiv_to_corr[ish]]['dim']):
-                                print(" %f" % dosproj_orb[ish][isp][iom, iorb, iorb].real, end="", file=f)
-                    print("", file=f)
-            print("\n    Output {0}".format(filename))
+            dos_array = numpy.array([dos[isp] for isp in spn])
+            pdos = [numpy.array([numpy.diagonal(dosproj_orb[ish][isp], axis1=1, axis2=2).real for isp in spn])
+                    for ish in range(nsh)]
+            self._output.write_dos(quantity, om_mesh, dos_array, pdos, spn)
+
+    def save_kpath(self, kvec, klabel, xk_label):
+        """
+        Save the k-path in the binary output
+
+        Parameters
+        ----------
+        kvec : float array [n_k, 3]
+        klabel : list of string
+        xk_label : float array [nnode]
+        """
+        if mpi.is_master_node():
+            self._output.save_kpath(kvec, self._xk, klabel, xk_label)
 
     def post(self):
         """
@@ -120,6 +134,21 @@ class DMFTCoreTools:
         if core.solver_name == 'TRIQS/hubbard-I':
             # set atomic levels:
             eal = skt.eff_atomic_levels()
+            #
+            # Atomic eigenstates stored by dcore (reused if the atomic levels are unchanged)
+            #
+            lehmann = [None] * nsh
+            if mpi.is_master_node():
+                ar = HDFArchive(self._seedname+'.out.h5', 'r')
+                if 'atomic_lehmann' in ar['dmft_out']:
+                    for ish in range(nsh):
+                        if str(ish) in ar['dmft_out']['atomic_lehmann']:
+                            lehmann[ish] = ar['dmft_out']['atomic_lehmann'][str(ish)]
+                del ar
+            lehmann = mpi.bcast(lehmann)
+            for ish in range(nsh):
+                if lehmann[ish] is not None:
+                    sol[ish].lehmann = AtomicLehmann.from_dict(lehmann[ish])
             for ish in range(nsh):
                 norb = skt.corr_shells[skt.inequiv_to_corr[ish]]['dim'] / (skt.SO + 1)
                 umat2 = numpy.zeros((norb, norb, norb, norb), numpy.complex_)
@@ -131,13 +160,8 @@ class DMFTCoreTools:
                                       u_mat=numpy.real(umat2))
                 sigma_w.append(sol[ish].Sigma_w)
         elif core.solver_name == "TRIQS/cthyb" or core.solver_name == "ALPS/cthyb":
-            # Read info from HDF file
-            ar = HDFArchive(self._seedname+'.out.h5', 'r')
-            iteration_number = ar['dmft_out']['iterations']
-            if mpi.is_master_node():
-                print("    Iteration {0}".format(iteration_number))
+            pade = self._pade_coefficients()
             for ish in range(nsh):
-                sol[ish].Sigma_iw << ar['dmft_out']['Sigma_iw'][str(iteration_number)][str(ish)]
                 # set BlockGf sigma_w
                 block_names = list(sol[ish].Sigma_iw.indices)
 
@@ -145,9 +169,11 @@ class DMFTCoreTools:
                     return [GfReFreq(indices=sigma.indices, window=(self._omega_min, self._omega_max),
                                      n_points=self._Nomega, name="sig_pade") for block, sigma in sol[ish].Sigma_iw]
                 sigma_w.append(BlockGf(name_list=block_names, block_list=glist(), make_copies=False))
-                # Analytic continuation
-                for bname, sig in sol[ish].Sigma_iw:
-                    sigma_w[ish][bname].set_from_pade(sig, n_points=self._n_pade, freq_offset=self._eta)
+                # Analytic continuation (frequencies are distributed over processes)
+                for bname, sig in sigma_w[ish]:
+                    z, a = pade[ish][bname]
+                    omega_eta = numpy.array([x.real for x in sig.mesh]) + 1j * self._eta
+                    sig.data[:, :, :] = pade_evaluate_mpi(z, a, omega_eta)
         else:
             raise RuntimeError("Unknown solver " + core.solver_name)
         #
@@ -157,15 +183,24 @@ class DMFTCoreTools:
         #  (Partial) DOS
         #
         mpi.report("\n#############  Compute (partial) DOS  ################\n")
-        dos, dosproj, dosproj_orb = skt.dos_wannier_basis(broadening=self._broadening,
-                                                          mesh=[self._omega_min, self._omega_max, self._Nomega],
-                                                          with_Sigma=True, with_dc=with_dc, save_to_file=False)
-        dos0, dosproj0, dosproj_orb0 = skt.dos_wannier_basis(broadening=self._broadening,
-                                                             mu=self._params['system']['mu'],
-                                                             mesh=[self._omega_min, self._omega_max, self._Nomega],
-                                                             with_Sigma=False, with_dc=False, save_to_file=False)
-        self.print_dos(dos, dosproj_orb, self._seedname+'_dos.dat')
-        self.print_dos(dos0, dosproj_orb0, self._seedname+'_dos0.dat')
+        spn = skt.spin_block_names[skt.SO]
+        omega = numpy.array([x.real for x in skt.Sigma_imp_w[0].mesh])
+        dims = [skt.corr_shells[icrsh]['dim'] for icrsh in range(skt.n_corr_shells)]
+        #
+        # The interacting and non-interacting DOS are computed in the same pass over k
+        #
+        dos = {}
+        dos0 = {}
+        gloc = {}
+        gloc0 = {}
+        for isp, sp in enumerate(spn):
+            terms = [(skt.chemical_potential, self._sigma_minus_dc(sp, with_dc)), (self._params['system']['mu'], None)]
+            results = spectral_ksum(skt.hopping[:, isp*skt.SP, :, :], skt.proj_mat[:, isp*skt.SP, :, :, :], dims,
+                                    omega, self._broadening, terms, weights=skt.bz_weights)
+            dos[sp], gloc[sp] = results[0]['dos'], results[0]['gloc']
+            dos0[sp], gloc0[sp] = results[1]['dos'], results[1]['gloc']
+        self.print_dos(dos, self._local_dos(gloc), 'dos')
+        self.print_dos(dos0, self._local_dos(gloc0), 'dos0')
         #
         # Band structure
         #
@@ -173,22 +208,147 @@ class DMFTCoreTools:
             return
         #
         mpi.report("\n#############  Compute Band Structure  ################\n")
-        akw = skt.spaghettis(broadening=self._broadening, plot_range=None, ishell=None, save_to_file=None)
+        akw_key, akw = self._load_akw()
+        if akw is None:
+            things_to_read = ['n_k', 'n_orbitals', 'proj_mat', 'hopping', 'n_parproj', 'proj_mat_all']
+            skt.read_input_from_hdf(subgrp=skt.bands_data, things_to_read=things_to_read)
+            akw = numpy.zeros((len(spn), self._n_k, len(omega)), numpy.float_)
+            for isp, sp in enumerate(spn):
+                terms = [(skt.chemical_potential, self._sigma_minus_dc(sp, with_dc))]
+                results = spectral_ksum(skt.hopping[:, isp*skt.SP, :, :], skt.proj_mat[:, isp*skt.SP, :, :, :],
+                                        dims, omega, self._broadening, terms, with_akw=True)
+                akw[isp, :, :] = results[0]['akw']
+            self._save_akw(akw_key, akw)
+        else:
+            mpi.report("    A(k,w) is read from {0}".format(self._seedname+'.out.h5'))
         #
         # Print band-structure into file
         #
-        mesh = [x.real for x in skt.Sigma_imp_w[0].mesh]
         if mpi.is_master_node():
-            with open(self._seedname + '_akw.dat', 'w') as f:
-                offset = 0.0
-                for isp in skt.spin_block_names[skt.SO]:
-                    for ik in range(self._n_k):
-                        for iom in range(self._Nomega):
-                            print("%f %f %f" % (self._xk[ik]+offset, mesh[iom], akw[isp][ik, iom]), file=f)
-                        print("", file=f)
-                    offset = self._xk[self._n_k-1] * 1.1
-                    print("", file=f)
-            print("\n    Output {0}".format(self._seedname + '_akw.dat'))
+            self._output.write_akw(self._xk, omega, akw, spn)
+
+    def _akw_key(self, iteration_number):
+        """
+        Key of the cached A(k,w): the k-path and the model (fingerprint of dft_bands_input),
+        the Sigma iteration, the frequency mesh and the options of the continuation
+        """
+        h = hashlib.sha1()
+        for value in [self._bands_fingerprint, iteration_number, self._solver.solver_name,
+                      self._params['system']['with_dc'], self._omega_min, self._omega_max, self._Nomega,
+                      self._broadening, self._eta, self._n_pade]:
+            h.update(repr(value).encode('utf-8'))
+        return h.hexdigest()
+
+    def _load_akw(self):
+        """
+        Read the cached A(k,w) if it has been computed with the same key
+
+        Returns
+        -------
+        key : string
+            Key of A(k,w) (None if A(k,w) is not cached)
+        akw : float array [n_spin, n_k, n_omega]
+            None if A(k,w) must be computed
+        """
+        if self._bands_fingerprint is None:
+            return None, None
+        key, akw = None, None
+        if mpi.is_master_node():
+            output = OutputArchive(self._seedname+'.out.h5', 'dmft_out')
+            key = self._akw_key(sigma_iterations(output.group)[-1])
+            akw = output.load_akw(key)
+            output.close()
+        return mpi.bcast(key), mpi.bcast(akw)
+
+    def _save_akw(self, key, akw):
+        """
+        Cache A(k,w) in seedname.out.h5
+        """
+        if key is None or not mpi.is_master_node():
+            return
+        output = OutputArchive(self._seedname+'.out.h5', 'dmft_out')
+        output.save_akw(key, akw)
+        output.close()
+
+    def _pade_coefficients(self):
+        """
+        Pade coefficients of Sigma_iw at the last iteration.
+        They are computed only once and stored in seedname.out.h5,
+        so that the real-frequency mesh can be changed without repeating the continuation.
+
+        Returns
+        -------
+        list of dict
+            [ish][block] = (z, a) (See pade.pade_coefficients)
+        """
+        sol = self._solver.S
+        nsh = self.SKT.n_inequiv_shells
+        pade = None
+        if mpi.is_master_node():
+            output = OutputArchive(self._seedname+'.out.h5', 'dmft_out')
+            iteration_number = sigma_iterations(output.group)[-1]
+            print("    Iteration {0}".format(iteration_number))
+            pade = output.load_pade(iteration_number, self._n_pade)
+            if pade is None:
+                print("    Compute Pade coefficients with {0} Matsubara frequencies".format(self._n_pade))
+                pade = []
+                for ish in range(nsh):
+                    sol[ish].Sigma_iw << output.load_sigma(iteration_number, ish)
+                    pade.append(dict((bname, pade_from_matsubara(sig, self._n_pade))
+                                     for bname, sig in sol[ish].Sigma_iw))
+                output.save_pade(iteration_number, self._n_pade, pade)
+            else:
+                print("    Pade coefficients are read from {0}".format(self._seedname+'.out.h5'))
+            output.close()
+        return mpi.bcast(pade)
+
+    def _sigma_minus_dc(self, sp, with_dc):
+        """
+        Sigma(w) - dc at each correlated shell for the spin block sp in the global coordinate system.
+        The double counting is rotated as in SumkDFT.add_dc.
+
+        Returns
+        -------
+        list of complex array [n_omega, dim, dim]
+        """
+        skt = self.SKT
+        sigma = []
+        for icrsh in range(skt.n_corr_shells):
+            sigma.append(skt.Sigma_imp_w[icrsh][sp].data.copy())
+            if with_dc:
+                time_inv = skt.rot_mat_time_inv[icrsh] == 1 and skt.SO == 1
+                sigma[icrsh] -= dc_to_global(skt.dc_imp[icrsh][sp], skt.rot_mat[icrsh], time_inv)[None, :, :]
+        return sigma
+
+    def _local_dos(self, gloc):
+        """
+        Orbital-resolved DOS at each inequivalent shell from the local Green's function.
+        The symmetrization and the rotation to the local coordinate are done as in SumkDFTTools.
+
+        Parameters
+        ----------
+        gloc : dict
+            gloc[sp][icrsh] is the local Green's function [n_omega, dim, dim] of the correlated shell icrsh
+
+        Returns
+        -------
+        list of dict
+            [ish][sp] : float array [n_omega, dim, dim]
+        """
+        skt = self.SKT
+        spn = skt.spin_block_names[skt.SO]
+        g_loc = [skt.Sigma_imp_w[icrsh].copy() for icrsh in range(skt.n_corr_shells)]
+        for icrsh in range(skt.n_corr_shells):
+            for sp in spn:
+                g_loc[icrsh][sp].data[:, :, :] = gloc[sp][icrsh]
+        if skt.symm_op != 0:
+            g_loc = skt.symmcorr.symmetrize(g_loc)
+        if skt.use_rotations:
+            for icrsh in range(skt.n_corr_shells):
+                for bname, gf in g_loc[icrsh]:
+                    g_loc[icrsh][bname] << skt.rotloc(icrsh, gf, direction='toLocal')
+        return [dict((sp, -g_loc[skt.inequiv_to_corr[ish]][sp].data.imag / numpy.pi) for sp in spn)
+                for ish in range(skt.n_inequiv_shells)]
 
     def momentum_distribution(self):
         """
@@ -202,8 +362,9 @@ class DMFTCoreTools:
 
         # Read info from HDF file
         ar = HDFArchive(self._seedname + '.out.h5', 'r')
+        iteration_number = sigma_iterations(ar['dmft_out'])[-1]
         for ish in range(nsh):
-            self._solver.S[ish].Sigma_iw << ar['dmft_out']['Sigma_iw'][str(ar['dmft_out']['iterations'])][str(ish)]
+            self._solver.S[ish].Sigma_iw << ar['dmft_out']['Sigma_iw'][str(iteration_number)][str(ish)]
         things_to_read = ['n_k', 'n_orbitals', 'proj_mat',
                           'hopping', 'n_parproj', 'proj_mat_all']
         value_read = skt.read_input_from_hdf(
@@ -242,46 +403,11 @@ class DMFTCoreTools:
         # Output momentum distribution to file
         #
         if mpi.is_master_node():
-            print("\n Output Momentum distribution : ", self._seedname + "_momdist.dat")
-            with open(self._seedname + "_momdist.dat", 'w') as fo:
-                print("# Momentum distribution", file=fo)
-                #
-                # Column information
-                #
-                print("# [Column] Data", file=fo)
-                print("# [1] Distance along k-path", file=fo)
-                icol = 1
-                for isp in spn:
-                    for iorb in range(self.SKT.n_orbitals[0, 0]):
-                        for jorb in range(self.SKT.n_orbitals[0, 0]):
-                            icol += 1
-                            print("# [%d] Re(MomDist_{spin=%s, %d, %d})" % (icol, isp, iorb, jorb), file=fo)
-                            icol += 1
-                            print("# [%d] Im(MomDist_{spin=%s, %d, %d})" % (icol, isp, iorb, jorb), file=fo)
-                #
-                # Write data
-                #
-                for ik in range(skt.n_k):
-                    print("%f " % self._xk[ik], end="", file=fo)
-                    for isp in range(2-skt.SO):
-                        for iorb in range(skt.n_orbitals[0, 0]):
-                            for jorb in range(skt.n_orbitals[0, 0]):
-                                print("%f %f " % (den[ik, isp, iorb, jorb].real,
-                                                  den[ik, isp, iorb, jorb].imag), end="", file=fo)
-                    print("", file=fo)
+            self._output.write_momdist(self._xk, den, spn)
             #
             # Output eigenvalue to a file
             #
-            with open(self._seedname + "_akw0.dat", 'w') as fo:
-                offset = 0.0
-                for isp in spn:
-                    for iorb in range(skt.n_orbitals[0, 0]):
-                        for ik in range(skt.n_k):
-                            print("%f %f" % (self._xk[ik]+offset, ev0[ik, 0, iorb]), file=fo)
-                            #  print("%f %f %f" % (self._xk[ik]+offset, ev0[ik, 0, iorb], ev[ik, 0, iorb]), file=fo)
-                        print("", file=fo)
-                    offset = self._xk[skt.n_k-1]*1.1
-                    print("", file=fo)
+            self._output.write_bands(self._xk, ev0[:, 0, :], spn)
 
 
 def __print_paramter(p, param_name):
@@ -332,18 +458,14 @@ def __generate_wannier90_model(params, n_k, kvec):
     #
     # Read hopping in the real space from the Wannier90 output
     #
-    w90c = Wannier90Converter(seedname=params["seedname"])
-    nr, rvec, rdeg, nwan, hamr = w90c.read_wannier90hr(params["seedname"]+"_hr.dat")
+    rvec, rdeg, hamr = read_wannier90_hr(params["seedname"]+"_hr.dat")
+    nwan = hamr.shape[1]
     #
     # Fourier transformation of the one-body Hamiltonian
     #
     n_orbitals = numpy.ones([n_k, n_spin], numpy.int) * nwan
     hopping = numpy.zeros([n_k, n_spin, numpy.max(n_orbitals), numpy.max(n_orbitals)], numpy.complex_)
-    for ik in range(n_k):
-        for ir in range(nr):
-            rdotk = numpy.dot(kvec[ik, :], rvec[ir, :])
-            factor = (numpy.cos(rdotk) + 1j * numpy.sin(rdotk)) / float(rdeg[ir])
-            hopping[ik, 0, :, :] += factor * hamr[ir][:, :]
+    hopping[:, 0, :, :] = fourier_ham(kvec, rvec, rdeg, hamr)
     #
     # proj_mat is (norb*norb) identities at each correlation shell
     #
@@ -423,6 +545,35 @@ def __generate_lattice_model(params, n_k, kvec):
     return hopping, n_orbitals, proj_mat
 
 
+def __bands_fingerprint(params, kvec):
+    """
+    Hash of everything which determines dft_bands_input:
+    the k-path, the reciprocal lattice vectors and the model (including the content of seedname_hr.dat)
+
+    Parameters
+    ----------
+    params : dictionary
+        Input parameters
+    kvec : float array
+        k-points where A(k,w) is computed
+
+    Returns
+    -------
+    string
+    """
+    h = hashlib.sha1()
+    model = params["model"]
+    for value in [model["lattice"], model["norb"], model["ncor"], model["t"], model["t'"], model["bvec"],
+                  params["tool"]["knode"], params["tool"]["nk_line"]]:
+        h.update(repr(value).encode('utf-8'))
+    h.update(numpy.ascontiguousarray(kvec).tobytes())
+    if model["lattice"] == 'wannier90':
+        with open(model["seedname"] + "_hr.dat", 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
 def dcore_post(filename):
     """
     Main routine for the post-processing tool
@@ -523,32 +674,43 @@ def dcore_post(filename):
     #
     # HDF5 file for band
     #
+    fingerprint = None
     if mpi.is_master_node():
-        #
-        # Compute k-dependent Hamiltonian
-        #
         print("\n#############  Compute k-dependent Hamiltonian  ########################\n")
-        if p["model"]["lattice"] == 'wannier90':
-            hopping, n_orbitals, proj_mat = __generate_wannier90_model(p["model"], n_k, kvec)
-        else:
-            hopping, n_orbitals, proj_mat = __generate_lattice_model(p["model"], n_k, kvec)
-        #
-        # Output them into seedname.h5
-        #
+        fingerprint = __bands_fingerprint(p, kvec)
         f = HDFArchive(seedname+'.h5', 'a')
         if not ("dft_bands_input" in f):
             f.create_group("dft_bands_input")
-        f["dft_bands_input"]["hopping"] = hopping
-        f["dft_bands_input"]["n_k"] = n_k
-        f["dft_bands_input"]["n_orbitals"] = n_orbitals
-        f["dft_bands_input"]["proj_mat"] = proj_mat
+        if "fingerprint" in f["dft_bands_input"] and f["dft_bands_input"]["fingerprint"] == fingerprint:
+            #
+            # The k-path and the model are unchanged since the last run
+            #
+            print("    Reuse dft_bands_input in {0}".format(seedname+'.h5'))
+        else:
+            #
+            # Compute k-dependent Hamiltonian
+            #
+            if p["model"]["lattice"] == 'wannier90':
+                hopping, n_orbitals, proj_mat = __generate_wannier90_model(p["model"], n_k, kvec)
+            else:
+                hopping, n_orbitals, proj_mat = __generate_lattice_model(p["model"], n_k, kvec)
+            #
+            # Output them into seedname.h5
+            #
+            f["dft_bands_input"]["hopping"] = hopping
+            f["dft_bands_input"]["n_k"] = n_k
+            f["dft_bands_input"]["n_orbitals"] = n_orbitals
+            f["dft_bands_input"]["proj_mat"] = proj_mat
+            f["dft_bands_input"]["fingerprint"] = fingerprint
         del f
         print("    Done")
+    fingerprint = mpi.bcast(fingerprint)
     #
     # Plot
     #
     mpi.barrier()
-    dct = DMFTCoreTools(seedname, p, n_k, xk)
+    dct = DMFTCoreTools(seedname, p, n_k, xk, fingerprint)
+    dct.save_kpath(kvec, klabel, xk_label)
     dct.post()
     dct.momentum_distribution()
     #
@@ -23,9 +23,10 @@ import numpy
 import argparse
 import re
 from pytriqs.archive.hdf_archive import HDFArchive
-from pytriqs.applications.dft.converters.wannier90_converter import Wannier90Converter
-from pytriqs.applications.dft.converters.hk_converter import HkConverter
 from program_options import create_parser
+import lattice_model
+from hr_reader import read_wannier90_hr, write_wannier90_hr
+from wannier90_model import fourier_ham
 import pytriqs.utility.mpi as mpi
 from pytriqs.operators.util.U_matrix import U_J_to_radial_integrals, U_matrix, eg_submatrix, t2g_submatrix
 
@@ -34,16 +35,20 @@ def __print_paramter(p, param_name):
     print(param_name + " = " + str(p[param_name]))
 
 
-def __generate_wannier90_model(params, f):
+def __generate_wannier90_model(params, rvec, rdeg, hamr):
     """
-    Compute hopping etc. for A(k,w) of Wannier90
+    Compute hopping etc. of a Wannier90 model and write them into seedname.h5
 
     Parameters
     ----------
     params : dictionary
         Input parameters
-    f : File stream
-        file
+    rvec : integer array [nr, 3]
+        Lattice vectors R
+    rdeg : integer array [nr]
+        Degeneracy of each R
+    hamr : complex array [nr, nwan, nwan]
+        H(R) read from seedname_hr.dat
     """
     #
     # Number of orbitals in each shell
@@ -89,19 +94,57 @@ def __generate_wannier90_model(params, f):
         assert equiv[i] >= 0
         print("    norb[{0}], equiv[{0}] = {1}, {2}".format(i, norb[i], equiv[i]))
     print("")
+    nwan = hamr.shape[1]
+    if nwan < sum(norb):
+        print("Error ! The number of Wannier functions is smaller than the number of correlated orbitals.")
+        sys.exit(-1)
+    #
+    # Uniform k-mesh (the same order as Wannier90Converter)
+    # If H(R) is real, H(-k) = H(k)^T and only one of k and -k is kept.
+    # The values of Im H(R) below the precision of seedname_hr.dat are regarded as zero.
+    # With the spin-orbit coupling or the non-collinear magnetism, Sigma is not symmetric in general
+    # (e.g. the sigma_y component), and the full k-mesh is kept.
+    #
+    time_reversal = False
+    if params["system"]["irreducible_k"]:
+        if params["model"]["spin_orbit"] or params["model"]["non_colinear"]:
+            print("Warning ! Sigma can break the time-reversal symmetry with spin_orbit or non_colinear."
+                  " The full k-mesh is used.")
+        elif not lattice_model.time_reversal_exact(hamr=hamr):
+            print("Warning ! H(R) is not real. The full k-mesh is used.")
+        else:
+            time_reversal = True
+    if time_reversal:
+        k_frac, multiplicity = lattice_model.time_reversal_kmesh(nk0, nk1, nk2)
+        bz_weights = multiplicity / float(nk0 * nk1 * nk2)
+    else:
+        k_frac = numpy.indices((nk0, nk1, nk2)).reshape(3, -1).transpose() / numpy.array([nk0, nk1, nk2], numpy.float_)
+        bz_weights = numpy.ones(k_frac.shape[0], numpy.float_) / k_frac.shape[0]
+    n_k = k_frac.shape[0]
+    print("    Total number of k =", str(n_k))
+    hopping = numpy.zeros([n_k, 1, nwan, nwan], numpy.complex_)
+    hopping[:, 0, :, :] = fourier_ham(2.0 * numpy.pi * k_frac, rvec, rdeg, hamr)
     #
-    # Generate file for Wannier90-Converter
+    # Write them directly in the same format as Wannier90Converter
     #
-    print("0 {0} {1} {2}".format(nk0, nk1, nk2), file=f)
-    print(params["model"]["nelec"], file=f)
-    print(ncor, file=f)
-    for i in range(ncor):
-        print("{0} {1} {2} {3} 0 0".format(i, equiv[i], 0, norb[i]), file=f)
+    hdf_filename = params["model"]["seedname"] + ".h5"
+    hamr0 = hamr[numpy.all(rvec == 0, axis=1)][0]
+    __write_wannier90_dft_input(hdf_filename, float(params["model"]["nelec"]),
+                                hopping, bz_weights, norb, equiv, hamr0)
+    if time_reversal:
+        __write_time_reversal_symmetry(hdf_filename, norb, equiv)
 
 
 def para2noncol(params):
     """
     Duplicate orbitals when we perform non-colinear DMFT from the colinear DFT calculation.
+
+    Returns
+    -------
+    rvec : integer array [nr, 3]
+    rdeg : integer array [nr]
+    hamr : complex array [nr, 2*nwan, 2*nwan]
+        The non-collinear H(R), which is also written into seedname_hr.dat
     """
     ncor = params["model"]['ncor']
     norb_list = re.findall(r'\d+', params["model"]["norb"])
@@ -109,8 +152,8 @@ def para2noncol(params):
     #
     # Read Wannier90 file
     #
-    w90 = Wannier90Converter(seedname=params["model"]["seedname"])
-    nr, rvec, rdeg, nwan, hamr = w90.read_wannier90hr(params["model"]["seedname"] + "_col_hr.dat")
+    rvec, rdeg, hamr = read_wannier90_hr(params["model"]["seedname"] + "_col_hr.dat")
+    nr, nwan = hamr.shape[0], hamr.shape[1]
     #
     # Non correlated shell
     #
@@ -118,165 +161,295 @@ def para2noncol(params):
     norb_tot = sum(norb)
     norb.append(nwan - norb_tot)
     #
+    # Original orbital and spin of each orbital of the non-collinear Hamiltonian.
+    # The orbitals are ordered as (shell, spin, orbital).
+    #
+    orb_col = []
+    spin = []
+    start = 0
+    for icor in range(ncor):
+        for ispin in range(2):
+            orb_col += range(start, start + norb[icor])
+            spin += [ispin] * norb[icor]
+        start += norb[icor]
+    orb_col = numpy.array(orb_col)
+    spin = numpy.array(spin)
+    #
+    # Hopping is diagonal in spin
+    #
+    hamr2 = numpy.where(spin[None, :, None] == spin[None, None, :], hamr[:, orb_col[:, None], orb_col[None, :]], 0.0)
+    #
     # Output new wannier90 file
     #
-    with open(params["model"]["seedname"] + "_hr.dat", 'w') as f:
-
-        print("Converted from Para to Non-collinear", file=f)
-        print(nwan*2, file=f)
-        print(nr, file=f)
-        for ir in range(nr):
-            print("%5d" % rdeg[ir], end="", file=f)
-            if ir % 15 == 14:
-                print("", file=f)
-        if nr % 15 != 0:
-            print("", file=f)
-        #
-        # Hopping
-        #
-        for ir in range(nr):
-            iorb1 = 0
-            iorb2 = 0
-            for icor in range(ncor):
-                for ispin in range(2):
-                    iorb1 -= ispin * norb[icor]
-                    for iorb in range(norb[icor]):
-                        iorb1 += 1
-                        iorb2 += 1
-                        jorb1 = 0
-                        jorb2 = 0
-                        for jcor in range(ncor):
-                            for jspin in range(2):
-                                jorb1 -= jspin * norb[jcor]
-                                for jorb in range(norb[jcor]):
-                                    jorb1 += 1
-                                    jorb2 += 1
-                                    if ispin == jspin:
-                                        hamr2 = hamr[ir][jorb1-1, iorb1-1]
-                                    else:
-                                        hamr2 = 0.0 + 0.0j
-                                    print("%5d%5d%5d%5d%5d%12.6f%12.6f" %
-                                          (rvec[ir, 0], rvec[ir, 1], rvec[ir, 2], jorb2, iorb2,
-                                           hamr2.real, hamr2.imag), file=f)
-
-
-def __generate_lattice_model(params, f):
+    write_wannier90_hr(params["model"]["seedname"] + "_hr.dat", rvec, rdeg, hamr2,
+                       "Converted from Para to Non-collinear")
+    return rvec, rdeg, hamr2
+
+
+def __generate_lattice_model(params):
     """
-    Compute hopping etc. for A(k,w) of preset models
+    Compute hopping etc. of preset models and write them into seedname.h5
 
     Parameters
     ----------
     params : dictionary
             Input parameters
-    Returns
-    -------
-    weights_in_file: Bool
-        Weights for the bethe lattice
     """
-    weights_in_file = False
-    if params["model"]["lattice"] == 'chain':
-        nkbz = params["system"]["nk"]
-    elif params["model"]["lattice"] == 'square':
-        nkbz = params["system"]["nk"]**2
-    elif params["model"]["lattice"] == 'cubic':
-        nkbz = params["system"]["nk"]**3
-    elif params["model"]["lattice"] == 'bethe':
-        nkbz = params["system"]["nk"]
-        weights_in_file = True
-    else:
-        print("Error ! Invalid lattice : ", params["model"]["lattice"])
+    lattice = params["model"]["lattice"]
+    if lattice not in ['chain', 'square', 'cubic', 'bethe']:
+        print("Error ! Invalid lattice : ", lattice)
         sys.exit(-1)
-    print("\n    Total number of k =", str(nkbz))
     #
     # Model
     #
     norb = int(params["model"]["norb"])
-    #
-    # Write General-Hk formatted file
-    #
-    print(nkbz, file=f)
-    print(params["model"]["nelec"], file=f)
-    print("1", file=f)
-    print("0 0 {0} {1}".format(0, norb), file=f)
-    print("1", file=f)
-    print("0 0 {0} {1} 0 0".format(0, norb), file=f)
-    print("1 {0}".format(norb), file=f)
-
     t = params["model"]["t"]
     tp = params["model"]["t'"]
     nk = params["system"]["nk"]
+    #
+    # Energy band. For the Bethe lattice, k-weights are chosen to generate semi-circular DOS
+    #
+    n_dos = params["system"]["n_dos"]
+    use_dos = n_dos > 0 and lattice != 'bethe'
+    hopping, bz_weights = lattice_model.generate_hopping(lattice, t, tp, nk, norb,
+                                                         irreducible=params["system"]["irreducible_k"] or use_dos)
+    nkbz = hopping.shape[0]
+    print("\n    Total number of k =", str(nkbz))
+    #
+    # Replace the k-mesh by the energy-binned DOS, and check its convergence
+    #
+    if use_dos:
+        ek = hopping[:, 0, 0, 0].real
+        levels, level_weights = lattice_model.binned_levels(ek, bz_weights, n_dos, params["system"]["dos_smearing"])
+        deviation = lattice_model.matsubara_deviation(ek, bz_weights, levels, level_weights, params["system"]["beta"])
+        print("    Number of energy levels of the binned DOS =", len(levels))
+        print("    Max |G_dos(iw) - G_k(iw)| at the lowest Matsubara frequencies =", deviation)
+        if deviation > 1.0e-3:
+            print("Warning ! The binned DOS may not be converged. Increase n_dos or decrease dos_smearing.")
+        hopping = lattice_model.diagonal_hopping(levels, norb)
+        bz_weights = level_weights
+    #
+    # Write them directly in the same format as HkConverter
+    #
+    __write_dft_input(params["model"]["seedname"] + ".h5", float(params["model"]["nelec"]), hopping, bz_weights)
 
+
+def __write_dft_input(hdf_filename, nelec, hopping, bz_weights):
+    """
+    Write the dft_input group for a single correlated shell spanning all orbitals.
+    The data structure is the same as the one generated by HkConverter.
+
+    Parameters
+    ----------
+    hdf_filename : string
+        Name of the HDF5 file
+    nelec : float
+        Number of electrons per unit cell
+    hopping : complex array [n_k, 1, norb, norb]
+        One-body Hamiltonian
+    bz_weights : float array [n_k]
+        Normalized weight of each k
+    """
+    n_k, n_spin_blocs, norb = hopping.shape[0:3]
+    shells = [{'atom': 0, 'sort': 0, 'l': 0, 'dim': norb}]
+    corr_shells = [{'atom': 0, 'sort': 0, 'l': 0, 'dim': norb, 'SO': 0, 'irep': 0}]
+    sqrt2 = 1.0 / numpy.sqrt(2.0)
+    dft_input = {
+        'energy_unit': 1.0,
+        'n_k': n_k,
+        'k_dep_projection': 0,
+        'SP': 0,
+        'SO': 0,
+        'charge_below': 0.0,
+        'density_required': nelec,
+        'symm_op': 0,
+        'n_shells': 1,
+        'shells': shells,
+        'n_corr_shells': 1,
+        'corr_shells': corr_shells,
+        'use_rotations': 0,
+        'rot_mat': [numpy.identity(norb, numpy.complex_)],
+        'rot_mat_time_inv': [0],
+        'n_reps': [1],
+        'dim_reps': [[norb]],
+        'T': [numpy.array([[0.0, 0.0, 1.0, 0.0, 0.0],
+                           [sqrt2, 0.0, 0.0, 0.0, sqrt2],
+                           [-sqrt2, 0.0, 0.0, 0.0, sqrt2],
+                           [0.0, sqrt2, 0.0, -sqrt2, 0.0],
+                           [0.0, sqrt2, 0.0, sqrt2, 0.0]])],
+        'n_orbitals': numpy.ones([n_k, n_spin_blocs], numpy.int) * norb,
+        'proj_mat': numpy.zeros([n_k, n_spin_blocs, 1, norb, norb], numpy.complex_),
+        'bz_weights': bz_weights,
+        'hopping': hopping,
+        'n_inequiv_shells': 1,
+        'corr_to_inequiv': [0],
+        'inequiv_to_corr': [0],
+    }
+    dft_input['proj_mat'][:, :, 0, :, :] = numpy.identity(norb, numpy.complex_)
+    __save_dft_input(hdf_filename, dft_input)
+
+
+def __write_wannier90_dft_input(hdf_filename, nelec, hopping, bz_weights, norb, equiv, hamr0):
+    """
+    Write the dft_input group for correlated shells occupying the first Wannier functions.
+    The data structure is the same as the one generated by Wannier90Converter.
+
+    Parameters
+    ----------
+    hdf_filename : string
+        Name of the HDF5 file
+    nelec : float
+        Number of electrons per unit cell
+    hopping : complex array [n_k, 1, nwan, nwan]
+        One-body Hamiltonian
+    bz_weights : float array [n_k]
+        Normalized weight of each k
+    norb : list of int
+        Number of orbitals in each correlated shell
+    equiv : list of int
+        Equivalence class of each correlated shell
+    hamr0 : complex array [nwan, nwan]
+        H(R=0), from which the rotation to the representative shell is determined
+    """
+    n_k, n_spin_blocs, nwan = hopping.shape[0:3]
+    ncor = len(norb)
+    corr_shells = [{'atom': icor, 'sort': equiv[icor], 'l': 0, 'dim': norb[icor], 'SO': 0, 'irep': 0}
+                   for icor in range(ncor)]
+    shells = [{'atom': icor, 'sort': equiv[icor], 'l': 0, 'dim': norb[icor]} for icor in range(ncor)]
+    #
+    # Inequivalent shells
+    #
+    inequiv_to_corr = []
+    corr_to_inequiv = []
+    for icor in range(ncor):
+        sorts = [equiv[jcor] for jcor in inequiv_to_corr]
+        if equiv[icor] in sorts:
+            corr_to_inequiv.append(sorts.index(equiv[icor]))
+        else:
+            corr_to_inequiv.append(len(inequiv_to_corr))
+            inequiv_to_corr.append(icor)
+    n_inequiv_shells = len(inequiv_to_corr)
+    #
+    # Projectors: the correlated shells are the first Wannier functions in this order
+    #
+    offset = numpy.cumsum([0] + norb)
+    proj_mat = numpy.zeros([n_k, n_spin_blocs, ncor, max(norb), nwan], numpy.complex_)
+    for icor in range(ncor):
+        proj_mat[:, :, icor, 0:norb[icor], offset[icor]:offset[icor+1]] = numpy.identity(norb[icor], numpy.complex_)
     #
-    # Energy band
+    # Rotation from each shell to its representative, from the eigenvectors of the local Hamiltonian
     #
-    if params["model"]["lattice"] == 'bethe':
+    eigval = []
+    eigvec = []
+    for icor in range(ncor):
+        e, v = numpy.linalg.eigh(hamr0[offset[icor]:offset[icor+1], offset[icor]:offset[icor+1]])
+        eigval.append(e)
+        eigvec.append(v)
+    rot_mat = []
+    for icor in range(ncor):
+        irep = inequiv_to_corr[corr_to_inequiv[icor]]
+        if numpy.allclose(eigval[icor], eigval[irep], atol=1.0e-5):
+            rot_mat.append(numpy.dot(eigvec[icor], eigvec[irep].conj().transpose()))
+        else:
+            print("Warning ! Local Hamiltonian of shell {0} differs from that of shell {1}.".format(icor, irep))
+            print("          Rotation is not used for shell {0}.".format(icor))
+            rot_mat.append(numpy.identity(norb[icor], numpy.complex_))
+
+    dft_input = {
+        'energy_unit': 1.0,
+        'n_k': n_k,
+        'k_dep_projection': 0,
+        'SP': 0,
+        'SO': 0,
+        'charge_below': 0,
+        'density_required': nelec,
+        'symm_op': 0,
+        'n_shells': ncor,
+        'shells': shells,
+        'n_corr_shells': ncor,
+        'corr_shells': corr_shells,
+        'use_rotations': 1,
+        'rot_mat': rot_mat,
+        'rot_mat_time_inv': [0] * ncor,
+        'n_reps': [1] * n_inequiv_shells,
+        'dim_reps': [0] * n_inequiv_shells,
+        'T': [numpy.zeros([1, 1], numpy.complex_) for ish in range(n_inequiv_shells)],
+        'n_orbitals': numpy.ones([n_k, n_spin_blocs], numpy.int) * nwan,
+        'proj_mat': proj_mat,
+        'bz_weights': bz_weights,
+        'hopping': hopping,
+        'n_inequiv_shells': n_inequiv_shells,
+        'corr_to_inequiv': corr_to_inequiv,
+        'inequiv_to_corr': inequiv_to_corr,
+    }
+    __save_dft_input(hdf_filename, dft_input)
+
+
+def __write_time_reversal_symmetry(hdf_filename, norb, equiv):
+    """
+    Write the dft_symmcorr_input group read by the Symmetry class of DFTTools,
+    and turn on symm_op in dft_input. DCore/time_reversal_kmesh is set to True.
+    The two operations (identity and time reversal) symmetrize the local quantities as (G + G^T)/2,
+    which recovers the contributions of the k-points removed by the time-reversal symmetry.
+
+    Parameters
+    ----------
+    hdf_filename : string
+        Name of the HDF5 file
+    norb : list of int
+        Number of orbitals in each correlated shell
+    equiv : list of int
+        Equivalence class of each correlated shell
+    """
+    ncor = len(norb)
+    orbits = [{'atom': icor, 'sort': equiv[icor], 'l': 0, 'dim': norb[icor], 'SO': 0, 'irep': 0}
+              for icor in range(ncor)]
+    mat = [numpy.identity(norb[icor], numpy.complex_) for icor in range(ncor)]
+    #
+    # Symmetry maps the shell on the atom a to that on perm[a-1].
+    # Atoms are numbered from 0 here, so that the identity permutation is shifted by one.
+    #
+    perm = [(icor + 1) % ncor for icor in range(ncor)]
+    symmcorr_input = {
+        'n_symm': 2,
+        'n_atoms': ncor,
+        'perm': [perm, perm],
+        'orbits': orbits,
+        'SO': 0,
+        'SP': 0,
+        'time_inv': [0, 1],
+        'mat': [mat, mat],
+        'mat_tinv': mat,
+    }
+    with HDFArchive(hdf_filename, 'a') as ar:
+        if not ("dft_symmcorr_input" in ar):
+            ar.create_group("dft_symmcorr_input")
+        for key, value in symmcorr_input.items():
+            ar["dft_symmcorr_input"][key] = value
+        ar["dft_input"]["symm_op"] = 1
         #
-        # If Bethe lattice, set k-weight manually to generate semi-circular DOS
+        # dmft_core checks that Sigma does not break this symmetry
         #
-        for i0 in range(nk):
-            ek = float(2*i0 + 1 - nk) / float(nk)
-            wk = numpy.sqrt(1.0 - ek**2)
-            print("{0}".format(wk), file=f)
-        for i0 in range(nk):
-            ek = 2.0 * t * float(2*i0 + 1 - nk) / float(nk)
-            for iorb in range(norb):
-                for jorb in range(norb):
-                    if iorb == jorb:
-                        print("{0}".format(ek), file=f)  # Real part
-                    else:
-                        print("0.0", file=f)  # Real part
-            for iorb in range(norb*norb):
-                print("0.0", file=f)  # Imaginary part
-    elif params["model"]["lattice"] == 'chain':
-        kvec = [0.0, 0.0, 0.0]
-        for i0 in range(nk):
-            kvec[0] = 2.0 * numpy.pi * float(i0) / float(nk)
-            ek = 2.0*t*numpy.cos(kvec[0]) + 2*tp*numpy.cos(2.0*kvec[0])
-            for iorb in range(norb):
-                for jorb in range(norb):
-                    if iorb == jorb:
-                        print("{0}".format(ek), file=f)  # Real part
-                    else:
-                        print("0.0", file=f)  # Real part
-            for iorb in range(norb*norb):
-                print("0.0", file=f)  # Imaginary part
-    elif params["model"]["lattice"] == 'square':
-        kvec = [0.0, 0.0, 0.0]
-        for i0 in range(nk):
-            kvec[0] = 2.0 * numpy.pi * float(i0) / float(nk)
-            for i1 in range(nk):
-                kvec[1] = 2.0 * numpy.pi * float(i1) / float(nk)
-                ek = 2.0*t*(numpy.cos(kvec[0]) + numpy.cos(kvec[1])) \
-                    + 2.0*tp*(numpy.cos(kvec[0] + kvec[1]) + numpy.cos(kvec[0] - kvec[1]))
-                for iorb in range(norb):
-                    for jorb in range(norb):
-                        if iorb == jorb:
-                            print("{0}".format(ek), file=f)  # Real part
-                        else:
-                            print("0.0", file=f)  # Real part
-                for iorb in range(norb*norb):
-                    print("0.0", file=f)  # Imaginary part
-    elif params["model"]["lattice"] == 'cubic':
-        kvec = [0.0, 0.0, 0.0]
-        for i0 in range(nk):
-            kvec[0] = 2.0 * numpy.pi * float(i0) / float(nk)
-            for i1 in range(nk):
-                kvec[1] = 2.0 * numpy.pi * float(i1) / float(nk)
-                for i2 in range(nk):
-                    kvec[2] = 2.0 * numpy.pi * float(i2) / float(nk)
-                    ek = 2*t*(numpy.cos(kvec[0]) + numpy.cos(kvec[1]) + numpy.cos(kvec[2])) \
-                        + 2*tp*(numpy.cos(kvec[0] + kvec[1]) + numpy.cos(kvec[0] - kvec[1])
-                                + numpy.cos(kvec[1] + kvec[2]) + numpy.cos(kvec[1] - kvec[2])
-                                + numpy.cos(kvec[2] + kvec[0]) + numpy.cos(kvec[2] - kvec[0]))
-                    for iorb in range(norb):
-                        for jorb in range(norb):
-                            if iorb == jorb:
-                                print("{0}".format(ek), file=f)  # Real part
-                            else:
-                                print("0.0", file=f)  # Real part
-                    for iorb in range(norb*norb):
-                        print("0.0", file=f)  # Imaginary part
-    return weights_in_file
+        if not ("DCore" in ar):
+            ar.create_group("DCore")
+        ar["DCore"]["time_reversal_kmesh"] = True
+
+
+def __save_dft_input(hdf_filename, dft_input):
+    """
+    Write the contents of the dft_input group
+
+    Parameters
+    ----------
+    hdf_filename : string
+        Name of the HDF5 file
+    dft_input : dict
+    """
+    with HDFArchive(hdf_filename, 'a') as ar:
+        if not ("dft_input" in ar):
+            ar.create_group("dft_input")
+        for key, value in dft_input.items():
+            ar["dft_input"][key] = value
 
 
 def __generate_umat(p):
@@ -434,10 +607,10 @@ def __generate_umat(p):
             else:
                 u_mat[icor] = umat_full
     elif p["model"]["interaction"] == 'respack':
-        w90u = Wannier90Converter(seedname=p["model"]["seedname"])
-        nr_u, rvec_u, rdeg_u, nwan_u, hamr_u = w90u.read_wannier90hr(p["model"]["seedname"] + "_ur.dat")
-        w90j = Wannier90Converter(seedname=p["model"]["seedname"])
-        nr_j, rvec_j, rdeg_j, nwan_j, hamr_j = w90j.read_wannier90hr(p["model"]["seedname"] + "_jr.dat")
+        rvec_u, rdeg_u, hamr_u = read_wannier90_hr(p["model"]["seedname"] + "_ur.dat")
+        nr_u, nwan_u = hamr_u.shape[0], hamr_u.shape[1]
+        rvec_j, rdeg_j, hamr_j = read_wannier90_hr(p["model"]["seedname"] + "_jr.dat")
+        nr_j, nwan_j = hamr_j.shape[0], hamr_j.shape[1]
         #
         # Read 2-index U-matrix
         #
@@ -531,19 +704,12 @@ def dcore_pre(filename):
             p["model"]["non_colinear"] = False
         #
         if p["model"]["non_colinear"]:
-            para2noncol(p)
-        with open(seedname+'.inp', 'w') as f:
-            __generate_wannier90_model(p, f)
-        # Convert General-Hk to SumDFT-HDF5 format
-        converter = Wannier90Converter(seedname=seedname)
-        converter.convert_dft_input()
+            rvec, rdeg, hamr = para2noncol(p)
+        else:
+            rvec, rdeg, hamr = read_wannier90_hr(seedname + "_hr.dat")
+        __generate_wannier90_model(p, rvec, rdeg, hamr)
     else:
-        with open(seedname+'.inp', 'w') as f:
-            weights_in_file = __generate_lattice_model(p, f)
-        # Convert General-Hk to SumDFT-HDF5 format
-        converter = HkConverter(filename=seedname + ".inp", hdf_filename=seedname+".h5")
-        converter.convert_dft_input(weights_in_file=weights_in_file)
-    os.remove(seedname + ".inp")
+        __generate_lattice_model(p)
     #
     # Interaction
     #
@@ -26,6 +26,15 @@ from pytriqs.applications.dft.sumk_dft import *
 from pytriqs.operators import *
 import numpy
 from program_options import *
+from double_counting import compute_dc
+from output_archive import OutputArchive
+from shell_scheduler import ShellScheduler
+from atomic_lehmann import AtomicLehmann
+from lattice_model import time_reversal_exact
+from chemical_potential import ChemicalPotentialSolver, lattice_density
+from mixing import SigmaMixer
+from convergence import ConvergenceChecker, CycleSchedule, sigma_noise, legendre_sigma_noise
+from timing import TimerRegistry, print_timings
 
 
 def __gettype(name):
@@ -73,6 +82,124 @@ def symmetrize_spin(G):
     G[bnames[1]] = G_ave.copy()
 
 
+def lattice_sum(sk, with_dc=True):
+    """
+    Local Green's function, density matrix and total charge from a single pass over k.
+    This replaces the separate k-sums in SumkDFT.density_matrix and SumkDFT.extract_G_loc,
+    and follows the latter for the symmetrization, the rotation and the block structure.
+
+    Parameters
+    ----------
+    sk : SumkDFT
+        Sigma and the chemical potential must have been set
+    with_dc : bool, optional
+        Whether or not the double counting is subtracted
+
+    Returns
+    -------
+    g_loc_inequiv : list of BlockGf
+        Local Green's function of each inequivalent shell in the block structure of the solver
+    dens_mat : list of dict
+        Density matrix of each correlated shell in the local coordinate
+    total_charge : float
+        Number of electrons in the unit cell
+    """
+    g_loc = [sk.Sigma_imp_iw[icrsh].copy() for icrsh in range(sk.n_corr_shells)]
+    for icrsh in range(sk.n_corr_shells):
+        g_loc[icrsh].zero()
+    beta = g_loc[0].mesh.beta
+    total_charge = 0.0
+    for ik in mpi.slice_array(numpy.arange(sk.n_k)):
+        g_latt = sk.lattice_gf(ik=ik, mu=sk.chemical_potential, iw_or_w="iw", with_Sigma=True, with_dc=with_dc,
+                               beta=beta)
+        total_charge += sk.bz_weights[ik] * g_latt.total_density()
+        g_latt *= sk.bz_weights[ik]
+        for icrsh in range(sk.n_corr_shells):
+            tmp = g_loc[icrsh].copy()
+            for bname, gf in tmp:
+                tmp[bname] << sk.downfold(ik, icrsh, bname, g_latt[bname], gf)
+            g_loc[icrsh] += tmp
+    for icrsh in range(sk.n_corr_shells):
+        g_loc[icrsh] << mpi.all_reduce(mpi.world, g_loc[icrsh], lambda x, y: x + y)
+    total_charge = mpi.all_reduce(mpi.world, total_charge, lambda x, y: x + y).real
+
+    if sk.symm_op != 0:
+        g_loc = sk.symmcorr.symmetrize(g_loc)
+    if sk.use_rotations:
+        for icrsh in range(sk.n_corr_shells):
+            for bname, gf in g_loc[icrsh]:
+                g_loc[icrsh][bname] << sk.rotloc(icrsh, gf, direction='toLocal')
+    # The density matrix is linear in G, so that it is taken from the local Green's function
+    dens_mat = [g_loc[icrsh].density() for icrsh in range(sk.n_corr_shells)]
+
+    g_loc_inequiv = []
+    for ish in range(sk.n_inequiv_shells):
+        g = BlockGf(name_block_generator=[(block, GfImFreq(indices=inner, mesh=g_loc[0].mesh))
+                                          for block, inner in sk.gf_struct_solver[ish].iteritems()],
+                    make_copies=False)
+        for block, inner in sk.gf_struct_solver[ish].iteritems():
+            for ind1 in inner:
+                for ind2 in inner:
+                    block_sumk, ind1_sumk = sk.solver_to_sumk[ish][(block, ind1)]
+                    block_sumk, ind2_sumk = sk.solver_to_sumk[ish][(block, ind2)]
+                    g[block][ind1, ind2] << g_loc[sk.inequiv_to_corr[ish]][block_sumk][ind1_sumk, ind2_sumk]
+        g_loc_inequiv.append(g)
+    return g_loc_inequiv, dens_mat, total_charge
+
+
+def sparse_u_terms(u_mat, tol=1.0e-12):
+    """
+    Nonzero terms of the interaction (1/2) sum_{ijkl} U_{ijkl} c^dag_i c^dag_j c_l c_k.
+
+    Four terms related by i <-> j and k <-> l give the same operator up to sign.
+    They are merged into one term with i < j and k < l, and the terms below tol are dropped.
+
+    Parameters
+    ----------
+    u_mat : complex array [n, n, n, n]
+        4-index interaction matrix
+    tol : float, optional
+        Threshold for the matrix elements to be neglected
+
+    Returns
+    -------
+    terms : list of (i, j, k, l, coeff)
+        H = sum coeff c^dag_i c^dag_j c_l c_k
+    """
+    u_mat = numpy.asarray(u_mat)
+    u_anti = 0.5 * (u_mat - u_mat.transpose(1, 0, 2, 3) - u_mat.transpose(0, 1, 3, 2) + u_mat.transpose(1, 0, 3, 2))
+    n = u_mat.shape[0]
+    upper = numpy.triu(numpy.ones((n, n), dtype=bool), k=1)
+    mask = upper[:, :, None, None] & upper[None, None, :, :] & (numpy.abs(u_anti) > tol)
+    return [(int(i), int(j), int(k), int(l), u_anti[i, j, k, l]) for i, j, k, l in numpy.argwhere(mask)]
+
+
+def build_h_int(u_mat, index_name, tol=1.0e-12):
+    """
+    Construct the interaction Hamiltonian
+        H = (1/2) sum_{ijkl} U_{ijkl} c^dag_i c^dag_j c_l c_k
+    from the nonzero terms given by sparse_u_terms.
+
+    Parameters
+    ----------
+    u_mat : complex array [n, n, n, n]
+        4-index interaction matrix in the spin-orbital basis
+    index_name : list of (string, int)
+        Block name and inner index of each of the n spin-orbitals
+        (e.g. ('up', i) and ('down', i), or ('ud', i) with the spin-orbit coupling)
+    tol : float, optional
+        Threshold for the matrix elements to be neglected
+
+    Returns
+    -------
+    ham : Operator
+    """
+    ham = Operator()
+    for i1, i2, i3, i4, coeff in sparse_u_terms(u_mat, tol):
+        ham += coeff * c_dag(*index_name[i1]) * c_dag(*index_name[i2]) * c(*index_name[i4]) * c(*index_name[i3])
+    return ham
+
+
 class DMFTCoreSolver:
     def __init__(self, seedname, params):
         """
@@ -86,10 +213,15 @@ class DMFTCoreSolver:
             Input parameters
         """
         self._params = copy.deepcopy(params)
+        # Cache of the interaction Hamiltonian at each inequivalent shell
+        self._h_int_cache = {}
         # Construct a SumKDFT object
         self.SK = SumkDFT(hdf_file=seedname+'.h5', use_dft_blocks=False, h_field=0.0)
         u_file = HDFArchive(seedname+'.h5', 'r')
         self.Umat = u_file["DCore"]["Umat"]
+        # Whether the k-mesh is reduced by the time-reversal symmetry (see irreducible_k)
+        self._time_reversal_kmesh = "time_reversal_kmesh" in u_file["DCore"] \
+            and bool(u_file["DCore"]["time_reversal_kmesh"])
 
         # Construct an impurity solver
         beta = float(params['system']['beta'])
@@ -132,6 +264,10 @@ class DMFTCoreSolver:
             else:
                 raise RuntimeError("Unknown solver "+self.solver_name)
 
+        # Assignment of the shells to the processes (only for the Hubbard-I solver)
+        self._scheduler = ShellScheduler([self.SK.corr_shells[self.SK.inequiv_to_corr[ish]]['dim'] * (2 - self.SK.SO)
+                                          for ish in range(self.SK.n_inequiv_shells)])
+
     # Make read-only getter
     @property
     def Solver(self):
@@ -144,8 +280,29 @@ class DMFTCoreSolver:
         self.SK.chemical_potential = self._params['system']['mu']
 
         sigma_mix = self._params['control']['sigma_mix']  # Mixing factor of Sigma after solution of the AIM
+        mixing = self._params['control']['mixing']
+        mixing_history = self._params['control']['mixing_history']
+        mixer = SigmaMixer(mixing, sigma_mix, mixing_history)
+        checker = ConvergenceChecker(self._params['control']['converge_sigma'],
+                                     self._params['control']['converge_mu'],
+                                     self._params['control']['converge_occupation'],
+                                     self._params['control']['converge_noise'])
+        #
+        # Schedule of the number of QMC cycles
+        #
+        schedule = None
+        if self._params['control']['n_cycles_initial'] > 0:
+            if self.solver_name == "TRIQS/hubbard-I" or 'n_cycles' not in self._solver_params:
+                mpi.report("Warning ! n_cycles_initial is ignored because n_cycles of the QMC solver is not given.")
+            else:
+                schedule = CycleSchedule(self._params['control']['n_cycles_initial'], self._solver_params['n_cycles'],
+                                         self._params['control']['n_cycles_growth'],
+                                         self._params['control']['n_cycles_ratio'])
 
         prec_mu = self._params['system']['prec_mu']
+        mu_solver = self._params['system']['mu_solver']
+        if mu_solver not in ['bisection', 'newton']:
+            raise RuntimeError("Unknown mu_solver : " + mu_solver)
 
         previous_runs = 0
         nsh = self.SK.n_inequiv_shells
@@ -154,40 +311,28 @@ class DMFTCoreSolver:
         sk = self.SK
         s = self.S
 
-        # Set up a HDF file for output
+        # Set up a HDF file for output. It is kept open until the end of the run.
+        # The file is opened on the master node inside the try block, so that a failure is broadcast.
+        output = None
         error = 0
-        if mpi.is_master_node():
-            try:
-                with HDFArchive(output_file, 'a') as f:
-                    if output_group in f:
-                        if self._params['control']['restart']:
-                            ar = f[output_group]
-                            if 'iterations' not in ar:
-                                raise RuntimeError("Failed to restart the previous simulation!")
-
-                            previous_runs = ar['iterations']
-                            if ar['iterations'] <= 0:
-                                raise RuntimeError("No previous runs to be loaded from " + output_file + "!")
-                            print("Loading Sigma_iw... ")
-                            for ish in range(nsh):
-                                s[ish].Sigma_iw << ar['Sigma_iw'][str(ar['iterations'])][str(ish)]
-                        else:
-                            del f[output_group]
-                            f.create_group(output_group)
-                    else:
-                        f.create_group(output_group)
-                    f[output_group]['parameters'] = self._params
-                    #
-                    # Sub group for something
-                    #
-                    for gname in ['Sigma_iw', 'G_l', 'chemical_potential']:
-                        if not (gname in f[output_group]):
-                            f[output_group].create_group(gname)
-            except Exception as e:
-                error = 1
-                print("Error occurred in IO of a HDF file: " + str(e))
-        error = mpi.bcast(error)
+        try:
+            output = OutputArchive(output_file, output_group,
+                                   sigma_history=self._params['control']['sigma_history'],
+                                   sigma_history_n=self._params['control']['sigma_history_n'],
+                                   compression=self._params['control']['h5_compression'])
+            if mpi.is_master_node():
+                previous_runs = output.prepare(self._params)
+                if previous_runs > 0:
+                    print("Loading Sigma_iw... ")
+                    for ish in range(nsh):
+                        s[ish].Sigma_iw << output.load_sigma(previous_runs, ish)
+        except Exception as e:
+            error = 1
+            print("Error occurred in IO of a HDF file: " + str(e))
+        error = mpi.all_reduce(mpi.world, error, lambda x, y: x + y)
         if error != 0:
+            if output is not None:
+                output.close()
             return
 
         previous_runs = mpi.bcast(previous_runs)
@@ -202,26 +347,82 @@ class DMFTCoreSolver:
                 sk.dc_imp = mpi.bcast(sk.dc_imp)
                 sk.dc_energ = mpi.bcast(sk.dc_energ)
 
+        # History of the mixing and the convergence in the previous run
+        if previous_present and mixing != 'linear':
+            for sigma_in, sigma_out in mpi.bcast(output.load_mixing()):
+                mixer.add(sigma_in, sigma_out)
+        if previous_present:
+            metrics = mpi.bcast(output.load_convergence())
+            if metrics is not None:
+                checker.set_previous(metrics)
+                if schedule is not None and 'n_cycles' in metrics:
+                    schedule.restore(metrics['n_cycles'], metrics['sigma'])
+
+        # Impurity problems already solved in the interrupted iteration
+        checkpoint_mu, checkpoint_shells = None, {}
+        if self._params['control']['restart']:
+            checkpoint_mu, checkpoint_shells = mpi.bcast(output.load_checkpoint(previous_runs+1))
+
+        # The Newton solver keeps dN/dmu across iterations
+        if mu_solver == 'newton':
+            newton_mu = ChemicalPotentialSolver(lambda mu: lattice_density(sk, mu), prec_mu)
+
+        # Wall time, CPU time and memory of each phase of an iteration
+        timer = TimerRegistry()
+
         t0 = time.time()
         for iteration_number in range(previous_runs+1, previous_runs+max_step+1):
             sys.stdout.flush()
+            timer.reset()
             mpi.report("\n#####################################################################",
                        "########################  Iteration = %5d  ########################" % iteration_number,
                        "#####################################################################\n")
 
+            resume = iteration_number == previous_runs+1 and checkpoint_mu is not None
+            if resume:
+                mpi.report("Resume the iteration from the checkpoint (solved shells : {0})".format(
+                    sorted(checkpoint_shells.keys())))
+
             mpi.report("\n@@@@@@@@@@@@@@@@@@@@@@@@  Chemical potential and G0_imp  @@@@@@@@@@@@@@@@@@@@@@@@\n")
 
             sk.set_Sigma([s[ish].Sigma_iw for ish in range(nsh)])   # set Sigma into the SumK class
-            if fix_mu:
-                chemical_potential = self._params['system']['mu']
-                chemical_potential = mpi.bcast(chemical_potential)
-                sk.set_mu(chemical_potential)
-            else:
-                sk.calc_mu(precision=prec_mu)  # find the chemical potential for given density
+            if self._time_reversal_kmesh:
+                #
+                # The k-mesh reduced by k <-> -k is exact only for a symmetric Sigma.
+                # The tolerance is loose enough not to be hit by the noise of QMC.
+                #
+                for ish in range(nsh):
+                    for bname, gf in s[ish].Sigma_iw:
+                        if not time_reversal_exact(sigma=gf.data, tol=1.0e-2):
+                            mpi.report("Warning ! Sigma_iw of shell {0} (block {1}) breaks the time-reversal symmetry."
+                                       " G_loc from the reduced k-mesh is not exact."
+                                       " Rerun dcore_pre with irreducible_k = False.".format(ish, bname))
+            with timer.phase('chemical_potential'):
+                if resume:
+                    # The impurity problems of the checkpoints were set up with this chemical potential
+                    sk.set_mu(checkpoint_mu)
+                elif fix_mu:
+                    chemical_potential = self._params['system']['mu']
+                    chemical_potential = mpi.bcast(chemical_potential)
+                    sk.set_mu(chemical_potential)
+                elif mu_solver == 'newton':
+                    # Warm start from the chemical potential of the previous iteration
+                    chemical_potential, density = newton_mu.solve(sk.density_required - sk.charge_below,
+                                                                  sk.chemical_potential)
+                    sk.set_mu(chemical_potential)
+                    mpi.report("Chemical potential = {0}, Total density = {1} ({2} density evaluations)".format(
+                        chemical_potential, density, newton_mu.n_evaluations))
+                else:
+                    sk.calc_mu(precision=prec_mu)  # find the chemical potential for given density
+            #
+            # Local Green's function, density matrix and total charge in a single k-sum
             #
-            # Compute and display density matrix
+            with timer.phase('lattice_sum'):
+                g_iw_all, dm_tot, total_charge = lattice_sum(sk, with_dc=with_dc)
+            mpi.report("\n    Total charge of the lattice : %.6f" % total_charge)
+            #
+            # Display density matrix
             #
-            dm_tot = sk.density_matrix(beta=self._params['system']['beta'])
             if mpi.is_master_node():
                 print("\nDensity Matrix")
                 for icrsh in range(sk.n_corr_shells):
@@ -233,10 +434,6 @@ class DMFTCoreSolver:
                             for i2 in range(sk.corr_shells[icrsh]['dim']):
                                 print("{0:.3f} ".format(dm_tot[icrsh][sp][i1, i2]), end="")
                             print("")
-            #
-            # Extract Local Green's function
-            #
-            g_iw_all = sk.extract_G_loc(with_dc=with_dc)
             for ish in range(nsh):
                 s[ish].G_iw << g_iw_all[ish]                         # calc the local Green function
                 mpi.report("\n    Total charge of Gloc_{shell %d} : %.6f" % (ish, s[ish].G_iw.total_density()))
@@ -265,40 +462,97 @@ class DMFTCoreSolver:
 
             mpi.report("\n@@@@@@@@@@@@@@@@@@@@@@@@  Solve the impurity problem  @@@@@@@@@@@@@@@@@@@@@@@@\n")
 
+            # Input of this iteration, kept for the mixing
+            sigma_in = [s[ish].Sigma_iw.copy() for ish in range(nsh)]
+
             if self.solver_name == "TRIQS/hubbard-I":
                 if 'verbosity' in self._solver_params.keys():
                     verbosity = self._solver_params["verbosity"]
                 else:
                     verbosity = 0
                 # calculate non-interacting atomic level positions:
+                with timer.phase('atomic_levels'):
+                    eal = sk.eff_atomic_levels()
+                #
+                # With several shells and processes, each shell is solved on a single process
+                # and the results are gathered afterwards.
+                #
+                distribute = nsh > 1 and mpi.size > 1
+                if distribute:
+                    owner = self._scheduler.assign(mpi.size)
+                    for ish in range(nsh):
+                        mpi.report("    Shell {0} is solved on the process {1}".format(ish, owner[ish]))
+                solve_time = numpy.zeros(nsh)
                 for ish in range(nsh):
                     norb = self.SK.corr_shells[self.SK.inequiv_to_corr[ish]]['dim'] / (self.SK.SO + 1)
                     umat2 = numpy.zeros((norb, norb, norb, norb), numpy.complex_)
                     umat2[:, :, :, :] = self.Umat[self.SK.inequiv_to_corr[ish]][0:norb, 0:norb, 0:norb, 0:norb]
 
-                    eal = sk.eff_atomic_levels()
                     s[ish].set_atomic_levels(eal=eal[ish])
-                    s[ish].solve(u_mat=numpy.real(umat2), verbosity=verbosity)
+                    with timer.phase('solver'):
+                        if not distribute:
+                            s[ish].solve(u_mat=numpy.real(umat2), verbosity=verbosity)
+                        elif owner[ish] == mpi.rank:
+                            t_start = time.time()
+                            s[ish].solve(u_mat=numpy.real(umat2), verbosity=verbosity, local=True)
+                            solve_time[ish] = time.time() - t_start
+                if distribute:
+                    for ish in range(nsh):
+                        if owner[ish] != mpi.rank:
+                            s[ish].G_iw.zero()
+                            s[ish].Sigma_iw.zero()
+                        s[ish].G_iw << mpi.all_reduce(mpi.world, s[ish].G_iw, lambda x, y: x + y)
+                        s[ish].Sigma_iw << mpi.all_reduce(mpi.world, s[ish].Sigma_iw, lambda x, y: x + y)
+                        # Share the atomic eigenstates so that the master node can store them
+                        lehmann = None
+                        if owner[ish] == mpi.rank and s[ish].lehmann is not None:
+                            lehmann = s[ish].lehmann.to_dict()
+                        lehmann = mpi.world.bcast(lehmann, owner[ish])
+                        if lehmann is not None:
+                            s[ish].lehmann = AtomicLehmann.from_dict(lehmann)
+                    self._scheduler.update(mpi.all_reduce(mpi.world, solve_time, lambda x, y: x + y))
             else:
+                #
+                # Each solved shell is written to the output file, so that the iteration can be resumed
+                # from the first unsolved shell
+                #
+                with timer.phase('io'):
+                    output.begin_checkpoint(iteration_number, sk.chemical_potential)
                 for ish in range(nsh):
+                    if resume and ish in checkpoint_shells:
+                        mpi.report("    Shell {0} is restored from the checkpoint".format(ish))
+                        checkpoint = checkpoint_shells[ish]
+                        sigma_in[ish] << checkpoint['Sigma_in']
+                        s[ish].G0_iw << checkpoint['G0_iw']
+                        s[ish].G_iw << checkpoint['G_iw']
+                        s[ish].Sigma_iw << checkpoint['Sigma_iw']
+                        s[ish].G_l << checkpoint['G_l']
+                        continue
+                    g0_iw = s[ish].G0_iw.copy()
 
                     h0_loc = {}
                     for bname, gf in s[ish].G0_iw:
                         h0_loc[bname] = gf.tail[2]
-                    eigvec, umat2 = self.diag_eal(ish=ish, eal=h0_loc)
-                    h_int = self.h_int_general(ish=ish, u_mat=umat2)
-                    if self._params["model"]["density_density"]:
-                        h_int = diagonal_part(h_int)
+                    with timer.phase('diag_eal'):
+                        eigvec, umat2 = self.diag_eal(ish=ish, eal=h0_loc)
+                    with timer.phase('h_int'):
+                        h_int = self.h_int_general(ish=ish, u_mat=umat2)
+                        if self._params["model"]["density_density"]:
+                            h_int = diagonal_part(h_int)
                     for bname, gf in s[ish].G0_iw:
                         gf.from_L_G_R(eigvec[bname].transpose().conjugate(), gf, eigvec[bname])
 
                     self._solver_params['random_seed'] = 34788 + 928374 * mpi.rank + 1000*ish
-                    s[ish].solve(h_int=h_int, **self._solver_params)
-                    if self._params["system"]["perform_tail_fit"]:
-                        tail_fit(Sigma_iw=s[ish].Sigma_iw, G0_iw=s[ish].G0_iw, G_iw=s[ish].G_iw,
-                                 fit_max_moment=self._params["system"]["fit_max_moment"],
-                                 fit_min_w=self._params["system"]["fit_min_w"],
-                                 fit_max_w=self._params["system"]["fit_max_w"])
+                    if schedule is not None:
+                        self._solver_params['n_cycles'] = schedule.n_cycles
+                    with timer.phase('solver'):
+                        s[ish].solve(h_int=h_int, **self._solver_params)
+                    with timer.phase('tail_fit'):
+                        if self._params["system"]["perform_tail_fit"]:
+                            tail_fit(Sigma_iw=s[ish].Sigma_iw, G0_iw=s[ish].G0_iw, G_iw=s[ish].G_iw,
+                                     fit_max_moment=self._params["system"]["fit_max_moment"],
+                                     fit_min_w=self._params["system"]["fit_min_w"],
+                                     fit_max_w=self._params["system"]["fit_max_w"])
                     if self._params['system']['n_l'] > 0:
                         for name, g in s[ish].G_l:
                             s[ish].G_iw[name] << LegendreToMatsubara(g)
@@ -307,6 +561,9 @@ class DMFTCoreSolver:
                         gf.from_L_G_R(eigvec[bname], gf, eigvec[bname].transpose().conjugate())
                     for bname, gf in s[ish].G_l:
                         gf.from_L_G_R(eigvec[bname], gf, eigvec[bname].transpose().conjugate())
+                    with timer.phase('io'):
+                        output.save_checkpoint(ish, {'G0_iw': g0_iw, 'Sigma_in': sigma_in[ish], 'G_iw': s[ish].G_iw,
+                                                     'Sigma_iw': s[ish].Sigma_iw, 'G_l': s[ish].G_l})
 
             # Solved. Now do post-processing:
             for ish in range(nsh):
@@ -324,38 +581,89 @@ class DMFTCoreSolver:
                     symmetrize_spin(s[ish].G_iw)
                     symmetrize_spin(s[ish].Sigma_iw)
 
-            # Now mix Sigma and G with factor sigma_mix, if wanted:
+            # Convergence of this iteration
+            sigma_out = [s[ish].Sigma_iw for ish in range(nsh)]
+            with timer.phase('convergence'):
+                #
+                # Statistical noise of Sigma_out, estimated only from the measured data
+                #
+                if self.solver_name == "TRIQS/hubbard-I":
+                    noise = 0.0
+                elif self._params['system']['n_l'] > 0:
+                    # Sigma from G_l is smooth along the frequency
+                    noise = legendre_sigma_noise([s[ish].G_l for ish in range(nsh)],
+                                                 [s[ish].G_iw for ish in range(nsh)])
+                elif self._params['system']['perform_tail_fit']:
+                    # Sigma above fit_min_w is replaced by the analytic tail
+                    noise = sigma_noise(sigma_out, w_max=self._params['system']['fit_min_w'])
+                else:
+                    noise = sigma_noise(sigma_out)
+                if self.solver_name != "TRIQS/hubbard-I" and noise <= 0.0:
+                    mpi.report("Warning ! The noise of Sigma_iw cannot be estimated. converge_noise is not used.")
+                    if schedule is not None:
+                        mpi.report("          The number of QMC cycles grows only when |Sigma_out - Sigma_in| stagnates.")
+                metrics = checker.check(sigma_in, sigma_out, sk.chemical_potential,
+                                        [s[ish].G_iw.total_density() for ish in range(nsh)], noise=noise)
+            if schedule is not None:
+                # Converged only with the full statistics
+                metrics['n_cycles'] = schedule.n_cycles
+                metrics['converged'] = metrics['converged'] and schedule.at_max
+                if schedule.update(metrics):
+                    mpi.report("\n    Number of QMC cycles is increased to %d" % schedule.n_cycles)
+            metrics['converged'] = mpi.bcast(metrics['converged'])
+            mpi.report("\n    |Sigma_out - Sigma_in| : %.3e (threshold %.3e, noise %.3e)"
+                       % (metrics['sigma'], metrics['sigma_threshold'], metrics['sigma_noise']))
+            if metrics['mu'] >= 0.0:
+                mpi.report("    Change of chemical potential : %.3e" % metrics['mu'])
+            if metrics['occupation_change'] >= 0.0:
+                mpi.report("    Change of occupation : %.3e" % metrics['occupation_change'])
+
+            # Now mix Sigma with those of the previous iterations:
+            with timer.phase('mixing'):
+                mixer.add(sigma_in, sigma_out)
+            if mixing != 'linear':
+                with timer.phase('io'):
+                    output.save_mixing(iteration_number, sigma_in, sigma_out, mixing_history)
             if iteration_number > 1 or previous_present:
-                if mpi.is_master_node():
-                    ar = HDFArchive(output_file, 'a')
+                with timer.phase('mixing'):
+                    sigma_new = mixer.mix()
                     for ish in range(nsh):
-                        s[ish].Sigma_iw << sigma_mix * s[ish].Sigma_iw \
-                                    + (1.0-sigma_mix) * ar[output_group]['Sigma_iw'][str(iteration_number-1)][str(ish)]
+                        s[ish].Sigma_iw << sigma_new[ish]
+                        s[ish].Sigma_iw << mpi.bcast(s[ish].Sigma_iw)
 
-                    del ar
-                for ish in range(nsh):
-                    s[ish].Sigma_iw << mpi.bcast(s[ish].Sigma_iw)
+            with timer.phase('io'):
+                # Save stuff into the user_data group of hdf5 archive in case of rerun.
+                # This precedes save_iteration, which marks the iteration as completed.
+                sk.save(['chemical_potential', 'dc_imp', 'dc_energ'])
 
-            # Write Sigma and G to the hdf5 archive:
+                # Write Sigma and G to the hdf5 archive:
+                if self._params['system']['n_l'] > 0:
+                    g_l = [s[ish].G_l for ish in range(nsh)]
+                else:
+                    g_l = None
+                output.save_iteration(iteration_number, sk.chemical_potential,
+                                      [s[ish].Sigma_iw for ish in range(nsh)], g_l)
+                output.save_convergence(iteration_number, metrics)
+                if self.solver_name == "TRIQS/hubbard-I":
+                    output.save_atomic_lehmann([s[ish].lehmann for ish in range(nsh)])
+                output.clear_checkpoint()
+                output.flush()
+
+            # Timings of the phases of this iteration
+            timings = timer.summary()
+            output.save_timings(iteration_number, timings)
+            output.flush()
             if mpi.is_master_node():
-                ar = HDFArchive(output_file, 'a')
-                ar[output_group]['iterations'] = iteration_number
-                ar[output_group]['chemical_potential'][str(iteration_number)] = sk.chemical_potential
-                for ish in range(nsh):
-                    if self._params['system']['n_l'] > 0:
-                        ar[output_group]['G_l'][str(ish)] = s[ish].G_l
-                    #
-                    # Save the history of Sigma
-                    #
-                    if not (str(iteration_number) in ar[output_group]['Sigma_iw']):
-                        ar[output_group]['Sigma_iw'].create_group(str(iteration_number))
-                    ar[output_group]['Sigma_iw'][str(iteration_number)][str(ish)] = s[ish].Sigma_iw
-                del ar
+                print("\n    Timings of this iteration (sec)")
+                print_timings(timings)
 
             mpi.report("\nWall Time : %.1f sec" % (time.time() - t0))
 
-            # Save stuff into the user_data group of hdf5 archive in case of rerun:
-            sk.save(['chemical_potential', 'dc_imp', 'dc_energ'])
+            if metrics['converged']:
+                mpi.report("\n    Converged at iteration %d" % iteration_number)
+                break
+
+        output.close()
 
     def calc_dc_matrix(self, dens_mat, u_mat, orb=0):
         """
@@ -401,6 +709,19 @@ class DMFTCoreSolver:
                         print("{0:.3f} ".format(dens_mat[sp1][i1, i2]), end="")
                     print("")
 
+        #
+        # Density matrix in the spin-orbital basis
+        #
+        so = self.SK.corr_shells[self.SK.inequiv_to_corr[orb]]['SO'] == 1
+        if so:
+            dm_so = numpy.array(dens_mat[spn[0]])
+        else:
+            dm_so = numpy.zeros((2*dim, 2*dim), numpy.complex_)
+            for isp, sp in enumerate(spn):
+                dm_so[isp*dim:(isp+1)*dim, isp*dim:(isp+1)*dim] = dens_mat[sp]
+
+        dc_so = compute_dc(self._params['system']['dc_type'], u_mat[0:dim, 0:dim, 0:dim, 0:dim], dm_so, so)
+
         for icrsh in range(self.SK.n_corr_shells):
 
             # ish is the index of the inequivalent shell corresponding to icrsh
@@ -408,41 +729,11 @@ class DMFTCoreSolver:
             if ish != orb:
                 continue  # ignore this orbital
 
-            if self.SK.corr_shells[icrsh]['SO'] == 0:
-                for sp1 in spn:
-                    self.SK.dc_imp[icrsh][sp1] = numpy.zeros((dim_tot, dim_tot), numpy.complex_)
-                    for i1 in range(dim):
-                        for i2 in range(dim):
-                            #
-                            # Hartree
-                            #
-                            for sp2 in spn:
-                                self.SK.dc_imp[icrsh][sp1][i1, i2] += \
-                                    numpy.sum(u_mat[i1, 0:dim, i2, 0:dim] * dens_mat[sp2][:, :])
-                            #
-                            # Exchange
-                            #
-                            self.SK.dc_imp[icrsh][sp1][i1, i2] += \
-                                - numpy.sum(u_mat[i1, 0:dim, 0:dim, i2] * dens_mat[sp1][:, :])
+            if so:
+                self.SK.dc_imp[icrsh][spn[0]] = dc_so.copy()
             else:
-                self.SK.dc_imp[icrsh]["ud"] = numpy.zeros((dim_tot, dim_tot), numpy.complex_)
-                for s1 in range(2):
-                    for i1 in range(dim):
-                        for s2 in range(2):
-                            for i2 in range(dim):
-                                #
-                                # Hartree
-                                #
-                                self.SK.dc_imp[icrsh]["ud"][i1+s1*dim, i2+s1*dim] += numpy.sum(
-                                    u_mat[i1, 0:dim, i2, 0:dim] * dens_mat["ud"][s2*dim:s2*dim+dim, s2*dim:s2*dim+dim]
-                                )
-                                #
-                                # Exchange
-                                #
-                                self.SK.dc_imp[icrsh]["ud"][i1 + s1 * dim, i2 + s2 * dim] += numpy.sum(
-                                    u_mat[i1, 0:dim, 0:dim, i2]
-                                    * dens_mat["ud"][s2 * dim:s2 * dim + dim, s1 * dim:s1 * dim + dim]
-                                )
+                for isp, sp in enumerate(spn):
+                    self.SK.dc_imp[icrsh][sp] = dc_so[isp*dim:(isp+1)*dim, isp*dim:(isp+1)*dim].copy()
 
         if mpi.is_master_node():
             print("\n      DC Self Energy:".format(orb))
@@ -454,30 +745,50 @@ class DMFTCoreSolver:
                         print("{0:.3f} ".format(self.SK.dc_imp[self.SK.inequiv_to_corr[orb]][sp1][i1, i2]), end="")
                     print("")
 
-    def h_int_general(self, ish, u_mat):
+    def h_int_general(self, ish, u_mat, tol=1.0e-12, cache_tol=1.0e-8):
+        """
+        Construct the interaction Hamiltonian
+            H = (1/2) sum_{ijkl} U_{ijkl} c^dag_i c^dag_j c_l c_k
+        of an inequivalent shell.
+
+        Only the terms with nonzero antisymmetrized U-matrix elements are built (see sparse_u_terms).
+        The result is cached per shell. It is reused as long as u_mat agrees with the cached one
+        within cache_tol relative to the largest element of u_mat. u_mat is rotated to the eigenbasis
+        of the local levels (see diag_eal), so the cache is reused when this basis does not change
+        between iterations (e.g. the local levels are only shifted by the chemical potential).
+
+        Parameters
+        ----------
+        ish : int
+            Index of an inequivalent shell
+        u_mat : complex array [:, :, :, :]
+            4-index interaction matrix in the spin-orbital basis
+        tol : float, optional
+            Threshold for the matrix elements to be neglected
+        cache_tol : float, optional
+            Relative tolerance for reusing the cached Hamiltonian
+
+        Returns
+        -------
+        ham : Operator
+        """
+        u_mat = numpy.asarray(u_mat)
+        u_max = numpy.amax(numpy.abs(u_mat)) if u_mat.size > 0 else 0.0
+        cache = self._h_int_cache.get(ish)
+        if cache is not None and cache[0].shape == u_mat.shape \
+                and numpy.allclose(cache[0], u_mat, rtol=0.0, atol=max(cache_tol * u_max, tol)):
+            return cache[1]
 
         n_orb = self.SK.corr_shells[self.SK.inequiv_to_corr[ish]]['dim']
 
         if self.SK.SO:
-            index_name = [("", 0)] * n_orb
-            for i in range(n_orb):
-                index_name[i] = ('ud', i)
+            index_name = [('ud', i) for i in range(n_orb)]
         else:
-            index_name = [("", 0)] * (n_orb*2)
-            for i in range(n_orb):
-                index_name[i] = ('up', i)
-                index_name[i+n_orb] = ('down', i)
-            n_orb *= 2
-
-        ham = Operator()
-        for i1 in range(n_orb):
-            for i2 in range(n_orb):
-                for i3 in range(n_orb):
-                    for i4 in range(n_orb):
-                        ham += 0.5 * u_mat[i1, i2, i3, i4] \
-                               * c_dag(*index_name[i1]) * c_dag(*index_name[i2]) \
-                               * c(*index_name[i4]) * c(*index_name[i3])
+            index_name = [('up', i) for i in range(n_orb)] + [('down', i) for i in range(n_orb)]
+
+        ham = build_h_int(u_mat, index_name, tol)
 
+        self._h_int_cache[ish] = (numpy.array(u_mat), ham)
         return ham
 
     def diag_eal(self, ish, eal):
@@ -0,0 +1,172 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+
+#
+# In this module, the density matrix is a (2*dim, 2*dim) matrix in the spin-orbital basis
+# where the spin index runs slowest (i.e. index = spin*dim + orbital),
+# and u_mat is the (dim, dim, dim, dim) orbital part of the interaction.
+#
+
+
+def hartree(u_mat, dens_mat):
+    """
+    Hartree term sum_{jl} U_{ijkl} <c^dag_j c_l>, which is diagonal in spin
+
+    Parameters
+    ----------
+    u_mat : complex array [dim, dim, dim, dim]
+    dens_mat : complex array [2*dim, 2*dim]
+
+    Returns
+    -------
+    complex array [2*dim, 2*dim]
+    """
+    dim = u_mat.shape[0]
+    dm = dens_mat.reshape(2, dim, 2, dim)
+    n_orb = dm[0, :, 0, :] + dm[1, :, 1, :]
+    return numpy.kron(numpy.identity(2), numpy.einsum('ijkl,jl->ik', u_mat, n_orb))
+
+
+def exchange(u_mat, dens_mat):
+    """
+    Exchange term sum_{jl} U_{ijlk} <c^dag_{j s'} c_{l s}> for the (i s, k s') element
+
+    Parameters
+    ----------
+    u_mat : complex array [dim, dim, dim, dim]
+    dens_mat : complex array [2*dim, 2*dim]
+
+    Returns
+    -------
+    complex array [2*dim, 2*dim]
+    """
+    dim = u_mat.shape[0]
+    dm = dens_mat.reshape(2, dim, 2, dim)
+    return numpy.einsum('ijlk,tjsl->sitk', u_mat, dm).reshape(2*dim, 2*dim)
+
+
+def averaged_u_j(u_mat):
+    """
+    Orbital-averaged U and J
+
+    Parameters
+    ----------
+    u_mat : complex array [dim, dim, dim, dim]
+
+    Returns
+    -------
+    u_avg : float
+    j_avg : float
+    """
+    dim = u_mat.shape[0]
+    u2 = numpy.einsum('ijij->ij', u_mat).real
+    j2 = numpy.einsum('ijji->ij', u_mat).real
+    u_avg = numpy.sum(u2) / dim**2
+    if dim == 1:
+        return u_avg, 0.0
+    offdiag = numpy.sum(u2 - j2) - numpy.trace(u2 - j2)
+    return u_avg, u_avg - offdiag / (dim * (dim - 1))
+
+
+def dc_hf(u_mat, dens_mat, spin_orbit):
+    """
+    Hartree-Fock double counting
+    """
+    if spin_orbit:
+        # The exchange term is added with the same sign as in the previous loop implementation
+        # so that the results of the spin-orbit case are unchanged.
+        return hartree(u_mat, dens_mat) + exchange(u_mat, dens_mat)
+    else:
+        return hartree(u_mat, dens_mat) - exchange(u_mat, dens_mat)
+
+
+def dc_fll(u_mat, dens_mat, spin_orbit):
+    """
+    Fully-localized-limit double counting
+    """
+    dim = u_mat.shape[0]
+    u_avg, j_avg = averaged_u_j(u_mat)
+    n_spin = numpy.diag(dens_mat).real.reshape(2, dim).sum(axis=1)
+    n_tot = numpy.sum(n_spin)
+    if spin_orbit:
+        n_spin[:] = 0.5 * n_tot
+    dc_spin = u_avg * (n_tot - 0.5) - j_avg * (n_spin - 0.5)
+    return numpy.diag(numpy.repeat(dc_spin, dim)).astype(numpy.complex_)
+
+
+def dc_amf(u_mat, dens_mat, spin_orbit):
+    """
+    Around-mean-field double counting
+    """
+    dim = u_mat.shape[0]
+    u_avg, j_avg = averaged_u_j(u_mat)
+    n_spin = numpy.diag(dens_mat).real.reshape(2, dim).sum(axis=1)
+    n_tot = numpy.sum(n_spin)
+    if spin_orbit:
+        n_spin[:] = 0.5 * n_tot
+    dc_spin = u_avg * (n_tot - n_spin / dim) - j_avg * (n_spin - n_spin / dim)
+    return numpy.diag(numpy.repeat(dc_spin, dim)).astype(numpy.complex_)
+
+
+#
+# Available double-counting schemes.
+# Each function takes (u_mat, dens_mat, spin_orbit) and returns the (2*dim, 2*dim) self-energy.
+#
+dc_schemes = {
+    'HF': dc_hf,
+    'FLL': dc_fll,
+    'AMF': dc_amf,
+}
+
+
+def register_dc_scheme(name, func):
+    """
+    Register a new double-counting scheme
+
+    Parameters
+    ----------
+    name : string
+        Name used in the input file
+    func : function
+        func(u_mat, dens_mat, spin_orbit) returns the double-counting self-energy
+    """
+    dc_schemes[name] = func
+
+
+def compute_dc(scheme, u_mat, dens_mat, spin_orbit):
+    """
+    Compute the double-counting self-energy with the given scheme
+
+    Parameters
+    ----------
+    scheme : string
+        One of the keys of dc_schemes
+    u_mat : complex array [dim, dim, dim, dim]
+    dens_mat : complex array [2*dim, 2*dim]
+    spin_orbit : bool
+
+    Returns
+    -------
+    complex array [2*dim, 2*dim]
+    """
+    if scheme not in dc_schemes:
+        raise RuntimeError("Unknown double-counting scheme : " + scheme)
+    return dc_schemes[scheme](numpy.asarray(u_mat), numpy.asarray(dens_mat), spin_orbit)
@@ -0,0 +1,279 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import os
+import numpy
+
+#
+# Readers (and a writer) of real-space Hamiltonians and interactions
+#   Wannier90 : seedname_hr.dat (also seedname_ur.dat and seedname_jr.dat from respack2wan90)
+#   RESPACK   : dir-wan/dat.h_mat_r, dir-intW/dat.Wmat, dir-intJ/dat.Jmat
+#   OpenMX    : System.Name.HWR
+# The numerical block of a file is parsed by numpy.fromstring chunk by chunk,
+# and the result is cached in filename.npz, which is used as long as the size and the mtime of the file are unchanged.
+#
+
+
+def _read_numbers(f, transform=None, chunk_size=1 << 26):
+    """
+    Read all whitespace-separated numbers from the current position to the end of a file
+
+    Parameters
+    ----------
+    f : file
+    transform : function, optional
+        Applied to each chunk of text before parsing (e.g. removing non-numerical tokens)
+    chunk_size : int, optional
+        Approximate size of a chunk in bytes
+
+    Returns
+    -------
+    float array
+    """
+    chunks = []
+    while True:
+        text = f.read(chunk_size)
+        if len(text) == 0:
+            break
+        # Do not split a number at the end of the chunk
+        text += f.readline()
+        if transform is not None:
+            text = transform(text)
+        chunks.append(numpy.fromstring(text, dtype=numpy.float_, sep=' '))
+    if len(chunks) == 0:
+        return numpy.zeros(0, numpy.float_)
+    return numpy.concatenate(chunks)
+
+
+def _fill_matrices(nr, nwan, index, value):
+    """
+    hamr[ir, i, j] from the list of (i, j, value) where the i-th block of nwan*nwan entries belongs to R_i
+
+    Parameters
+    ----------
+    nr : int
+    nwan : int
+    index : float array [nr*nwan*nwan, 2]
+        Orbital indices i, j starting from 1
+    value : complex array [nr*nwan*nwan]
+
+    Returns
+    -------
+    complex array [nr, nwan, nwan]
+    """
+    ir = numpy.arange(nr * nwan * nwan) // (nwan * nwan)
+    hamr = numpy.zeros((nr, nwan, nwan), numpy.complex_)
+    hamr[ir, index[:, 0].astype(int) - 1, index[:, 1].astype(int) - 1] = value
+    return hamr
+
+
+def _cached(filename, parser, cache):
+    """
+    Call parser(filename) or load its result from the sidecar cache filename.npz
+
+    Returns
+    -------
+    tuple of arrays
+    """
+    stat = os.stat(filename)
+    cache_file = filename + '.npz'
+    if cache and os.path.exists(cache_file):
+        try:
+            data = numpy.load(cache_file)
+            if int(data['size']) == stat.st_size and float(data['mtime']) == stat.st_mtime:
+                return tuple(data['arr_{0}'.format(i)] for i in range(int(data['n_arrays'])))
+        except (IOError, OSError, KeyError, ValueError):
+            pass
+    result = parser(filename)
+    if cache:
+        arrays = dict(('arr_{0}'.format(i), a) for i, a in enumerate(result))
+        try:
+            with open(cache_file, 'wb') as f:
+                numpy.savez(f, size=stat.st_size, mtime=stat.st_mtime, n_arrays=len(result), **arrays)
+        except (IOError, OSError):
+            # The directory may be read-only. The cache is just skipped.
+            pass
+    return result
+
+
+def _parse_wannier90_hr(filename):
+    with open(filename, 'r') as f:
+        f.readline()  # Comment
+        nwan = int(f.readline())
+        nr = int(f.readline())
+        rdeg = []
+        while len(rdeg) < nr:
+            rdeg += [int(x) for x in f.readline().split()]
+        data = _read_numbers(f)
+    if len(rdeg) != nr or data.size != nr * nwan * nwan * 7:
+        raise RuntimeError("Error ! Wrong format of " + filename)
+    data = data.reshape(nr * nwan * nwan, 7)
+    rvec = numpy.ascontiguousarray(data[::nwan * nwan, 0:3].astype(int))
+    hamr = _fill_matrices(nr, nwan, data[:, 3:5], data[:, 5] + 1j * data[:, 6])
+    return rvec, numpy.array(rdeg, dtype=int), hamr
+
+
+def read_wannier90_hr(filename, cache=True):
+    """
+    Read a real-space Hamiltonian in the Wannier90 format (seedname_hr.dat)
+
+    Parameters
+    ----------
+    filename : string
+    cache : bool, optional
+        Use the sidecar cache filename.npz
+
+    Returns
+    -------
+    rvec : integer array [nr, 3]
+        Lattice vectors R
+    rdeg : integer array [nr]
+        Degeneracy of each R
+    hamr : complex array [nr, nwan, nwan]
+        H(R)
+    """
+    return _cached(filename, _parse_wannier90_hr, cache)
+
+
+def _parse_respack(filename):
+    with open(filename, 'r') as f:
+        for i in range(3):
+            f.readline()  # Comment
+        #
+        # The number of orbitals is obtained from the number of lines in the first block
+        #
+        head = f.readline()
+        nline = 0
+        while True:
+            line = f.readline()
+            if len(line.strip()) == 0:
+                break
+            head += line
+            nline += 1
+        norb = int(numpy.sqrt(nline) + 0.1)
+        if norb * norb != nline:
+            raise RuntimeError("Error ! Wrong format of " + filename)
+        data = numpy.concatenate((numpy.fromstring(head, dtype=numpy.float_, sep=' '), _read_numbers(f)))
+    block = 3 + 4 * norb * norb
+    if data.size % block != 0:
+        raise RuntimeError("Error ! Wrong format of " + filename)
+    nr = data.size // block
+    data = data.reshape(nr, block)
+    rvec = numpy.ascontiguousarray(data[:, 0:3].astype(int))
+    elements = data[:, 3:].reshape(nr * norb * norb, 4)
+    hamr = _fill_matrices(nr, norb, elements[:, 0:2], elements[:, 2] + 1j * elements[:, 3])
+    return rvec, hamr
+
+
+def read_respack(filename, cache=True):
+    """
+    Read a real-space Hamiltonian or interaction in the RESPACK format (e.g. dir-wan/dat.h_mat_r)
+
+    Parameters
+    ----------
+    filename : string
+    cache : bool, optional
+        Use the sidecar cache filename.npz
+
+    Returns
+    -------
+    rvec : integer array [nr, 3]
+        Lattice vectors R
+    hamr : complex array [nr, norb, norb]
+        H(R) or W(R)
+    """
+    return _cached(filename, _parse_respack, cache)
+
+
+def _parse_openmx_hwr(filename):
+    with open(filename, 'r') as f:
+        f.readline()  # Comment
+        nwan = int(f.readline().split()[4])
+        nr = int(f.readline().split()[4])
+        for i in range(5):
+            f.readline()  # Lattice vectors and spin
+        efermi = float(f.readline().split()[2])
+        data = _read_numbers(f, transform=lambda text: text.replace('R', ' ').replace('(', ' ').replace(')', ' '))
+    block = 4 + 4 * nwan * nwan
+    if data.size != nr * block:
+        raise RuntimeError("Error ! Wrong format of " + filename)
+    data = data.reshape(nr, block)
+    rvec = numpy.ascontiguousarray(data[:, 0:3].astype(int))
+    rdeg = numpy.ascontiguousarray(data[:, 3].astype(int))
+    elements = data[:, 4:].reshape(nr * nwan * nwan, 4)
+    hamr = _fill_matrices(nr, nwan, elements[:, 0:2], elements[:, 2] + 1j * elements[:, 3])
+    return rvec, rdeg, hamr, numpy.array(efermi)
+
+
+def read_openmx_hwr(filename, cache=True):
+    """
+    Read a real-space Hamiltonian of OpenMX (System.Name.HWR)
+
+    Parameters
+    ----------
+    filename : string
+    cache : bool, optional
+        Use the sidecar cache filename.npz
+
+    Returns
+    -------
+    rvec : integer array [nr, 3]
+        Lattice vectors R
+    rdeg : integer array [nr]
+        Degeneracy of each R
+    hamr : complex array [nr, nwan, nwan]
+        H(R) in Hartree
+    efermi : float
+        Fermi level in Hartree
+    """
+    rvec, rdeg, hamr, efermi = _cached(filename, _parse_openmx_hwr, cache)
+    return rvec, rdeg, hamr, float(efermi)
+
+
+def write_wannier90_hr(filename, rvec, rdeg, hamr, comment):
+    """
+    Write a real-space Hamiltonian in the Wannier90 format (seedname_hr.dat)
+
+    Parameters
+    ----------
+    filename : string
+    rvec : integer array [nr, 3]
+    rdeg : integer array [nr]
+    hamr : complex array [nr, nwan, nwan]
+    comment : string
+        First line of the file
+    """
+    nr, nwan = hamr.shape[0], hamr.shape[1]
+    #
+    # One line for each (R, n, m) with m running fastest
+    #
+    ir, n, m = numpy.indices((nr, nwan, nwan)).reshape(3, -1)
+    data = numpy.empty((nr * nwan * nwan, 7), numpy.float_)
+    data[:, 0:3] = numpy.asarray(rvec)[ir, :]
+    data[:, 3] = m + 1
+    data[:, 4] = n + 1
+    data[:, 5] = hamr[ir, m, n].real
+    data[:, 6] = hamr[ir, m, n].imag
+    with open(filename, 'w') as f:
+        print(comment, file=f)
+        print(nwan, file=f)
+        print(nr, file=f)
+        for ir_start in range(0, nr, 15):
+            print("".join(["%5d" % deg for deg in rdeg[ir_start:ir_start + 15]]), file=f)
+        numpy.savetxt(f, data, fmt="%5d%5d%5d%5d%5d%12.6f%12.6f")
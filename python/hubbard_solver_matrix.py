@@ -29,6 +29,7 @@ from pytriqs.operators.util.U_matrix import *
 from pytriqs.gf.local import *
 from pytriqs.applications.impurity_solvers.hubbard_I.hubbard_I import gf_hi_fullu, sigma_atomic_fullu
 import pytriqs.utility.mpi as mpi
+from atomic_lehmann import AtomicLehmann, cache_key, diagonalize, level_shift
 from itertools import izip
 import numpy
 import copy
@@ -72,6 +73,11 @@ class Solver:
         # prepare self.ealmat
         self.ealmat = numpy.zeros([self.Nlm*self.Nspin, self.Nlm*self.Nspin], numpy.complex_)
 
+        # Lehmann representation of the atomic Green's function (cache of the diagonalization)
+        self.lehmann = None
+        # cache_key of the previous call
+        self.__last_key = None
+
         # Define Atomic Levels Dictionary according to the GF Bloc Structure
         self.Eff_Atomic_Levels = {}
         for a, al in self.gf_struct:
@@ -80,22 +86,21 @@ class Solver:
             else:
                 self.Eff_Atomic_Levels[a] = numpy.zeros([self.Nlm, self.Nlm], numpy.complex_)
 
-    def solve(self, u_mat, verbosity=0, test_convergence=0.0001, n_lev=0, remove_split=False):
-        """Calculation of the impurity Greens function using Hubbard-I"""
+    def solve(self, u_mat, verbosity=0, test_convergence=0.0001, n_lev=0, remove_split=False, local=False):
+        """Calculation of the impurity Greens function using Hubbard-I
+        If local is True, the calculation is done on this process without any MPI communication."""
 
         if self.Converged:
             mpi.report("Solver %(name)s has already converged: SKIPPING" % self.__dict__)
             return
 
-        if mpi.is_master_node():
+        if local or mpi.is_master_node():
             my_verbosity = verbosity
         else:
             my_verbosity = 0
 
         # self.Nmoments = 5
 
-        u_para, u_antipara = reduce_4index_to_2index(u_mat)
-
         mesh = [x for x in self.G_iw.mesh]
         zmsb = numpy.array([x for x in mesh], numpy.complex_)
 
@@ -108,26 +113,13 @@ class Solver:
 
         # self.__save_eal('eal.dat', iteration_number)
 
-        mpi.report("Starting Fortran solver %(name)s" % self.__dict__)
+        mpi.report("Starting solver %(name)s" % self.__dict__)
 
         self.Sigma_Old <<= self.Sigma_iw
         self.G_Old <<= self.G_iw
 
-        # call the fortran solver:
-        temp = 1.0/self.beta
-        gf = numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm, len(zmsb)), numpy.complex_)
-        tail = [numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm), numpy.complex_) for i in range(self.Nmoments)]
-        atocc = 0.0
-        atmag = 0.0
-        if mpi.is_master_node():
-            gf, tail, atocc, atmag = gf_hi_fullu(e0f=self.ealmat, ur=u_mat, umn=u_para, ujmn=u_antipara,
-                                                 zmsb=zmsb, nmom=self.Nmoments, ns=self.Nspin, temp=temp,
-                                                 verbosity=my_verbosity, remove_split=remove_split,
-                                                 nlev_cf=n_lev)
-        gf = mpi.bcast(gf)
-        tail = mpi.bcast(tail)
-        atocc = mpi.bcast(atocc)
-        atmag = mpi.bcast(atmag)
+        # call the solver:
+        gf, tail, atocc, atmag = self.__atomic_gf(u_mat, zmsb, my_verbosity, remove_split, n_lev, local)
 
         # self.sig = sigma_atomic_fullu(gf=self.gf, e0f=self.eal, zmsb=self.zmsb, ns=self.Nspin, nlm=self.Nlm)
 
@@ -190,8 +182,6 @@ class Solver:
 
         omega = numpy.zeros([n_om], numpy.complex_)
 
-        u_para, u_antipara = reduce_4index_to_2index(u_mat)
-
         for i in range(n_om):
             omega[i] = ommin + delta_om * i + 1j * broadening
 
@@ -201,15 +191,11 @@ class Solver:
             for i in range(9):
                 tailtempl[sig][i] *= 0.0
 
-        temp = 1.0/self.beta
-        gf = numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm, len(omega)), numpy.complex_)
-        tail = [numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm), numpy.complex_) for i in range(self.Nmoments)]
         if mpi.is_master_node():
-            gf, tail, atocc, atmag = gf_hi_fullu(e0f=self.ealmat, ur=u_mat, umn=u_para, ujmn=u_antipara,
-                                                 zmsb=omega, nmom=self.Nmoments, ns=self.Nspin, temp=temp,
-                                                 verbosity=verbosity, remove_split=remove_split, nlev_cf=n_lev)
-        gf = mpi.bcast(gf)
-        tail = mpi.bcast(tail)
+            my_verbosity = verbosity
+        else:
+            my_verbosity = 0
+        gf, tail, atocc, atmag = self.__atomic_gf(u_mat, omega, my_verbosity, remove_split, n_lev)
 
         # transfer the data to the GF class:
         if self.UseSpinOrbit:
@@ -246,6 +232,89 @@ class Solver:
 
         # return omega, gf, sigmamat
 
+    def __atomic_gf(self, u_mat, zmsb, verbosity, remove_split, n_lev, local=False):
+        """
+        Atomic Green's function, its tail, occupancy and magnetic moment at the complex frequencies zmsb.
+
+        The Lehmann representation in self.lehmann is reused as long as the atomic levels
+        up to a uniform shift (e.g. by the chemical potential), u_mat and beta are unchanged.
+        The atomic Hamiltonian is diagonalized for the Lehmann representation only when these parameters
+        are the same as those of the previous call or of self.lehmann, i.e. when it is likely to be reused.
+        Otherwise, and for the options which are not supported by the Lehmann representation
+        (n_lev and remove_split), the Fortran solver is used.
+        """
+        if n_lev != 0 or remove_split:
+            return self.__call_fortran(u_mat, zmsb, verbosity, remove_split, n_lev, local)
+
+        key = cache_key(self.ealmat, u_mat, self.beta)
+        shift = level_shift(self.ealmat)
+        last_key = self.__last_key
+        self.__last_key = key
+        if self.lehmann is not None and self.lehmann.key == key and self.lehmann.set_shift(shift):
+            mpi.report("Reuse the atomic eigenstates")
+        elif key != last_key and (self.lehmann is None or self.lehmann.key != key):
+            return self.__call_fortran(u_mat, zmsb, verbosity, remove_split, n_lev, local)
+        elif local:
+            self.lehmann = diagonalize(self.ealmat, u_mat, self.beta)
+        else:
+            # Diagonalize only on the master node
+            data = None
+            if mpi.is_master_node():
+                data = diagonalize(self.ealmat, u_mat, self.beta).to_dict()
+            self.lehmann = AtomicLehmann.from_dict(mpi.bcast(data))
+        if verbosity > 0:
+            mpi.report("Number of poles in the Lehmann representation : %s" % len(self.lehmann.poles))
+
+        n_z = len(zmsb)
+        if local or mpi.size == 1 or n_z < mpi.size:
+            gf = self.lehmann.gf(zmsb)
+        else:
+            z_index = mpi.slice_array(numpy.arange(n_z))
+            gf = numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm, n_z), numpy.complex_)
+            gf[:, :, z_index] = self.lehmann.gf(zmsb[z_index])
+            gf = mpi.all_reduce(mpi.world, gf, lambda x, y: x + y)
+        return gf, self.lehmann.moments(self.Nmoments), self.lehmann.occupation, self.lehmann.magnetization
+
+    def __call_fortran(self, u_mat, zmsb, verbosity, remove_split, n_lev, local=False):
+        """
+        Call the Fortran solver gf_hi_fullu for the complex frequencies zmsb.
+
+        The frequencies are split into contiguous slices over the MPI processes and
+        the slices of the Green's function are gathered. If local is True, or if there are
+        fewer frequencies than processes, the whole axis is computed on one process.
+        """
+        mpi.report("Starting Fortran solver %(name)s" % self.__dict__)
+        u_para, u_antipara = reduce_4index_to_2index(u_mat)
+        temp = 1.0/self.beta
+        n_z = len(zmsb)
+
+        def gf_hi(z):
+            return gf_hi_fullu(e0f=self.ealmat, ur=u_mat, umn=u_para, ujmn=u_antipara,
+                               zmsb=z, nmom=self.Nmoments, ns=self.Nspin, temp=temp,
+                               verbosity=verbosity, remove_split=remove_split, nlev_cf=n_lev)
+
+        if local or mpi.size == 1:
+            return gf_hi(zmsb)
+
+        if n_z < mpi.size:
+            gf = numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm, n_z), numpy.complex_)
+            tail = [numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm), numpy.complex_)
+                    for i in range(self.Nmoments)]
+            atocc = 0.0
+            atmag = 0.0
+            if mpi.is_master_node():
+                gf, tail, atocc, atmag = gf_hi(zmsb)
+            return mpi.bcast(gf), mpi.bcast(tail), mpi.bcast(atocc), mpi.bcast(atmag)
+
+        # The tail and the occupations do not depend on the frequencies,
+        # so that they are identical on all processes.
+        z_index = mpi.slice_array(numpy.arange(n_z))
+        gf_slice, tail, atocc, atmag = gf_hi(zmsb[z_index])
+        gf = numpy.zeros((self.Nspin*self.Nlm, self.Nspin*self.Nlm, n_z), numpy.complex_)
+        gf[:, :, z_index] = gf_slice
+        gf = mpi.all_reduce(mpi.world, gf, lambda x, y: x + y)
+        return gf, tail, atocc, atmag
+
     def __save_eal(self, filename, it):
         if mpi.is_master_node():
             f = open(filename, 'a')
@@ -0,0 +1,337 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+
+#
+# Number of spatial dimensions of each preset lattice
+#
+lattice_dimension = {'chain': 1, 'square': 2, 'cubic': 3, 'bethe': 1}
+
+
+def kmesh(lattice, nk):
+    """
+    Uniform k-mesh of a preset lattice
+
+    Parameters
+    ----------
+    lattice : string
+        chain, square or cubic
+    nk : integer
+        Number of k along each line
+
+    Returns
+    -------
+    kvec : float array [nkbz, 3]
+        k-points in the unit of the lattice constant. The last axis runs fastest,
+        i.e. the order is the same as the nested loops (i0, i1, i2).
+    """
+    ndim = lattice_dimension[lattice]
+    k1d = 2.0 * numpy.pi * numpy.arange(nk) / float(nk)
+    kvec = numpy.zeros((nk**ndim, 3), numpy.float_)
+    grid = numpy.meshgrid(*([k1d] * ndim), indexing='ij')
+    for i in range(ndim):
+        kvec[:, i] = grid[i].ravel()
+    return kvec
+
+
+def irreducible_kmesh(lattice, nk):
+    """
+    Irreducible wedge of the uniform k-mesh of a preset lattice under its point group
+    (k -> -k for chain, C4v for square and Oh for cubic).
+    The dispersions of the preset lattices are invariant under these operations.
+
+    Parameters
+    ----------
+    lattice : string
+        chain, square or cubic
+    nk : integer
+        Number of k along each line
+
+    Returns
+    -------
+    kvec : float array [n_irr, 3]
+        Irreducible k-points (a subset of kmesh(lattice, nk))
+    multiplicity : integer array [n_irr]
+        Number of the k-points in the full mesh equivalent to each irreducible one
+    """
+    ndim = lattice_dimension[lattice]
+    index = numpy.indices([nk] * ndim).reshape(ndim, -1)
+    #
+    # Canonical image: fold each axis by the reflection, then sort the axes (permutations)
+    #
+    folded = numpy.minimum(index, nk - index)
+    folded = numpy.sort(folded, axis=0)
+    linear = numpy.zeros(index.shape[1], numpy.int_)
+    for i in range(ndim):
+        linear = linear * nk + folded[i, :]
+    irr, multiplicity = numpy.unique(linear, return_counts=True)
+    return kmesh(lattice, nk)[irr], multiplicity
+
+
+def time_reversal_kmesh(nk0, nk1, nk2):
+    """
+    Uniform k-mesh in the fractional coordinate reduced by the time-reversal symmetry k <-> -k
+
+    Parameters
+    ----------
+    nk0, nk1, nk2 : integer
+        Number of k along each reciprocal lattice vector
+
+    Returns
+    -------
+    k_frac : float array [n_irr, 3]
+        k-points in the fractional coordinate, in the same order as the full mesh
+    multiplicity : integer array [n_irr]
+        1 for k = -k and 2 otherwise
+    """
+    nki = numpy.array([nk0, nk1, nk2])
+    index = numpy.indices(nki).reshape(3, -1)
+    linear = (index[0] * nk1 + index[1]) * nk2 + index[2]
+    minus = (-index) % nki[:, None]
+    linear_minus = (minus[0] * nk1 + minus[1]) * nk2 + minus[2]
+    irr = linear <= linear_minus
+    multiplicity = numpy.where(linear[irr] == linear_minus[irr], 1, 2)
+    return index[:, irr].transpose() / nki.astype(numpy.float_), multiplicity
+
+
+def time_reversal_exact(hamr=None, sigma=None, tol=1.0e-5):
+    """
+    Whether or not the sum over the k-mesh reduced by time_reversal_kmesh, followed by the symmetrization
+    (G + G^T)/2, equals the sum over the full mesh.
+    This requires H(-k) = H(k)^T, i.e. a real H(R), and a symmetric self-energy (Sigma^T = Sigma).
+    The latter does not hold in general with the spin-orbit coupling or a non-collinear magnetic order.
+
+    Parameters
+    ----------
+    hamr : complex array [nr, nwan, nwan], optional
+        H(R) in the Wannier basis
+    sigma : complex array [..., n, n], optional
+        Self-energy (e.g. [n_iw, n, n] at the Matsubara frequencies)
+    tol : float, optional
+        Tolerance relative to the largest element of hamr and sigma
+
+    Returns
+    -------
+    exact : bool
+    """
+    if hamr is not None:
+        hamr = numpy.asarray(hamr)
+        if numpy.amax(numpy.abs(hamr.imag)) > tol * max(1.0, numpy.amax(numpy.abs(hamr))):
+            return False
+    if sigma is not None:
+        sigma = numpy.asarray(sigma)
+        asymmetry = numpy.amax(numpy.abs(sigma - numpy.swapaxes(sigma, -1, -2)))
+        if asymmetry > tol * max(1.0, numpy.amax(numpy.abs(sigma))):
+            return False
+    return True
+
+
+def dispersion(lattice, t, tp, kvec):
+    """
+    Energy dispersion of a preset lattice with the nearest (t) and the second-nearest (t') hopping
+
+    Parameters
+    ----------
+    lattice : string
+        chain, square or cubic
+    t : float
+        Nearest-neighbor hopping
+    tp : float
+        Second-nearest-neighbor hopping
+    kvec : float array [n_k, 3]
+        k-points
+
+    Returns
+    -------
+    ek : float array [n_k]
+        Energy at each k
+    """
+    kx, ky, kz = kvec[:, 0], kvec[:, 1], kvec[:, 2]
+    if lattice == 'chain':
+        return 2.0*t*numpy.cos(kx) + 2*tp*numpy.cos(2.0*kx)
+    elif lattice == 'square':
+        return 2.0*t*(numpy.cos(kx) + numpy.cos(ky)) \
+            + 2.0*tp*(numpy.cos(kx + ky) + numpy.cos(kx - ky))
+    elif lattice == 'cubic':
+        return 2*t*(numpy.cos(kx) + numpy.cos(ky) + numpy.cos(kz)) \
+            + 2*tp*(numpy.cos(kx + ky) + numpy.cos(kx - ky)
+                    + numpy.cos(ky + kz) + numpy.cos(ky - kz)
+                    + numpy.cos(kz + kx) + numpy.cos(kz - kx))
+    else:
+        raise RuntimeError("Error ! Invalid lattice : " + lattice)
+
+
+def bethe_levels(t, nk):
+    """
+    Energy levels and weights which reproduce the semi-circular DOS of the Bethe lattice
+
+    Parameters
+    ----------
+    t : float
+        Hopping. The half bandwidth is 2t.
+    nk : integer
+        Number of energy levels
+
+    Returns
+    -------
+    ek : float array [nk]
+        Energy levels
+    wk : float array [nk]
+        Weights (not normalized)
+    """
+    x = (2.0 * numpy.arange(nk) + 1.0 - nk) / float(nk)
+    return 2.0 * t * x, numpy.sqrt(1.0 - x**2)
+
+
+def binned_levels(ek, weights, n_bins, smearing=0.0):
+    """
+    Energy-binned DOS which replaces the k-sum of a model with H(k) = e(k) I by a sum over energy levels
+
+    Parameters
+    ----------
+    ek : float array [n_k]
+        Dispersion on a k-mesh
+    weights : float array [n_k]
+        Normalized weight of each k
+    n_bins : integer
+        Number of energy levels
+    smearing : float, optional
+        Width of the Gaussian broadening. If zero, the k-points are simply histogrammed
+        and each bin is represented by the mean energy of its k-points (the band center is kept exact).
+
+    Returns
+    -------
+    levels : float array [n_levels]
+        Energy levels (empty bins are removed)
+    level_weights : float array [n_levels]
+        Normalized weight of each level
+    """
+    emin, emax = numpy.amin(ek), numpy.amax(ek)
+    if smearing > 0.0:
+        emin -= 4.0 * smearing
+        emax += 4.0 * smearing
+    if emax - emin < 1.0e-12:
+        return numpy.array([emin]), numpy.ones(1, numpy.float_)
+    if smearing <= 0.0:
+        ibin = numpy.minimum(((ek - emin) / (emax - emin) * n_bins).astype(int), n_bins - 1)
+        level_weights = numpy.bincount(ibin, weights=weights, minlength=n_bins)
+        levels = numpy.bincount(ibin, weights=weights * ek, minlength=n_bins)
+        nonzero = level_weights > 0.0
+        levels = levels[nonzero] / level_weights[nonzero]
+        level_weights = level_weights[nonzero]
+    else:
+        #
+        # Assign the weight of each k to the two nearest levels, then convolve with the Gaussian
+        #
+        levels = numpy.linspace(emin, emax, n_bins)
+        de = levels[1] - levels[0]
+        x = (ek - emin) / de
+        i0 = numpy.minimum(numpy.floor(x).astype(int), n_bins - 2)
+        f = x - i0
+        level_weights = numpy.bincount(i0, weights=weights * (1.0 - f), minlength=n_bins) \
+            + numpy.bincount(i0 + 1, weights=weights * f, minlength=n_bins)
+        kernel = numpy.exp(-0.5 * (de * numpy.arange(-n_bins + 1, n_bins) / smearing)**2)
+        level_weights = numpy.convolve(level_weights, kernel, mode='valid')
+    return levels, level_weights / numpy.sum(level_weights)
+
+
+def matsubara_deviation(ek1, weights1, ek2, weights2, beta, n_iw=16):
+    """
+    Largest difference of the local Green's functions sum_k w_k / (iw_n - e_k) of two sets of levels
+    at the lowest Matsubara frequencies. This is used to check the convergence of the energy binning.
+
+    Parameters
+    ----------
+    ek1, weights1 : float array
+        First set of levels and weights
+    ek2, weights2 : float array
+        Second set of levels and weights
+    beta : float
+        Inverse temperature
+    n_iw : integer, optional
+        Number of the Matsubara frequencies
+
+    Returns
+    -------
+    float
+    """
+    iw = 1j * numpy.pi * (2 * numpy.arange(n_iw) + 1) / beta
+    g1 = numpy.sum(weights1[None, :] / (iw[:, None] - ek1[None, :]), axis=1)
+    g2 = numpy.sum(weights2[None, :] / (iw[:, None] - ek2[None, :]), axis=1)
+    return numpy.amax(numpy.abs(g1 - g2))
+
+
+def diagonal_hopping(ek, norb):
+    """
+    H(k) = e(k) I
+
+    Parameters
+    ----------
+    ek : float array [n_k]
+    norb : integer
+        Number of orbitals
+
+    Returns
+    -------
+    hopping : complex array [n_k, 1, norb, norb]
+    """
+    hopping = numpy.zeros((len(ek), 1, norb, norb), numpy.complex_)
+    iorb = numpy.arange(norb)
+    hopping[:, 0, iorb, iorb] = ek[:, None]
+    return hopping
+
+
+def generate_hopping(lattice, t, tp, nk, norb, irreducible=False):
+    """
+    Compute the one-body Hamiltonian H(k) of a preset model on the whole k-mesh at once
+
+    Parameters
+    ----------
+    lattice : string
+        chain, square, cubic or bethe
+    t : float
+        Nearest-neighbor hopping
+    tp : float
+        Second-nearest-neighbor hopping (not used for bethe)
+    nk : integer
+        Number of k along each line
+    norb : integer
+        Number of orbitals
+    irreducible : bool, optional
+        If True, only the irreducible k-points are generated and weighted with their multiplicity
+
+    Returns
+    -------
+    hopping : complex array [nkbz, 1, norb, norb]
+        H(k), which is diagonal in the orbital space
+    bz_weights : float array [nkbz]
+        Normalized weight of each k
+    """
+    if lattice == 'bethe':
+        ek, bz_weights = bethe_levels(t, nk)
+    elif irreducible:
+        kvec, multiplicity = irreducible_kmesh(lattice, nk)
+        ek = dispersion(lattice, t, tp, kvec)
+        bz_weights = multiplicity.astype(numpy.float_)
+    else:
+        ek = dispersion(lattice, t, tp, kmesh(lattice, nk))
+        bz_weights = numpy.ones(len(ek), numpy.float_)
+    bz_weights /= numpy.sum(bz_weights)
+    return diagonal_hopping(ek, norb), bz_weights
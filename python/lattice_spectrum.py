@@ -0,0 +1,145 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+import pytriqs.utility.mpi as mpi
+
+
+def upfold_sigma(proj, sigma):
+    """
+    Self-energy in the band basis, P^dag Sigma P
+
+    Parameters
+    ----------
+    proj : complex array [dim, n_orb]
+        Projector of a correlated shell at a k-point
+    sigma : complex array [n_omega, dim, dim]
+
+    Returns
+    -------
+    complex array [n_omega, n_orb, n_orb]
+    """
+    return numpy.einsum('ia,wib->wab', proj.conj(), numpy.einsum('wij,jb->wib', sigma, proj))
+
+
+def dc_to_global(dc, rot_mat, time_inv=False):
+    """
+    Double-counting matrix of a correlated shell rotated from the local to the global coordinate system,
+    as Sigma_imp is rotated by SumkDFT.rotloc(..., 'toGlobal')
+
+    Parameters
+    ----------
+    dc : complex array [dim, dim]
+        Double counting in the local coordinate system (dc_imp)
+    rot_mat : complex array [dim, dim]
+        Rotation matrix of the shell
+    time_inv : bool, optional
+        Whether the rotation includes the time inversion (rot_mat_time_inv with the spin-orbit coupling)
+
+    Returns
+    -------
+    complex array [dim, dim]
+    """
+    if time_inv:
+        return numpy.dot(rot_mat.conjugate(), numpy.dot(dc.transpose(), rot_mat.transpose()))
+    return numpy.dot(rot_mat, numpy.dot(dc, rot_mat.conjugate().transpose()))
+
+
+def spectral_ksum(hopping, proj_mat, dims, omega, broadening, terms, weights=None, with_akw=False):
+    """
+    Lattice Green's function G(k, w) = [w + i broadening + mu - H(k) - Sigma(w)]^{-1} of one spin block,
+    and the quantities obtained from it in a single pass over k.
+    The k-points are distributed over the MPI processes, and G(k, w) is computed at all frequencies
+    at once by a stacked matrix inversion.
+
+    Parameters
+    ----------
+    hopping : complex array [n_k, n_orb, n_orb]
+        H(k)
+    proj_mat : complex array [n_k, n_corr_shells, dim_max, n_orb]
+        Projectors onto the correlated shells
+    dims : list of int
+        Dimension of each correlated shell
+    omega : float array [n_omega]
+        Real frequencies
+    broadening : float
+        Lorentzian broadening
+    terms : list of (float, list)
+        (mu, sigma), where sigma is the list of Sigma - dc [n_omega, dim, dim] at each correlated shell,
+        or None for the non-interacting Green's function.
+        All terms are computed in the same pass over k.
+    weights : float array [n_k], optional
+        Weights of k-points. If given, the DOS and the local Green's functions are computed.
+    with_akw : bool, optional
+        If True, A(k, w) is computed at each k-point.
+
+    Returns
+    -------
+    results : list of dict (one for each term)
+        'dos' : float array [n_omega]
+            -1/pi Im Tr sum_k w_k G(k, w)
+        'gloc' : list of complex array [n_omega, dim, dim]
+            sum_k w_k P G(k, w) P^dag at each correlated shell
+        'akw' : float array [n_k, n_omega]
+            -1/pi Im Tr G(k, w)
+    """
+    n_k, n_orb = hopping.shape[0], hopping.shape[1]
+    n_om = len(omega)
+    n_corr = len(dims)
+    results = []
+    for _ in terms:
+        res = {}
+        if weights is not None:
+            res['dos'] = numpy.zeros(n_om, numpy.float_)
+            res['gloc'] = [numpy.zeros((n_om, dims[icrsh], dims[icrsh]), numpy.complex_) for icrsh in range(n_corr)]
+        if with_akw:
+            res['akw'] = numpy.zeros((n_k, n_om), numpy.float_)
+        results.append(res)
+
+    z = omega + 1j * broadening
+    for ik in mpi.slice_array(numpy.arange(n_k)):
+        proj = [proj_mat[ik, icrsh, 0:dims[icrsh], 0:n_orb] for icrsh in range(n_corr)]
+        for term, res in zip(terms, results):
+            mu, sigma = term
+            g_inv = numpy.zeros((n_om, n_orb, n_orb), numpy.complex_)
+            g_inv[:, :, :] = (z + mu)[:, None, None] * numpy.identity(n_orb)[None, :, :] - hopping[ik][None, :, :]
+            if sigma is not None:
+                for icrsh in range(n_corr):
+                    g_inv -= upfold_sigma(proj[icrsh], sigma[icrsh])
+            g = numpy.linalg.inv(g_inv)
+            akw = -numpy.trace(g, axis1=1, axis2=2).imag / numpy.pi
+            if with_akw:
+                res['akw'][ik, :] = akw
+            if weights is not None:
+                res['dos'] += weights[ik] * akw
+                for icrsh in range(n_corr):
+                    # Downfold: P G P^dag
+                    g_proj = numpy.einsum('ia,wab->wib', proj[icrsh], g)
+                    res['gloc'][icrsh] += weights[ik] * numpy.einsum('wib,jb->wij', g_proj, proj[icrsh].conj())
+
+    #
+    # Collect the results across processes
+    #
+    for res in results:
+        for key in ['dos', 'akw']:
+            if key in res:
+                res[key] = mpi.all_reduce(mpi.world, res[key], lambda x, y: x + y)
+        if 'gloc' in res:
+            res['gloc'] = [mpi.all_reduce(mpi.world, g, lambda x, y: x + y) for g in res['gloc']]
+    return results
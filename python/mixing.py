@@ -0,0 +1,162 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+
+#
+# Mixing schemes of the self-energy
+#   linear   : sigma_mix * Sigma_out + (1 - sigma_mix) * Sigma_in
+#   anderson : Anderson (DIIS) mixing
+#   broyden  : modified Broyden mixing (Johnson, 1988)
+#
+mixing_methods = ['linear', 'anderson', 'broyden']
+
+
+def flatten_sigma(sigma):
+    """
+    Real vector made of the real and imaginary parts of Sigma_iw of all inequivalent shells
+
+    Parameters
+    ----------
+    sigma : list of BlockGf
+
+    Returns
+    -------
+    float array
+    """
+    v = numpy.concatenate([g.data.ravel() for sigma_sh in sigma for bname, g in sigma_sh])
+    return numpy.concatenate((v.real, v.imag))
+
+
+def mixing_coefficients(residuals, method, w0=0.01):
+    """
+    Coefficients theta_j of the next input x = sum_j theta_j y_j, where y_j is the linear mixing
+    of the input and the output at the j-th step of the history and sum_j theta_j = 1.
+
+    Both methods minimize the residual in the space spanned by the differences of the residuals
+    of successive steps, dF_i = F_{i+1} - F_i (Eyert, 1996).
+    The Broyden method normalizes dF_i and regularizes the normal equation by w0.
+
+    Parameters
+    ----------
+    residuals : list of float array
+        F_j = x_out_j - x_in_j, oldest first
+    method : string
+        anderson or broyden
+    w0 : float, optional
+        Regularization of the Broyden method
+
+    Returns
+    -------
+    theta : float array [len(residuals)]
+    """
+    m = len(residuals)
+    theta = numpy.zeros(m, numpy.float_)
+    theta[-1] = 1.0
+    if m == 1 or method == 'linear':
+        return theta
+    df = numpy.array([residuals[i + 1] - residuals[i] for i in range(m - 1)]).transpose()
+    norm = numpy.ones(m - 1, numpy.float_)
+    if method == 'anderson':
+        gamma = numpy.linalg.lstsq(df, residuals[-1], rcond=1.0e-12)[0]
+    elif method == 'broyden':
+        norm = numpy.sqrt(numpy.sum(df**2, axis=0))
+        norm[norm == 0.0] = 1.0
+        df = df / norm[None, :]
+        a = numpy.dot(df.transpose(), df) + w0**2 * numpy.identity(m - 1)
+        gamma = numpy.linalg.solve(a, numpy.dot(df.transpose(), residuals[-1]))
+    else:
+        raise RuntimeError("Unknown mixing : " + method)
+    #
+    # x = y_m - sum_i gamma_i (y_{i+1} - y_i) / norm_i
+    #
+    gamma /= norm
+    theta[1:] -= gamma
+    theta[:-1] += gamma
+    return theta
+
+
+class SigmaMixer(object):
+    """
+    Mixing of the self-energy with a bounded history of (Sigma_in, Sigma_out) of the previous iterations
+    """
+
+    def __init__(self, method, alpha, n_history):
+        """
+        Parameters
+        ----------
+        method : string
+            One of mixing_methods
+        alpha : float
+            Weight of the output in the linear mixing (sigma_mix)
+        n_history : int
+            Number of iterations kept in the history
+        """
+        if method not in mixing_methods:
+            raise RuntimeError("Unknown mixing : " + method)
+        if n_history < 1:
+            raise RuntimeError("mixing_history must be positive.")
+        self._method = method
+        self._alpha = alpha
+        # The linear mixing needs only the latest iteration
+        self._n_history = 1 if method == 'linear' else n_history
+        self._history = []
+
+    @property
+    def history(self):
+        """
+        List of (Sigma_in, Sigma_out), oldest first
+        """
+        return self._history
+
+    def add(self, sigma_in, sigma_out):
+        """
+        Append the input and the output of an iteration to the history
+
+        Parameters
+        ----------
+        sigma_in : list of BlockGf
+            Sigma_iw with which the impurity problems were set up
+        sigma_out : list of BlockGf
+            Sigma_iw from the impurity solvers
+        """
+        self._history.append(([g.copy() for g in sigma_in], [g.copy() for g in sigma_out]))
+        if len(self._history) > self._n_history:
+            self._history = self._history[-self._n_history:]
+
+    def mix(self):
+        """
+        Next input of Sigma_iw from the history
+
+        Returns
+        -------
+        list of BlockGf
+        """
+        if self._method == 'linear':
+            theta = numpy.ones(1)
+        else:
+            residuals = [flatten_sigma(sigma_out) - flatten_sigma(sigma_in) for sigma_in, sigma_out in self._history]
+            theta = mixing_coefficients(residuals, self._method)
+        history = self._history[-len(theta):]
+        sigma_new = [g.copy() for g in history[-1][1]]
+        for ish in range(len(sigma_new)):
+            sigma_new[ish].zero()
+            for t, (sigma_in, sigma_out) in zip(theta, history):
+                sigma_new[ish] += t * (self._alpha * sigma_out[ish] + (1.0 - self._alpha) * sigma_in[ish])
+        return sigma_new
@@ -0,0 +1,562 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import os
+import subprocess
+from distutils.spawn import find_executable
+from pytriqs.archive.hdf_archive import HDFArchive
+import pytriqs.utility.mpi as mpi
+
+
+#
+# Policies for the history of Sigma_iw. The latest iteration is always kept.
+#   all   : keep all iterations
+#   last  : keep the last n iterations
+#   every : keep every n-th iteration
+#   final : keep only the latest iteration
+#
+sigma_history_policies = ['all', 'last', 'every', 'final']
+
+#
+# Suffix of the temporary key to which a group is written before it is renamed into place (See _write_atomic)
+#
+_tmp_suffix = '_tmp'
+
+
+def sigma_iterations(group):
+    """
+    Iterations for which Sigma_iw is stored in the output group
+
+    Parameters
+    ----------
+    group : HDFArchiveGroup
+        Output group (e.g. ar['dmft_out'])
+
+    Returns
+    -------
+    list of int in ascending order
+    """
+    # Skip a temporary key left by an interrupted write
+    return sorted([int(key) for key in group['Sigma_iw'].keys() if key.isdigit()])
+
+
+def convergence_history(group):
+    """
+    Metrics of the convergence stored at each iteration (See convergence.ConvergenceChecker)
+
+    Parameters
+    ----------
+    group : HDFArchiveGroup
+        Output group (e.g. ar['dmft_out'])
+
+    Returns
+    -------
+    list of (int, dict) in ascending order of the iteration. Empty if not stored.
+    """
+    if not ('convergence' in group):
+        return []
+    return [(itr, group['convergence'][str(itr)])
+            for itr in sorted([int(key) for key in group['convergence'].keys()])]
+
+
+def timings_history(group):
+    """
+    Timings of the phases of the DMFT loop stored at each iteration (See timing.TimerRegistry)
+
+    Parameters
+    ----------
+    group : HDFArchiveGroup
+        Output group (e.g. ar['dmft_out'])
+
+    Returns
+    -------
+    list of (int, dict) in ascending order of the iteration. Empty if not stored.
+    """
+    if not ('timings' in group):
+        return []
+    return [(itr, group['timings'][str(itr)])
+            for itr in sorted([int(key) for key in group['timings'].keys()])]
+
+
+class OutputArchive(object):
+    """
+    Output file of the DMFT loop (seedname.out.h5).
+
+    The file is opened only on the master node and is kept open for the whole run.
+    Data are flushed explicitly by flush() at checkpoints and the file is closed by close().
+    On the other nodes, all methods do nothing.
+    """
+
+    def __init__(self, filename, group, sigma_history='all', sigma_history_n=1, compression=0):
+        """
+        Parameters
+        ----------
+        filename : string
+            Name of the HDF5 file
+        group : string
+            Name of the group where the results are stored
+        sigma_history : string, optional
+            Policy for the history of Sigma_iw (See sigma_history_policies)
+        sigma_history_n : int, optional
+            n for the policies 'last' and 'every'
+        compression : int, optional
+            Level of the gzip compression applied when the file is closed (0: no compression)
+        """
+        if sigma_history not in sigma_history_policies:
+            raise RuntimeError("Unknown sigma_history : " + sigma_history)
+        if sigma_history in ['last', 'every'] and sigma_history_n < 1:
+            raise RuntimeError("sigma_history_n must be positive.")
+        self._filename = filename
+        self._group_name = group
+        self._sigma_history = sigma_history
+        self._sigma_history_n = sigma_history_n
+        self._compression = compression
+        self._ar = None
+        if mpi.is_master_node():
+            self._ar = HDFArchive(filename, 'a')
+
+    @property
+    def group(self):
+        """
+        The output group (only on the master node)
+        """
+        return self._ar[self._group_name]
+
+    def prepare(self, params):
+        """
+        Create the output group, or keep the existing one if params['control']['restart'] is True.
+
+        Parameters
+        ----------
+        params : dict
+            Input parameters, which are stored in the group
+
+        Returns
+        -------
+        previous_runs : int
+            Number of iterations found in the file
+        """
+        previous_runs = 0
+        if self._ar is None:
+            return previous_runs
+
+        if self._group_name in self._ar:
+            if params['control']['restart']:
+                ar = self._ar[self._group_name]
+                # The first iteration may have been interrupted after some shells were solved
+                if 'iterations' not in ar and 'checkpoint' not in ar:
+                    raise RuntimeError("Failed to restart the previous simulation!")
+
+                if 'iterations' in ar:
+                    previous_runs = ar['iterations']
+                if previous_runs <= 0 and 'checkpoint' not in ar:
+                    raise RuntimeError("No previous runs to be loaded from " + self._filename + "!")
+            else:
+                del self._ar[self._group_name]
+                self._ar.create_group(self._group_name)
+        else:
+            self._ar.create_group(self._group_name)
+        self.group['parameters'] = params
+        #
+        # Sub group for something
+        #
+        for gname in ['Sigma_iw', 'G_l', 'chemical_potential']:
+            if not (gname in self.group):
+                self.group.create_group(gname)
+        return previous_runs
+
+    def load_sigma(self, iteration_number, ish):
+        """
+        Read Sigma_iw of an inequivalent shell at a given iteration
+        """
+        return self.group['Sigma_iw'][str(iteration_number)][str(ish)]
+
+    def save_iteration(self, iteration_number, chemical_potential, sigma_iw, g_l=None):
+        """
+        Write the results of one iteration.
+        The number of iterations is updated at the end, so that an interrupted write is not read at the restart.
+
+        Parameters
+        ----------
+        iteration_number : int
+        chemical_potential : float
+        sigma_iw : list of BlockGf
+            Self-energy at each inequivalent shell
+        g_l : list of BlockGf, optional
+            Legendre Green's function at each inequivalent shell
+        """
+        if self._ar is None:
+            return
+        group = self.group
+        #
+        # Save the history of Sigma
+        #
+        self._write_atomic(group['Sigma_iw'], str(iteration_number),
+                           dict((str(ish), sigma_iw[ish]) for ish in range(len(sigma_iw))))
+        if g_l is not None:
+            for ish in range(len(g_l)):
+                group['G_l'][str(ish)] = g_l[ish]
+        group['chemical_potential'][str(iteration_number)] = chemical_potential
+        group['iterations'] = iteration_number
+        self._prune_sigma(iteration_number)
+
+    def save_atomic_lehmann(self, lehmann):
+        """
+        Write the Lehmann representation of the atomic Green's function (Hubbard-I solver)
+        so that it can be reused by dcore_post
+
+        Parameters
+        ----------
+        lehmann : list of AtomicLehmann
+            Lehmann representation at each inequivalent shell (None if not available)
+        """
+        if self._ar is None:
+            return
+        if not ('atomic_lehmann' in self.group):
+            self.group.create_group('atomic_lehmann')
+        for ish in range(len(lehmann)):
+            if lehmann[ish] is not None:
+                self.group['atomic_lehmann'][str(ish)] = lehmann[ish].to_dict()
+
+    def load_pade(self, iteration_number, n_points):
+        """
+        Read the Pade coefficients of Sigma_iw written by dcore_post
+
+        Parameters
+        ----------
+        iteration_number : int
+            Iteration at which Sigma_iw was continued
+        n_points : int
+            Number of Matsubara frequencies used for the Pade approximation
+
+        Returns
+        -------
+        pade : list of dict
+            pade[ish][block] = (z, a) (See pade.pade_coefficients).
+            None if the coefficients are not stored or were computed for other iteration_number or n_points.
+        """
+        if self._ar is None or not ('pade' in self.group):
+            return None
+        group = self.group['pade']
+        if group['iteration'] != iteration_number or group['n_points'] != n_points:
+            return None
+        pade = []
+        for ish in range(group['n_inequiv_shells']):
+            g = group[str(ish)]
+            pade.append(dict((bname, (g[bname]['z'], g[bname]['a'])) for bname in g.keys()))
+        return pade
+
+    def save_pade(self, iteration_number, n_points, pade):
+        """
+        Write the Pade coefficients of Sigma_iw so that they are reused by dcore_post
+
+        Parameters
+        ----------
+        iteration_number : int
+        n_points : int
+        pade : list of dict
+            pade[ish][block] = (z, a)
+        """
+        if self._ar is None:
+            return
+        if 'pade' in self.group:
+            del self.group['pade']
+        self.group.create_group('pade')
+        group = self.group['pade']
+        group['iteration'] = iteration_number
+        group['n_points'] = n_points
+        group['n_inequiv_shells'] = len(pade)
+        for ish in range(len(pade)):
+            group[str(ish)] = dict((bname, {'z': z, 'a': a}) for bname, (z, a) in pade[ish].items())
+
+    def load_akw(self, key):
+        """
+        Read A(k,w) cached by dcore_post
+
+        Parameters
+        ----------
+        key : string
+            Key of the k-path, the self-energy and the frequency mesh
+
+        Returns
+        -------
+        akw : float array [n_spin, n_k, n_omega]
+            None if A(k,w) is not cached for the key
+        """
+        if self._ar is None or not ('akw' in self.group):
+            return None
+        if self.group['akw']['key'] != key:
+            return None
+        return self.group['akw']['akw']
+
+    def save_akw(self, key, akw):
+        """
+        Write A(k,w) so that it is reused by dcore_post (Only the latest one is kept)
+
+        Parameters
+        ----------
+        key : string
+        akw : float array [n_spin, n_k, n_omega]
+        """
+        if self._ar is None:
+            return
+        self.group['akw'] = {'key': key, 'akw': akw}
+
+    def load_convergence(self):
+        """
+        Read the metrics of the convergence of the last iteration
+
+        Returns
+        -------
+        metrics : dict
+            None if not stored
+        """
+        if self._ar is None:
+            return None
+        history = convergence_history(self.group)
+        if len(history) == 0:
+            return None
+        return history[-1][1]
+
+    def save_convergence(self, iteration_number, metrics):
+        """
+        Write the metrics of the convergence of an iteration
+
+        Parameters
+        ----------
+        iteration_number : int
+        metrics : dict
+        """
+        if self._ar is None:
+            return
+        if not ('convergence' in self.group):
+            self.group.create_group('convergence')
+        self.group['convergence'][str(iteration_number)] = metrics
+
+    def save_timings(self, iteration_number, timings):
+        """
+        Write the timings of the phases of an iteration
+
+        Parameters
+        ----------
+        iteration_number : int
+        timings : dict
+            Returned by TimerRegistry.summary()
+        """
+        if self._ar is None:
+            return
+        if not ('timings' in self.group):
+            self.group.create_group('timings')
+        self.group['timings'][str(iteration_number)] = dict(timings)
+
+    def load_mixing(self):
+        """
+        Read the history of the mixing of Sigma_iw
+
+        Returns
+        -------
+        history : list of (list of BlockGf, list of BlockGf)
+            (Sigma_in, Sigma_out) at each iteration, oldest first. Empty if not stored.
+        """
+        if self._ar is None or not ('mixing' in self.group):
+            return []
+        group = self.group['mixing']
+        history = []
+        for itr in sorted([int(key) for key in group.keys()]):
+            g = group[str(itr)]
+            n_inequiv_shells = len(g['in'].keys())
+            history.append(([g['in'][str(ish)] for ish in range(n_inequiv_shells)],
+                            [g['out'][str(ish)] for ish in range(n_inequiv_shells)]))
+        return history
+
+    def save_mixing(self, iteration_number, sigma_in, sigma_out, n_history):
+        """
+        Append the input and the output of an iteration to the history of the mixing,
+        and remove the iterations older than the last n_history ones
+
+        Parameters
+        ----------
+        iteration_number : int
+        sigma_in : list of BlockGf
+        sigma_out : list of BlockGf
+        n_history : int
+        """
+        if self._ar is None:
+            return
+        if not ('mixing' in self.group):
+            self.group.create_group('mixing')
+        group = self.group['mixing']
+        group[str(iteration_number)] = {
+            'in': dict((str(ish), sigma_in[ish]) for ish in range(len(sigma_in))),
+            'out': dict((str(ish), sigma_out[ish]) for ish in range(len(sigma_out))),
+        }
+        for itr in sorted([int(key) for key in group.keys()])[:-n_history]:
+            del group[str(itr)]
+
+    def begin_checkpoint(self, iteration_number, chemical_potential):
+        """
+        Start the checkpoints of the impurity problems of an iteration.
+        The checkpoints of another iteration are removed, while those of the same iteration are kept.
+
+        Parameters
+        ----------
+        iteration_number : int
+        chemical_potential : float
+            Chemical potential with which the impurity problems are set up
+        """
+        if self._ar is None:
+            return
+        if 'checkpoint' in self.group:
+            group = self.group['checkpoint']
+            if 'iteration' in group and group['iteration'] == iteration_number:
+                return
+            del self.group['checkpoint']
+        self.group.create_group('checkpoint')
+        group = self.group['checkpoint']
+        group['chemical_potential'] = chemical_potential
+        group['iteration'] = iteration_number
+        self.flush()
+
+    def save_checkpoint(self, ish, data):
+        """
+        Write the checkpoint of a solved inequivalent shell
+
+        Parameters
+        ----------
+        ish : int
+        data : dict
+            Input and results of the impurity problem (e.g. G0_iw, Sigma_in, G_iw, Sigma_iw, G_l)
+        """
+        if self._ar is None:
+            return
+        self._write_atomic(self.group['checkpoint'], str(ish), data)
+
+    def load_checkpoint(self, iteration_number):
+        """
+        Read the checkpoints of an iteration
+
+        Parameters
+        ----------
+        iteration_number : int
+
+        Returns
+        -------
+        chemical_potential : float
+            None if there is no checkpoint of the iteration
+        shells : dict
+            {ish: data} of the solved inequivalent shells (See save_checkpoint)
+        """
+        if self._ar is None or not ('checkpoint' in self.group):
+            return None, {}
+        group = self.group['checkpoint']
+        if not ('iteration' in group) or group['iteration'] != iteration_number:
+            return None, {}
+        # Skip a temporary key left by an interrupted write
+        shells = dict((int(key), group[key]) for key in group.keys() if key.isdigit())
+        return group['chemical_potential'], shells
+
+    def clear_checkpoint(self):
+        """
+        Remove the checkpoints after the iteration is completed
+        """
+        if self._ar is None or not ('checkpoint' in self.group):
+            return
+        del self.group['checkpoint']
+        self.flush()
+
+    def _write_atomic(self, group, key, value):
+        """
+        Write group[key] = value through a temporary key, which is renamed into place after the data are flushed.
+        Thus, group[key] is either absent or complete even if the program is killed during the write.
+        """
+        tmp_key = key + _tmp_suffix
+        if tmp_key in group:
+            del group[tmp_key]
+        group[tmp_key] = value
+        self.flush()
+        if key in group:
+            del group[key]
+        h5group = getattr(group, '_group', None)
+        if h5group is not None and hasattr(h5group, 'move'):
+            # Renaming a link is a single update of the HDF5 metadata
+            h5group.move(tmp_key, key)
+        else:
+            group[key] = value
+            del group[tmp_key]
+        self.flush()
+
+    def _keep_sigma(self, itr, iteration_number):
+        """
+        Whether Sigma_iw at the iteration itr is kept when the latest one is iteration_number
+        """
+        if itr == iteration_number or self._sigma_history == 'all':
+            return True
+        elif self._sigma_history == 'last':
+            return itr > iteration_number - self._sigma_history_n
+        elif self._sigma_history == 'every':
+            return itr % self._sigma_history_n == 0
+        else:
+            return False
+
+    def _prune_sigma(self, iteration_number):
+        """
+        Remove Sigma_iw which is not kept according to the policy
+        """
+        if self._sigma_history == 'all':
+            return
+        group = self.group['Sigma_iw']
+        for itr in sigma_iterations(self.group):
+            if not self._keep_sigma(itr, iteration_number):
+                del group[str(itr)]
+
+    def flush(self):
+        """
+        Flush the data to the disk
+        """
+        if self._ar is not None and hasattr(self._ar, '_flush'):
+            self._ar._flush()
+
+    def close(self):
+        """
+        Close the file
+        """
+        if self._ar is not None:
+            self.flush()
+            del self._ar
+            self._ar = None
+            if self._compression > 0:
+                self._repack()
+
+    def _repack(self):
+        """
+        Rewrite the file with chunked and gzip-compressed datasets by h5repack.
+        This also reclaims the space of the removed Sigma_iw.
+        """
+        h5repack = find_executable('h5repack')
+        if h5repack is None:
+            print("Warning: h5repack is not found. {0} is not compressed.".format(self._filename))
+            return
+        tmp_filename = self._filename + '.repack'
+        ret = subprocess.call([h5repack, '-f', 'GZIP={0}'.format(self._compression), self._filename, tmp_filename])
+        if ret == 0:
+            os.rename(tmp_filename, self._filename)
+        else:
+            print("Warning: h5repack failed. {0} is not compressed.".format(self._filename))
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
@@ -0,0 +1,138 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+import pytriqs.utility.mpi as mpi
+
+
+def pade_coefficients(z, u):
+    """
+    Coefficients of the Pade approximant in the continued-fraction form (Vidberg and Serene, 1977)
+
+        C(w) = a_0 / (1 + a_1 (w - z_0) / (1 + a_2 (w - z_1) / (1 + ...)))
+
+    which satisfies C(z_i) = u_i. All matrix elements are processed at once.
+    The recursion is done in extended precision because it is numerically unstable.
+
+    Parameters
+    ----------
+    z : complex array [n_points]
+        Input points (Matsubara frequencies)
+    u : complex array [n_points, ...]
+        Values at the input points. The other dimensions are matrix elements.
+
+    Returns
+    -------
+    a : complex array [n_points, ...]
+        Coefficients. If the continued fraction terminates at some order, the higher coefficients are zero.
+    """
+    n_points = len(z)
+    shape = u.shape[1:]
+    z_ext = numpy.array(z, dtype=numpy.clongdouble).reshape((n_points,) + (1,) * len(shape))
+    g = numpy.array(u, dtype=numpy.clongdouble)
+    a = numpy.zeros(u.shape, dtype=numpy.complex_)
+    a[0] = g[0]
+    with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for p in range(1, n_points):
+            # g_p(z_j) = (g_{p-1}(z_{p-1}) / g_{p-1}(z_j) - 1) / (z_j - z_{p-1})  for j >= p
+            g[p:] = (g[p-1] / g[p:] - 1.0) / (z_ext[p:] - z_ext[p-1])
+            g[p:] = numpy.where(numpy.isfinite(g[p:]), g[p:], 0.0)
+            a[p] = g[p]
+    #
+    # Terminate the continued fraction after a vanishing coefficient
+    #
+    alive = numpy.ones(shape, dtype=bool)
+    for p in range(n_points):
+        a[p] = numpy.where(alive, a[p], 0.0)
+        alive = numpy.logical_and(alive, a[p] != 0.0)
+    return a
+
+
+def pade_evaluate(z, a, omega):
+    """
+    Evaluate the Pade approximant by the three-term recurrence of the continued fraction
+
+    Parameters
+    ----------
+    z : complex array [n_points]
+        Input points used for the coefficients
+    a : complex array [n_points, ...]
+        Coefficients from pade_coefficients
+    omega : complex array [n_omega]
+        Frequencies where the approximant is evaluated
+
+    Returns
+    -------
+    complex array [n_omega, ...]
+    """
+    n_points = len(z)
+    shape = a.shape[1:]
+    w = numpy.asarray(omega, dtype=numpy.complex_).reshape((len(omega),) + (1,) * len(shape))
+    a1 = numpy.zeros((len(omega),) + shape, dtype=numpy.complex_)
+    a2 = numpy.zeros_like(a1)
+    a2[:] = a[0]
+    b1 = numpy.ones_like(a1)
+    b2 = numpy.ones_like(a1)
+    for i in range(n_points - 1):
+        c = (w - z[i]) * a[i + 1]
+        a1, a2 = a2, a2 + c * a1
+        b1, b2 = b2, b2 + c * b1
+        #
+        # Rescale to avoid overflow
+        #
+        a1 /= b2
+        a2 /= b2
+        b1 /= b2
+        b2 = numpy.ones_like(b2)
+    return a2 / b2
+
+
+def pade_evaluate_mpi(z, a, omega):
+    """
+    Evaluate the Pade approximant with the frequencies distributed over the MPI processes.
+    The arguments and the result are the same as pade_evaluate.
+    """
+    result = numpy.zeros((len(omega),) + a.shape[1:], dtype=numpy.complex_)
+    iw_local = mpi.slice_array(numpy.arange(len(omega)))
+    if len(iw_local) > 0:
+        result[iw_local] = pade_evaluate(z, a, numpy.asarray(omega)[iw_local])
+    return mpi.all_reduce(mpi.world, result, lambda x, y: x + y)
+
+
+def pade_from_matsubara(gf_iw, n_points):
+    """
+    Pade coefficients of a Green's function (or self-energy) on the Matsubara axis
+
+    Parameters
+    ----------
+    gf_iw : GfImFreq
+        Green's function on the full (positive and negative) Matsubara mesh
+    n_points : int
+        Number of the lowest positive Matsubara frequencies used
+
+    Returns
+    -------
+    z : complex array [n_points]
+    a : complex array [n_points, dim, dim]
+    """
+    n_iw = gf_iw.data.shape[0] // 2
+    if n_points > n_iw:
+        raise RuntimeError("Error ! n_points for the Pade approximation exceeds the number of Matsubara frequencies.")
+    z = numpy.array([complex(x) for x in gf_iw.mesh])[n_iw:n_iw + n_points]
+    return z, pade_coefficients(z, gf_iw.data[n_iw:n_iw + n_points, :, :])
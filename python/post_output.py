@@ -0,0 +1,249 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+from pytriqs.archive.hdf_archive import HDFArchive
+
+#
+# Output formats of dcore_post
+#   text : seedname_dos.dat, seedname_akw.dat, ... (for gnuplot)
+#   hdf5 : one group for each quantity in seedname_post.h5
+#   npy  : seedname_<quantity>_<name>.npy for each array (can be opened with numpy.load(mmap_mode='r'))
+#
+post_output_formats = ['text', 'hdf5', 'npy']
+
+
+def parse_output_format(output_format):
+    """
+    Parse a comma-separated list of output formats (e.g. "text,hdf5")
+
+    Returns
+    -------
+    list of string
+    """
+    formats = [s.strip() for s in output_format.split(',') if len(s.strip()) > 0]
+    for fmt in formats:
+        if fmt not in post_output_formats:
+            raise RuntimeError("Error ! Unknown output_format : " + fmt)
+    return formats
+
+
+class PostOutput(object):
+    """
+    Writer of the results of dcore_post. All methods must be called only on the master node.
+    """
+
+    def __init__(self, seedname, output_format):
+        """
+        Parameters
+        ----------
+        seedname : string
+        output_format : string
+            Comma-separated list of the output formats (See post_output_formats)
+        """
+        self._seedname = seedname
+        self._formats = parse_output_format(output_format)
+        self._h5_filename = seedname + '_post.h5'
+        if 'hdf5' in self._formats:
+            # Start a new file
+            ar = HDFArchive(self._h5_filename, 'w')
+            del ar
+
+    @property
+    def text(self):
+        """
+        Whether the text files are written
+        """
+        return 'text' in self._formats
+
+    def save(self, quantity, data):
+        """
+        Write arrays in the binary formats
+
+        Parameters
+        ----------
+        quantity : string
+            Name of the quantity (e.g. 'dos'), which is used as the name of the group or file
+        data : dict
+            Arrays to be written
+        """
+        if 'hdf5' in self._formats:
+            ar = HDFArchive(self._h5_filename, 'a')
+            ar[quantity] = data
+            del ar
+            print("\n    Output {0} in {1}".format(quantity, self._h5_filename))
+        if 'npy' in self._formats:
+            for name, value in data.items():
+                filename = "{0}_{1}_{2}.npy".format(self._seedname, quantity, name)
+                numpy.save(filename, numpy.asarray(value))
+                print("\n    Output {0}".format(filename))
+
+    def save_kpath(self, kvec, xk, klabel, xk_label):
+        """
+        Write the k-path
+
+        Parameters
+        ----------
+        kvec : float array [n_k, 3]
+            k-points (2 pi times the fractional coordinate)
+        xk : float array [n_k]
+            Distance along the k-path
+        klabel : list of string
+            Labels of the k-nodes
+        xk_label : float array [nnode]
+            Position of the k-nodes along the k-path
+        """
+        self.save('kpath', {'kvec': kvec, 'xk': xk, 'klabel': numpy.array(klabel), 'xk_label': xk_label})
+
+    def write_dos(self, quantity, om_mesh, dos, pdos, spin_names):
+        """
+        Write DOS and PDOS
+
+        Parameters
+        ----------
+        quantity : string
+            'dos' or 'dos0'
+        om_mesh : float array [Nomega]
+        dos : float array [n_spin, Nomega]
+        pdos : list of float array [n_spin, Nomega, dim]
+            PDOS (diagonal part) at each inequivalent shell
+        spin_names : list of string
+        """
+        data = {'omega': om_mesh, 'dos': dos}
+        for ish in range(len(pdos)):
+            data['pdos_' + str(ish)] = pdos[ish]
+        self.save(quantity, data)
+        if not self.text:
+            return
+
+        filename = self._seedname + '_' + quantity + '.dat'
+        columns = [om_mesh] + [dos[isp] for isp in range(len(spin_names))]
+        with open(filename, 'w') as f:
+            #
+            # Description of columns
+            #
+            print("# [1] Energy", file=f)
+            ii = 1
+            for isp in spin_names:
+                ii += 1
+                print("# [%d] Total DOS of spin %s" % (ii, isp), file=f)
+            for ish in range(len(pdos)):
+                for isp in range(len(spin_names)):
+                    for iorb in range(pdos[ish].shape[2]):
+                        ii += 1
+                        print("# [%d] PDOS of shell%d,spin %s,band%d" % (ii, ish, spin_names[isp], iorb), file=f)
+                        columns.append(pdos[ish][isp, :, iorb])
+            numpy.savetxt(f, numpy.array(columns).transpose(), fmt='%f')
+        print("\n    Output {0}".format(filename))
+
+    def write_akw(self, xk, om_mesh, akw, spin_names):
+        """
+        Write A(k, omega) along the k-path
+
+        Parameters
+        ----------
+        xk : float array [n_k]
+        om_mesh : float array [Nomega]
+        akw : float array [n_spin, n_k, Nomega]
+        spin_names : list of string
+        """
+        self.save('akw', {'xk': xk, 'omega': om_mesh, 'akw': akw})
+        if not self.text:
+            return
+
+        filename = self._seedname + '_akw.dat'
+        n_k, n_om = akw.shape[1], akw.shape[2]
+        with open(filename, 'w') as f:
+            offset = 0.0
+            for isp in range(len(spin_names)):
+                for ik in range(n_k):
+                    block = numpy.empty((n_om, 3))
+                    block[:, 0] = xk[ik] + offset
+                    block[:, 1] = om_mesh
+                    block[:, 2] = akw[isp, ik, :]
+                    numpy.savetxt(f, block, fmt='%f')
+                    print("", file=f)
+                offset = xk[n_k-1] * 1.1
+                print("", file=f)
+        print("\n    Output {0}".format(filename))
+
+    def write_momdist(self, xk, den, spin_names):
+        """
+        Write the momentum distribution along the k-path
+
+        Parameters
+        ----------
+        xk : float array [n_k]
+        den : complex array [n_k, n_spin, norb, norb]
+        spin_names : list of string
+        """
+        self.save('momdist', {'xk': xk, 'momdist': den})
+        if not self.text:
+            return
+
+        filename = self._seedname + "_momdist.dat"
+        n_k, n_spin, norb = den.shape[0], den.shape[1], den.shape[2]
+        with open(filename, 'w') as fo:
+            print("# Momentum distribution", file=fo)
+            #
+            # Column information
+            #
+            print("# [Column] Data", file=fo)
+            print("# [1] Distance along k-path", file=fo)
+            icol = 1
+            for isp in spin_names:
+                for iorb in range(norb):
+                    for jorb in range(norb):
+                        icol += 1
+                        print("# [%d] Re(MomDist_{spin=%s, %d, %d})" % (icol, isp, iorb, jorb), file=fo)
+                        icol += 1
+                        print("# [%d] Im(MomDist_{spin=%s, %d, %d})" % (icol, isp, iorb, jorb), file=fo)
+            #
+            # Write data (real and imaginary parts side by side)
+            #
+            den_ri = numpy.empty((n_k, n_spin*norb*norb, 2))
+            den_ri[:, :, 0] = den.reshape(n_k, -1).real
+            den_ri[:, :, 1] = den.reshape(n_k, -1).imag
+            numpy.savetxt(fo, numpy.hstack((numpy.asarray(xk)[:, None], den_ri.reshape(n_k, -1))), fmt='%f')
+        print("\n Output Momentum distribution : ", filename)
+
+    def write_bands(self, xk, ev0, spin_names):
+        """
+        Write the non-interacting band energies along the k-path
+
+        Parameters
+        ----------
+        xk : float array [n_k]
+        ev0 : float array [n_k, norb]
+        spin_names : list of string
+        """
+        self.save('akw0', {'xk': xk, 'energy': ev0})
+        if not self.text:
+            return
+
+        filename = self._seedname + "_akw0.dat"
+        n_k, norb = ev0.shape
+        with open(filename, 'w') as fo:
+            offset = 0.0
+            for isp in spin_names:
+                for iorb in range(norb):
+                    numpy.savetxt(fo, numpy.array([xk + offset, ev0[:, iorb]]).transpose(), fmt='%f')
+                    print("", file=fo)
+                offset = xk[n_k-1]*1.1
+                print("", file=fo)
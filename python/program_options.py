@@ -62,10 +62,21 @@ def create_parser():
     parser.add_option("system", "nk0", int, 0, "Number of *k* along b_0 (only for wannier90)")
     parser.add_option("system", "nk1", int, 0, "Number of *k* along b_1 (only for wannier90)")
     parser.add_option("system", "nk2", int, 0, "Number of *k* along b_2 (only for wannier90)")
+    parser.add_option("system", "irreducible_k", bool, False,
+                      "Whether or not to use only the irreducible k-points (point group for chain, square and cubic; "
+                      "k <-> -k for wannier90 with real H(R), but not with spin_orbit or non_colinear)")
+    parser.add_option("system", "n_dos", int, 0,
+                      "Number of energy levels of the binned DOS replacing the k-mesh (only for chain, square and cubic; 0: not used)")
+    parser.add_option("system", "dos_smearing", float, 0.0,
+                      "Width of the Gaussian broadening of the binned DOS (0: histogram)")
     parser.add_option("system", "prec_mu", float, 0.0001,
                       "Threshold for calculating chemical potential with the bisection method.")
+    parser.add_option("system", "mu_solver", str, "bisection",
+                      'Method to find the chemical potential. Chosen from "bisection" and "newton" (See below)')
     parser.add_option("system", "beta", float, 1.0, "Inverse temperature.")
     parser.add_option("system", "with_dc", bool, False, "Whether or not use double counting correction (See below)")
+    parser.add_option("system", "dc_type", str, "HF",
+                      'Type of the double counting correction. Chosen from "HF", "FLL" and "AMF" (See below)')
     parser.add_option("system", "perform_tail_fit", bool, False, "Whether or not perform the tail-fit.")
     parser.add_option("system", "fit_max_moment", int, 2, "Highest moment to fit in the tail of Sigma_iw.")
     parser.add_option("system", "fit_min_w", float, 5.0, "Matsubara frequency from which tail fitting should start.")
@@ -81,8 +92,31 @@ def create_parser():
     # [control]
     parser.add_option("control", "max_step", int, 100, "Maximum steps of DMFT loops")
     parser.add_option("control", "sigma_mix", float, 0.5, "Mixing parameter for self-energy")
+    parser.add_option("control", "mixing", str, "linear",
+                      'Mixing scheme of self-energy. Chosen from "linear", "anderson" and "broyden" (See below)')
+    parser.add_option("control", "mixing_history", int, 8,
+                      "Number of iterations used by the Anderson and Broyden mixing")
+    parser.add_option("control", "converge_sigma", float, 0.0,
+                      "Threshold of the RMS difference between the input and the output Sigma_iw (0: not used)")
+    parser.add_option("control", "converge_mu", float, 0.0,
+                      "Threshold of the change of the chemical potential (0: not used)")
+    parser.add_option("control", "converge_occupation", float, 0.0,
+                      "Threshold of the change of the occupation of each shell (0: not used)")
+    parser.add_option("control", "converge_noise", float, 2.0,
+                      "For QMC solvers, the threshold on Sigma_iw is raised to this factor times its statistical noise")
+    parser.add_option("control", "n_cycles_initial", int, 0,
+                      "Number of QMC cycles at the first iteration, which grows up to n_cycles of the solver (0: fixed)")
+    parser.add_option("control", "n_cycles_growth", float, 2.0, "Factor by which the number of QMC cycles grows")
+    parser.add_option("control", "n_cycles_ratio", float, 4.0,
+                      "The number of QMC cycles grows when the change of Sigma_iw is below this factor times its noise")
     parser.add_option("control", "restart", bool, False,
                       "Whether or not restart from a previous calculation stored in a HDF file.")
+    parser.add_option("control", "sigma_history", str, "all",
+                      'Iterations at which Sigma is kept in the output file. Chosen from "all", "last" (last n), '
+                      '"every" (every n-th) and "final" (See below).')
+    parser.add_option("control", "sigma_history_n", int, 10, "n for sigma_history = last or every.")
+    parser.add_option("control", "h5_compression", int, 0,
+                      "Level (1-9) of gzip compression of the output file applied at the end of the run (0: off).")
 
     # [tool]
     parser.add_option("tool", "nnode", int, 0, "[NOT USED] Number of node for the *k* path", OptionStatus.RETIRED)
@@ -96,5 +130,6 @@ def create_parser():
     parser.add_option("tool", "eta", float, 0.0, "Imaginary frequency shift for the Pade approximation")
     parser.add_option("tool", "omega_pade", float, 5.0, "Cutoff frequencies for the Pade approximation")
     parser.add_option("tool", "omega_check", float, 5.0, "Maximum frequency for dcore_check.")
+    parser.add_option("tool", "output_format", str, "text", "Output format(s) of dcore_post: text, hdf5, npy")
 
     return parser
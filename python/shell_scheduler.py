@@ -0,0 +1,90 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+
+
+class ShellScheduler(object):
+    """
+    Assign inequivalent shells to MPI processes so that the shells are solved concurrently.
+
+    The cost of each shell is the wall time of its last solution once it has been measured,
+    and otherwise it is estimated from the number of spin-orbitals
+    (the cube of the dimension of the Fock space).
+    """
+
+    def __init__(self, n_spin_orbitals):
+        """
+        Parameters
+        ----------
+        n_spin_orbitals : list of int
+            Number of spin-orbitals at each inequivalent shell
+        """
+        self._n_spin_orbitals = list(n_spin_orbitals)
+        self._solve_time = [None] * len(self._n_spin_orbitals)
+
+    def costs(self):
+        """
+        Cost of each shell. The measured times are used only when they are available for all shells,
+        because the times and the estimates have different units.
+
+        Returns
+        -------
+        list of float
+        """
+        if any(t is None for t in self._solve_time):
+            return [8.0**n_so for n_so in self._n_spin_orbitals]
+        return list(self._solve_time)
+
+    def update(self, solve_time):
+        """
+        Store the measured wall time of each shell
+
+        Parameters
+        ----------
+        solve_time : list of float
+            Wall time. Shells with non-positive time are not updated.
+        """
+        for ish, t in enumerate(solve_time):
+            if t > 0.0:
+                self._solve_time[ish] = t
+
+    def assign(self, n_procs):
+        """
+        Assign each shell to a process by the longest-processing-time-first rule:
+        the shells are sorted by their costs and each one is given to the least loaded process.
+
+        Parameters
+        ----------
+        n_procs : int
+            Number of processes
+
+        Returns
+        -------
+        owner : list of int
+            Rank of the process that solves each shell
+        """
+        costs = self.costs()
+        load = numpy.zeros(n_procs)
+        owner = [0] * len(costs)
+        for ish in sorted(range(len(costs)), key=lambda i: -costs[i]):
+            rank = int(numpy.argmin(load))
+            owner[ish] = rank
+            load[rank] += costs[ish]
+        return owner
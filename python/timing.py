@@ -0,0 +1,187 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy
+import pytriqs.utility.mpi as mpi
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def cpu_time():
+    """
+    User and system CPU time of this process in seconds
+    """
+    t = os.times()
+    return t[0] + t[1]
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process so far in MB (0 if not available)
+    """
+    if resource is None:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return rss / 1024.0**2
+    return rss / 1024.0
+
+
+def current_rss():
+    """
+    Current resident set size of this process in MB.
+    The peak so far (peak_rss) is returned where /proc/self/statm is not available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0**2
+    except (IOError, OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+class TimerRegistry(object):
+    """
+    Wall time, CPU time and peak memory of named phases (e.g. solver, mixing) of an iteration.
+    A phase can be entered several times (e.g. once for each shell), and the times are accumulated.
+
+    Usage::
+
+        timer = TimerRegistry()
+        with timer.phase('solver'):
+            ...
+        timings = timer.summary()
+        timer.reset()
+    """
+
+    def __init__(self):
+        # name -> [wall, cpu, rss]
+        self._phases = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager measuring the enclosed block as a part of the phase name.
+        The memory of the phase is the RSS sampled at the entry and the exit,
+        or the peak RSS of the process if it has grown during the phase.
+        """
+        rss0 = current_rss()
+        peak0 = peak_rss()
+        wall0 = time.time()
+        cpu0 = cpu_time()
+        try:
+            yield
+        finally:
+            wall = time.time() - wall0
+            cpu = cpu_time() - cpu0
+            rss = max(rss0, current_rss())
+            peak = peak_rss()
+            if peak > peak0:
+                rss = max(rss, peak)
+            stat = self._phases.setdefault(name, [0.0, 0.0, 0.0])
+            stat[0] += wall
+            stat[1] += cpu
+            stat[2] = max(stat[2], rss)
+
+    def reset(self):
+        """
+        Forget the phases measured so far (e.g. at the beginning of an iteration)
+        """
+        self._phases = OrderedDict()
+
+    def summary(self):
+        """
+        Statistics of the phases over the processes. This must be called on all processes.
+        The phases measured on the master node are reported (zero on a process which did not enter a phase).
+
+        Returns
+        -------
+        timings : OrderedDict
+            For each phase, 'wall_min', 'wall_max', 'wall_mean', 'cpu_min', 'cpu_max', 'cpu_mean' in seconds,
+            'peak_rss' in MB (maximum over the processes) and 'n_processes'
+        """
+        names = mpi.bcast(list(self._phases.keys()))
+        #
+        # Gather the table [process, phase, (wall, cpu, rss)] by a sum over the processes
+        #
+        table = numpy.zeros((mpi.size, len(names), 3))
+        for i, name in enumerate(names):
+            table[mpi.rank, i, :] = self._phases.get(name, [0.0, 0.0, 0.0])
+        table = mpi.all_reduce(mpi.world, table, lambda x, y: x + y)
+        timings = OrderedDict()
+        for i, name in enumerate(names):
+            wall, cpu, rss = table[:, i, 0], table[:, i, 1], table[:, i, 2]
+            timings[name] = {'wall_min': float(numpy.amin(wall)), 'wall_max': float(numpy.amax(wall)),
+                             'wall_mean': float(numpy.mean(wall)),
+                             'cpu_min': float(numpy.amin(cpu)), 'cpu_max': float(numpy.amax(cpu)),
+                             'cpu_mean': float(numpy.mean(cpu)),
+                             'peak_rss': float(numpy.amax(rss)), 'n_processes': mpi.size}
+        return timings
+
+
+def total_timings(history):
+    """
+    Sum of the timings of the phases over iterations, sorted by the mean wall time in descending order.
+    The min/max over the processes are summed as well, and peak_rss is the maximum.
+
+    Parameters
+    ----------
+    history : list of dict
+        Returned by TimerRegistry.summary() at each iteration
+
+    Returns
+    -------
+    timings : OrderedDict
+    """
+    total = {}
+    for timings in history:
+        for name, stat in timings.items():
+            if name not in total:
+                total[name] = dict(stat)
+                continue
+            for key in ['wall_min', 'wall_max', 'wall_mean', 'cpu_min', 'cpu_max', 'cpu_mean']:
+                total[name][key] += stat[key]
+            total[name]['peak_rss'] = max(total[name]['peak_rss'], stat['peak_rss'])
+    return OrderedDict(sorted(total.items(), key=lambda x: -x[1]['wall_mean']))
+
+
+def print_timings(timings, file=sys.stdout):
+    """
+    Print the statistics of the phases returned by TimerRegistry.summary
+
+    Parameters
+    ----------
+    timings : dict
+    file : file, optional
+    """
+    print("    {0:<20} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format(
+        "Phase", "Wall(min)", "Wall(mean)", "Wall(max)", "CPU(mean)", "RSS(MB)"), file=file)
+    for name, stat in timings.items():
+        print("    {0:<20} {1:10.3f} {2:10.3f} {3:10.3f} {4:10.3f} {5:10.1f}".format(
+            name, stat['wall_min'], stat['wall_mean'], stat['wall_max'], stat['cpu_mean'], stat['peak_rss']),
+            file=file)
@@ -0,0 +1,65 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+
+import numpy
+
+
+def fourier_ham(kvec, rvec, rdeg, hamr, max_elements=4194304):
+    """
+    Fourier transformation of the one-body Hamiltonian from the real space to k-points
+
+        H(k) = sum_R exp(i k.R) H(R) / deg(R)
+
+    The phase factors of a chunk of k-points are stored as a matrix and
+    contracted with all H(R) at once. The chunk is chosen so that the phase
+    matrix has at most max_elements elements.
+
+    Parameters
+    ----------
+    kvec : float array [n_k, 3]
+        k-points (2 pi times the fractional coordinate)
+    rvec : integer array [nr, 3]
+        Lattice vectors R
+    rdeg : integer array [nr]
+        Degeneracy of each R
+    hamr : complex array [nr, nwan, nwan]
+        H(R). A list of nwan x nwan matrices is also accepted.
+    max_elements : integer, optional
+        Upper bound of the size of the phase matrix
+
+    Returns
+    -------
+    hk : complex array [n_k, nwan, nwan]
+        H(k)
+    """
+    kvec = numpy.asarray(kvec, dtype=numpy.float_)
+    rvec = numpy.asarray(rvec, dtype=numpy.float_)
+    rdeg = numpy.asarray(rdeg, dtype=numpy.float_)
+    hamr = numpy.asarray(hamr, dtype=numpy.complex_)
+    n_k = kvec.shape[0]
+    nr, nwan = hamr.shape[0], hamr.shape[1]
+
+    hamr_flat = hamr.reshape(nr, nwan*nwan)
+    hk = numpy.empty((n_k, nwan*nwan), numpy.complex_)
+    chunk = max(1, max_elements // nr)
+    for k_start in range(0, n_k, chunk):
+        k_end = min(k_start + chunk, n_k)
+        phase = numpy.exp(1j * numpy.dot(kvec[k_start:k_end, :], rvec.transpose())) / rdeg[None, :]
+        hk[k_start:k_end, :] = numpy.dot(phase, hamr_flat)
+    return hk.reshape(n_k, nwan, nwan)
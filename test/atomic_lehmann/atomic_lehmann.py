@@ -0,0 +1,88 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.atomic_lehmann import AtomicLehmann, cache_key, diagonalize, level_shift
+
+numpy.random.seed(10)
+beta = 10.0
+z = 1j * numpy.pi / beta * (2 * numpy.arange(10) + 1)
+
+#
+# Non-interacting case: G(z) = (z - e)^{-1}
+#
+norb = 2
+h = numpy.random.randn(2*norb, 2*norb) + 1j * numpy.random.randn(2*norb, 2*norb)
+h = h + h.conj().T
+lehmann = diagonalize(h, numpy.zeros((norb, norb, norb, norb)), beta)
+gf_ref = numpy.array([numpy.linalg.inv(zz * numpy.identity(2*norb) - h) for zz in z]).transpose((1, 2, 0))
+assert numpy.allclose(lehmann.gf(z), gf_ref, atol=1e-10)
+assert numpy.allclose(lehmann.moments(2)[0], numpy.identity(2*norb))
+assert numpy.allclose(lehmann.moments(2)[1], h)
+
+#
+# Hubbard atom at half filling: G(z) = 1/2 (z - U/2)^{-1} + 1/2 (z + U/2)^{-1}
+#
+u = 2.0
+lehmann = diagonalize(-0.5 * u * numpy.identity(2), numpy.full((1, 1, 1, 1), u), beta)
+gf_ref = 0.5 / (z - 0.5 * u) + 0.5 / (z + 0.5 * u)
+assert numpy.allclose(lehmann.gf(z)[0, 0, :], gf_ref)
+assert numpy.allclose(lehmann.gf(z)[0, 1, :], 0.0)
+assert abs(lehmann.occupation - 1.0) < 1e-10
+
+#
+# The results do not depend on whether the spin is conserved,
+# and the data can be reconstructed from a dictionary
+#
+norb = 3
+u_mat = numpy.random.randn(norb, norb, norb, norb)
+u_mat = u_mat + u_mat.transpose((1, 0, 3, 2))
+u_mat = u_mat + u_mat.transpose((2, 3, 0, 1))
+h = numpy.random.randn(norb, norb)
+eal = numpy.kron(numpy.identity(2), h + h.T)
+lehmann = diagonalize(eal, u_mat, beta)
+eal_mix = eal.copy()
+eal_mix[0, norb] = eal_mix[norb, 0] = 1e-9
+lehmann_mix = diagonalize(eal_mix, u_mat, beta)
+print(numpy.amax(numpy.abs(lehmann.gf(z) - lehmann_mix.gf(z))))
+assert numpy.allclose(lehmann.gf(z), lehmann_mix.gf(z), atol=1e-7)
+
+lehmann_copy = AtomicLehmann.from_dict(lehmann.to_dict())
+assert numpy.allclose(lehmann.gf(z), lehmann_copy.gf(z))
+assert lehmann_copy.key == cache_key(eal, u_mat, beta)
+assert lehmann_copy.key != cache_key(eal_mix, u_mat, beta)
+
+#
+# A uniform shift of the atomic levels (e.g. by the chemical potential) is applied without diagonalization
+#
+for d in [0.01, -0.02]:
+    eal_shift = eal + d * numpy.identity(2*norb)
+    lehmann_ref = diagonalize(eal_shift, u_mat, beta)
+    assert lehmann_ref.key == lehmann.key
+    lehmann_shift = AtomicLehmann.from_dict(lehmann.to_dict())
+    assert lehmann_shift.set_shift(level_shift(eal_shift))
+    assert numpy.allclose(lehmann_shift.gf(z), lehmann_ref.gf(z), atol=1e-8)
+    for m, m_ref in zip(lehmann_shift.moments(3), lehmann_ref.moments(3)):
+        assert numpy.allclose(m, m_ref, atol=1e-8)
+    assert abs(lehmann_shift.occupation - lehmann_ref.occupation) < 1e-8
+    assert abs(lehmann_shift.magnetization - lehmann_ref.magnetization) < 1e-8
+
+#
+# The shift is rejected if it populates states whose transitions have been dropped
+#
+assert not AtomicLehmann.from_dict(lehmann.to_dict()).set_shift(level_shift(eal) + 20.0)
@@ -0,0 +1,46 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.lattice_model import generate_hopping, binned_levels, matsubara_deviation
+
+beta = 20.0
+for lattice, nk in [('chain', 1000), ('square', 128), ('cubic', 32)]:
+    hopping, bz_weights = generate_hopping(lattice, 1.0, 0.2, nk, 1, irreducible=True)
+    ek = hopping[:, 0, 0, 0].real
+    #
+    # Histogram: the mean energy is exact and the error decreases with the number of levels
+    #
+    deviation = []
+    for n_dos in [100, 1000]:
+        levels, weights = binned_levels(ek, bz_weights, n_dos)
+        assert len(levels) <= n_dos
+        assert numpy.allclose(numpy.sum(weights), 1.0)
+        assert numpy.allclose(numpy.sum(weights * levels), numpy.sum(bz_weights * ek))
+        deviation.append(matsubara_deviation(ek, bz_weights, levels, weights, beta))
+    print(lattice, deviation)
+    assert deviation[1] < deviation[0]
+    assert deviation[1] < 1.0e-4
+    #
+    # Gaussian broadening
+    #
+    levels, weights = binned_levels(ek, bz_weights, 2000, 0.01)
+    assert len(levels) == 2000
+    assert numpy.allclose(numpy.sum(weights), 1.0)
+    assert numpy.allclose(numpy.sum(weights * levels), numpy.sum(bz_weights * ek), atol=1.0e-5)
+    assert matsubara_deviation(ek, bz_weights, levels, weights, beta) < 1.0e-3
@@ -0,0 +1,82 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import os
+import numpy
+from pytriqs.archive.hdf_archive import HDFArchive
+from pytriqs.applications.dcore.output_archive import OutputArchive, sigma_iterations
+
+filename = 'checkpoint.out.h5'
+if os.path.exists(filename):
+    os.remove(filename)
+params = {'control': {'restart': False}}
+sigma = [numpy.arange(4.0), numpy.arange(4.0) + 1.0]
+
+#
+# The first iteration is completed, and the second one is interrupted after the shell 0 is solved
+#
+output = OutputArchive(filename, 'dmft_out')
+output.prepare(params)
+output.begin_checkpoint(1, 0.5)
+output.save_checkpoint(0, {'Sigma_iw': sigma[0]})
+output.save_iteration(1, 0.5, sigma)
+output.clear_checkpoint()
+output.begin_checkpoint(2, 0.6)
+output.save_checkpoint(0, {'Sigma_iw': sigma[1]})
+output.close()
+
+with HDFArchive(filename, 'r') as ar:
+    # No temporary group is left
+    assert sorted(ar['dmft_out']['Sigma_iw'].keys()) == ['1']
+    assert sorted(ar['dmft_out']['checkpoint'].keys()) == ['0', 'chemical_potential', 'iteration']
+
+#
+# Restart from the first unsolved shell of the second iteration
+#
+params['control']['restart'] = True
+output = OutputArchive(filename, 'dmft_out')
+assert output.prepare(params) == 1
+assert sigma_iterations(output.group) == [1]
+assert output.load_checkpoint(1) == (None, {})
+mu, shells = output.load_checkpoint(2)
+assert mu == 0.6
+assert list(shells.keys()) == [0]
+assert numpy.allclose(shells[0]['Sigma_iw'], sigma[1])
+# Checkpoints of the same iteration are kept
+output.begin_checkpoint(2, 0.6)
+output.save_checkpoint(1, {'Sigma_iw': sigma[0]})
+mu, shells = output.load_checkpoint(2)
+assert sorted(shells.keys()) == [0, 1]
+output.save_iteration(2, 0.6, sigma)
+output.clear_checkpoint()
+assert output.load_checkpoint(2) == (None, {})
+output.close()
+
+#
+# A first iteration interrupted before its end can also be restarted
+#
+params['control']['restart'] = False
+output = OutputArchive(filename, 'dmft_out')
+output.prepare(params)
+output.begin_checkpoint(1, 0.5)
+output.close()
+params['control']['restart'] = True
+output = OutputArchive(filename, 'dmft_out')
+assert output.prepare(params) == 0
+assert output.load_checkpoint(1) == (0.5, {})
+output.close()
@@ -0,0 +1,60 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.chemical_potential import trace_g2_matsubara, ChemicalPotentialSolver
+
+#
+# dN/dmu of a single level = beta f (1 - f)
+#
+beta = 10.0
+n_iw = 512
+iw = 1j * numpy.pi * (2 * numpy.arange(-n_iw, n_iw) + 1) / beta
+for e in [0.3, -1.0, 0.05]:
+    fermi = 1.0 / (numpy.exp(beta * e) + 1.0)
+    g = (1.0 / (iw - e))[:, None, None]
+    assert numpy.allclose(-trace_g2_matsubara(iw, g, beta).real, beta * fermi * (1.0 - fermi), atol=1.0e-6)
+
+#
+# Toy model with a flat DOS, and with a gap
+#
+
+
+def density(ek, temperature):
+    def func(mu):
+        f = 1.0 / (numpy.exp((ek - mu) / temperature) + 1.0)
+        return 2.0 * numpy.mean(f), 2.0 * numpy.mean(f * (1.0 - f)) / temperature
+    return func
+
+prec = 1.0e-4
+solver = ChemicalPotentialSolver(density(numpy.linspace(-2.0, 2.0, 400), 0.1), prec)
+mu = 0.0
+for n_target in [1.0, 1.2, 1.21, 0.3]:
+    mu, n = solver.solve(n_target, mu)
+    print(n_target, mu, n, solver.n_evaluations)
+    assert abs(n - n_target) < prec
+    if n_target == 1.21:
+        # Warm start close to the solution
+        assert solver.n_evaluations <= 2
+
+ek = numpy.concatenate((numpy.linspace(-3.0, -1.0, 200), numpy.linspace(1.0, 3.0, 200)))
+solver = ChemicalPotentialSolver(density(ek, 0.02), prec)
+for n_target, mu0 in [(1.0, 2.0), (1.5, 0.0), (0.5, 0.0)]:
+    mu, n = solver.solve(n_target, mu0)
+    print(n_target, mu, n, solver.n_evaluations)
+    assert abs(n - n_target) < prec
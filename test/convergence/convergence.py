@@ -0,0 +1,125 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.gf.local import BlockGf, GfImFreq
+from pytriqs.applications.dcore.convergence import sigma_distance, sigma_noise, ConvergenceChecker, CycleSchedule
+from pytriqs.applications.dcore.convergence import legendre_matsubara_weight
+
+beta = 50.0
+n_iw = 1000
+
+
+def make_sigma(noise=0.0, shift=0.0):
+    g = GfImFreq(indices=[0, 1], beta=beta, n_points=n_iw)
+    iw = numpy.array([complex(x) for x in g.mesh])
+    g.data[:, 0, 0] = shift + 1.0 / (iw + 0.5)
+    g.data[:, 1, 1] = shift + 2.0 / (iw - 0.3)
+    g.data[:, :, :] += noise * (numpy.random.randn(*g.data.shape) + 1j * numpy.random.randn(*g.data.shape))
+    return BlockGf(name_list=['up', 'down'], block_list=[g, g.copy()], make_copies=False)
+
+numpy.random.seed(1)
+#
+# Distance: a constant shift of 0.01 of all the elements in the diagonal part
+#
+assert numpy.allclose(sigma_distance([make_sigma()], [make_sigma(shift=0.01)]), 0.01 / numpy.sqrt(2.0))
+#
+# Noise: the smooth part does not contribute, and the added white noise is recovered
+#
+assert sigma_noise([make_sigma()]) < 1.0e-4
+noise = sigma_noise([make_sigma(noise=1.0e-3)])
+print(noise)
+assert abs(noise - numpy.sqrt(2.0) * 1.0e-3) < 2.0e-4
+#
+# Only the measured frequencies below w_max (e.g. fit_min_w) are used.
+# Above it, Sigma is replaced by the smooth tail.
+#
+sigma = make_sigma(noise=1.0e-3)
+for bname, g in sigma:
+    iw = numpy.array([complex(x) for x in g.mesh])
+    g.data[numpy.abs(iw.imag) > 10.0, :, :] = make_sigma()[bname].data[numpy.abs(iw.imag) > 10.0, :, :]
+assert sigma_noise([sigma]) < 1.0e-4
+assert abs(sigma_noise([sigma], w_max=10.0) - numpy.sqrt(2.0) * 1.0e-3) < 3.0e-4
+# Too few frequencies
+assert sigma_noise([sigma], w_max=0.5) == 0.0
+#
+# Weight of the Legendre-Matsubara transformation: the full sum is 1
+#
+x = (2 * numpy.arange(100) + 1) * numpy.pi / 2
+weight = legendre_matsubara_weight(400, x)
+assert numpy.allclose(weight, 1.0)
+weight = legendre_matsubara_weight(30, x)
+assert numpy.all(weight <= 1.0 + 1.0e-10) and weight[-1] < 1.0e-2
+# j_0(x) = sin(x) / x
+assert numpy.allclose(legendre_matsubara_weight(1, x), (numpy.sin(x) / x)**2)
+
+#
+# Criteria
+#
+checker = ConvergenceChecker(1.0e-3, 1.0e-4, 0.0, 2.0)
+sigma = make_sigma()
+metrics = checker.check([sigma], [sigma], 0.1, [1.0])
+assert not metrics['converged']  # No previous chemical potential
+metrics = checker.check([sigma], [make_sigma(shift=1.0e-4)], 0.1 + 1.0e-5, [1.1])
+assert metrics['converged']
+metrics = checker.check([sigma], [make_sigma(shift=1.0e-2)], 0.1 + 1.0e-5, [1.1])
+assert not metrics['converged']
+#
+# The threshold on Sigma is raised by the noise of QMC
+#
+noisy_sigma = make_sigma(noise=1.0e-2)
+metrics = checker.check([sigma], [noisy_sigma], 0.1 + 1.0e-5, [1.1], noise=sigma_noise([noisy_sigma]))
+assert metrics['sigma_threshold'] > 1.0e-2
+assert metrics['converged']
+#
+# No criteria: never converged
+#
+assert not ConvergenceChecker(0.0, 0.0, 0.0, 2.0).check([sigma], [sigma], 0.1, [1.0])['converged']
+
+#
+# Number of QMC cycles grows only when the change of Sigma is comparable to the noise
+#
+schedule = CycleSchedule(1000, 5000, 2.0, 4.0)
+assert schedule.n_cycles == 1000 and not schedule.at_max
+assert not schedule.update({'sigma': 1.0e-1, 'sigma_noise': 1.0e-3})
+assert schedule.update({'sigma': 1.0e-3, 'sigma_noise': 1.0e-3})
+assert schedule.n_cycles == 2000
+schedule.update({'sigma': 1.0e-3, 'sigma_noise': 1.0e-3})
+schedule.update({'sigma': 1.0e-3, 'sigma_noise': 1.0e-3})
+assert schedule.n_cycles == 5000 and schedule.at_max
+assert not schedule.update({'sigma': 1.0e-3, 'sigma_noise': 1.0e-3})
+#
+# Restart from the number of cycles of the previous run
+#
+schedule = CycleSchedule(1000, 5000, 2.0, 4.0)
+schedule.restore(4000)
+assert schedule.n_cycles == 4000
+
+#
+# Without the estimate of the noise, the number of cycles grows when the change of Sigma stagnates
+#
+schedule = CycleSchedule(1000, 5000, 2.0, 4.0)
+assert not schedule.update({'sigma': 1.0e-1, 'sigma_noise': 0.0})
+assert not schedule.update({'sigma': 5.0e-2, 'sigma_noise': 0.0})
+assert schedule.update({'sigma': 4.9e-2, 'sigma_noise': 0.0})
+assert schedule.n_cycles == 2000
+# Compared afresh with the new number of cycles
+assert not schedule.update({'sigma': 4.9e-2, 'sigma_noise': 0.0})
+schedule = CycleSchedule(1000, 5000, 2.0, 4.0)
+schedule.restore(1000, 5.0e-2)
+assert schedule.update({'sigma': 4.9e-2, 'sigma_noise': 0.0})
@@ -0,0 +1,73 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.double_counting import compute_dc
+#
+# Compare the Hartree-Fock double counting with the straightforward loops
+#
+numpy.random.seed(100)
+dim = 3
+u_mat = numpy.random.rand(dim, dim, dim, dim) + 1j * numpy.random.rand(dim, dim, dim, dim)
+
+#
+# Without spin-orbit coupling
+#
+dm = {}
+for sp in ['up', 'down']:
+    dm[sp] = numpy.random.rand(dim, dim) + 1j * numpy.random.rand(dim, dim)
+dc_ref = {}
+for sp1 in ['up', 'down']:
+    dc_ref[sp1] = numpy.zeros((dim, dim), numpy.complex_)
+    for i1 in range(dim):
+        for i2 in range(dim):
+            for sp2 in ['up', 'down']:
+                dc_ref[sp1][i1, i2] += numpy.sum(u_mat[i1, :, i2, :] * dm[sp2][:, :])
+            dc_ref[sp1][i1, i2] += - numpy.sum(u_mat[i1, :, :, i2] * dm[sp1][:, :])
+
+dm_so = numpy.zeros((2*dim, 2*dim), numpy.complex_)
+dm_so[0:dim, 0:dim] = dm['up']
+dm_so[dim:2*dim, dim:2*dim] = dm['down']
+dc = compute_dc('HF', u_mat, dm_so, False)
+assert numpy.allclose(dc[0:dim, 0:dim], dc_ref['up'])
+assert numpy.allclose(dc[dim:2*dim, dim:2*dim], dc_ref['down'])
+assert numpy.allclose(dc[0:dim, dim:2*dim], 0.0)
+
+#
+# With spin-orbit coupling
+#
+dm_so = numpy.random.rand(2*dim, 2*dim) + 1j * numpy.random.rand(2*dim, 2*dim)
+dc_ref = numpy.zeros((2*dim, 2*dim), numpy.complex_)
+for s1 in range(2):
+    for i1 in range(dim):
+        for s2 in range(2):
+            for i2 in range(dim):
+                dc_ref[i1+s1*dim, i2+s1*dim] += numpy.sum(
+                    u_mat[i1, :, i2, :] * dm_so[s2*dim:s2*dim+dim, s2*dim:s2*dim+dim])
+                dc_ref[i1+s1*dim, i2+s2*dim] += numpy.sum(
+                    u_mat[i1, :, :, i2] * dm_so[s2*dim:s2*dim+dim, s1*dim:s1*dim+dim])
+dc = compute_dc('HF', u_mat, dm_so, True)
+assert numpy.allclose(dc, dc_ref)
+
+#
+# FLL and AMF are diagonal and reduce to U*(N-1/2) and U*(N-N_s) for a single orbital
+#
+u1 = numpy.array([[[[4.0]]]])
+dm1 = numpy.diag([0.3, 0.5])
+assert numpy.allclose(compute_dc('FLL', u1, dm1, False), numpy.diag([4.0*0.3, 4.0*0.3]))
+assert numpy.allclose(compute_dc('AMF', u1, dm1, False), numpy.diag([4.0*0.5, 4.0*0.3]))
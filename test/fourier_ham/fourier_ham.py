@@ -0,0 +1,56 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import time
+import numpy
+from pytriqs.applications.dcore.wannier90_model import fourier_ham
+#
+# Compare the batched Fourier transformation with the loop over k and R,
+# and report the speedup
+#
+numpy.random.seed(100)
+nwan = 8
+rvec = numpy.array([[i0, i1, i2] for i0 in range(-5, 6) for i1 in range(-5, 6) for i2 in range(-2, 3)])
+nr = rvec.shape[0]
+rdeg = numpy.random.randint(1, 4, nr)
+hamr = numpy.random.rand(nr, nwan, nwan) + 1j * numpy.random.rand(nr, nwan, nwan)
+n_k = 201
+kvec = 2.0 * numpy.pi * numpy.random.rand(n_k, 3)
+
+t0 = time.time()
+hk_loop = numpy.zeros((n_k, nwan, nwan), numpy.complex_)
+for ik in range(n_k):
+    for ir in range(nr):
+        rdotk = numpy.dot(kvec[ik, :], rvec[ir, :])
+        factor = (numpy.cos(rdotk) + 1j * numpy.sin(rdotk)) / float(rdeg[ir])
+        hk_loop[ik, :, :] += factor * hamr[ir][:, :]
+t_loop = time.time() - t0
+
+t0 = time.time()
+hk = fourier_ham(kvec, rvec, rdeg, hamr)
+t_batch = time.time() - t0
+
+# Small chunks must give the same result
+hk_chunk = fourier_ham(kvec, rvec, rdeg, list(hamr), max_elements=7*nr)
+
+print("  Loop    : {0:.3f} sec".format(t_loop))
+print("  Batched : {0:.3f} sec".format(t_batch))
+print("  Speedup : {0:.1f}".format(t_loop / max(t_batch, 1.0e-6)))
+
+assert numpy.allclose(hk, hk_loop)
+assert numpy.allclose(hk_chunk, hk_loop)
@@ -0,0 +1,65 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import os
+import numpy
+from pytriqs.applications.dcore.hr_reader import read_wannier90_hr
+
+
+def write_hr(filename, rvec, rdeg, hamr):
+    nr, nwan = hamr.shape[0], hamr.shape[1]
+    with open(filename, 'w') as f:
+        print("test", file=f)
+        print(nwan, file=f)
+        print(nr, file=f)
+        for ir in range(nr):
+            print("%5d" % rdeg[ir], end="", file=f)
+            if ir % 15 == 14:
+                print("", file=f)
+        if nr % 15 != 0:
+            print("", file=f)
+        for ir in range(nr):
+            for j in range(nwan):
+                for i in range(nwan):
+                    print("%5d%5d%5d%5d%5d%12.6f%12.6f" % (rvec[ir, 0], rvec[ir, 1], rvec[ir, 2], i+1, j+1,
+                                                           hamr[ir, i, j].real, hamr[ir, i, j].imag), file=f)
+
+numpy.random.seed(1)
+nr, nwan = 20, 3
+rvec = numpy.random.randint(-3, 4, size=(nr, 3))
+rdeg = numpy.random.randint(1, 5, size=nr)
+hamr = numpy.round(numpy.random.randn(nr, nwan, nwan) + 1j * numpy.random.randn(nr, nwan, nwan), 6)
+
+for f in ["test_hr.dat", "test_hr.dat.npz"]:
+    if os.path.exists(f):
+        os.remove(f)
+write_hr("test_hr.dat", rvec, rdeg, hamr)
+for itr in range(2):
+    # The second read uses the cache
+    rvec2, rdeg2, hamr2 = read_wannier90_hr("test_hr.dat")
+    assert os.path.exists("test_hr.dat.npz")
+    assert numpy.all(rvec2 == rvec)
+    assert numpy.all(rdeg2 == rdeg)
+    assert numpy.allclose(hamr2, hamr)
+#
+# The cache is not used after the file is modified
+#
+write_hr("test_hr.dat", rvec, rdeg, 2 * hamr)
+os.utime("test_hr.dat", (0, 1))
+rvec2, rdeg2, hamr2 = read_wannier90_hr("test_hr.dat")
+assert numpy.allclose(hamr2, 2 * hamr)
@@ -0,0 +1,88 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.lattice_model import generate_hopping, time_reversal_kmesh, time_reversal_exact
+from pytriqs.applications.dcore.wannier90_model import fourier_ham
+
+#
+# Preset lattices: sums over the irreducible k-points equal those over the full mesh
+#
+for lattice, nk in [('chain', 7), ('chain', 8), ('square', 8), ('cubic', 5), ('cubic', 6)]:
+    hopping, bz_weights = generate_hopping(lattice, 1.0, 0.3, nk, 2)
+    hopping_irr, bz_weights_irr = generate_hopping(lattice, 1.0, 0.3, nk, 2, irreducible=True)
+    assert hopping_irr.shape[0] < hopping.shape[0]
+    assert numpy.allclose(numpy.sum(bz_weights_irr), 1.0)
+    for z in [0.5j, 1.0 + 0.1j, -2.0 + 0.2j]:
+        g = numpy.sum(bz_weights / (z - hopping[:, 0, 0, 0]))
+        g_irr = numpy.sum(bz_weights_irr / (z - hopping_irr[:, 0, 0, 0]))
+        assert numpy.allclose(g, g_irr)
+
+#
+# Wannier90: the symmetrized sum over half of the k-points equals the sum over the full mesh if H(R) is real
+#
+numpy.random.seed(1)
+nwan = 3
+rvec = numpy.array([[0, 0, 0], [1, 0, 0], [-1, 0, 0], [0, 1, 1], [0, -1, -1], [1, 1, 0], [-1, -1, 0]])
+rdeg = numpy.ones(len(rvec), dtype=int)
+hamr = numpy.zeros((len(rvec), nwan, nwan), numpy.complex_)
+for ir in range(0, len(rvec), 2):
+    h = numpy.random.randn(nwan, nwan)
+    if ir == 0:
+        hamr[0] = h + h.transpose()
+    else:
+        hamr[ir - 1] = h
+        hamr[ir] = h.transpose()
+
+nk0, nk1, nk2 = 4, 3, 2
+k_frac = numpy.indices((nk0, nk1, nk2)).reshape(3, -1).transpose() / numpy.array([nk0, nk1, nk2], numpy.float_)
+k_irr, multiplicity = time_reversal_kmesh(nk0, nk1, nk2)
+assert numpy.sum(multiplicity) == nk0 * nk1 * nk2
+# 4 k-points satisfy k = -k (mod G)
+assert len(k_irr) == (nk0 * nk1 * nk2 + 4) // 2
+
+z = 0.3 + 0.5j
+g = numpy.linalg.inv(z * numpy.identity(nwan)[None, :, :] - fourier_ham(2 * numpy.pi * k_frac, rvec, rdeg, hamr))
+g_loc = numpy.sum(g, axis=0) / len(k_frac)
+g = numpy.linalg.inv(z * numpy.identity(nwan)[None, :, :] - fourier_ham(2 * numpy.pi * k_irr, rvec, rdeg, hamr))
+g_loc_irr = numpy.einsum('k,kij->ij', multiplicity, g) / float(nk0 * nk1 * nk2)
+assert not numpy.allclose(g_loc, g_loc_irr)
+assert numpy.allclose(g_loc, 0.5 * (g_loc_irr + g_loc_irr.transpose()))
+assert time_reversal_exact(hamr=hamr)
+assert not time_reversal_exact(hamr=hamr + 0.1j * numpy.random.randn(*hamr.shape))
+
+#
+# Spin-doubled real H(R) as in the non-collinear case.
+# The symmetrization is exact for a symmetric Sigma, but not for a Sigma containing sigma_y,
+# which must fall back to the full mesh.
+#
+hamr2 = numpy.array([numpy.kron(numpy.identity(2), h) for h in hamr])
+sigma_y = numpy.array([[0.0, -1.0j], [1.0j, 0.0]])
+sigma_sym = 0.2 * numpy.identity(2 * nwan) + numpy.kron(numpy.identity(2), 0.1 * (hamr[0] + hamr[0].transpose()))
+sigma_magnetic = sigma_sym + numpy.kron(0.4 * sigma_y, numpy.identity(nwan))
+nk0, nk1, nk2 = 6, 6, 1
+k_frac = numpy.indices((nk0, nk1, nk2)).reshape(3, -1).transpose() / numpy.array([nk0, nk1, nk2], numpy.float_)
+k_irr, multiplicity = time_reversal_kmesh(nk0, nk1, nk2)
+for sigma, symmetric in [(sigma_sym, True), (sigma_magnetic, False)]:
+    assert time_reversal_exact(hamr=hamr2, sigma=sigma) == symmetric
+    one = z * numpy.identity(2 * nwan)[None, :, :] - sigma[None, :, :]
+    g = numpy.linalg.inv(one - fourier_ham(2 * numpy.pi * k_frac, rvec, rdeg, hamr2))
+    g_loc = numpy.sum(g, axis=0) / len(k_frac)
+    g = numpy.linalg.inv(one - fourier_ham(2 * numpy.pi * k_irr, rvec, rdeg, hamr2))
+    g_loc_irr = numpy.einsum('k,kij->ij', multiplicity, g) / float(nk0 * nk1 * nk2)
+    assert numpy.allclose(g_loc, 0.5 * (g_loc_irr + g_loc_irr.transpose())) == symmetric
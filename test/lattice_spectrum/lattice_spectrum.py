@@ -0,0 +1,109 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.lattice_spectrum import spectral_ksum, dc_to_global
+#
+# Two-orbital chain with one correlated shell (orbital 0)
+#
+n_k = 16
+k = 2 * numpy.pi * numpy.arange(n_k) / n_k
+hopping = numpy.zeros((n_k, 2, 2), numpy.complex_)
+hopping[:, 0, 0] = -2.0 * numpy.cos(k)
+hopping[:, 1, 1] = -numpy.cos(k) + 0.5
+hopping[:, 0, 1] = 0.3
+hopping[:, 1, 0] = 0.3
+proj_mat = numpy.zeros((n_k, 1, 1, 2), numpy.complex_)
+proj_mat[:, 0, 0, 0] = 1.0
+weights = numpy.ones(n_k) / n_k
+omega = numpy.linspace(-4.0, 4.0, 81)
+broadening = 0.1
+#
+# A static self-energy shifts the correlated orbital
+#
+sigma = numpy.zeros((len(omega), 1, 1), numpy.complex_)
+sigma[:, 0, 0] = 0.7
+res = spectral_ksum(hopping, proj_mat, [1], omega, broadening, [(0.2, [sigma]), (0.0, None)],
+                    weights=weights, with_akw=True)
+#
+# Reference by a direct inversion
+#
+z = omega + 1j * broadening
+for ires, (mu, shift) in enumerate([(0.2, 0.7), (0.0, 0.0)]):
+    dos = numpy.zeros(len(omega))
+    gloc = numpy.zeros(len(omega), numpy.complex_)
+    for ik in range(n_k):
+        h = hopping[ik].copy()
+        h[0, 0] += shift
+        akw = numpy.zeros(len(omega))
+        for iw in range(len(omega)):
+            g = numpy.linalg.inv((z[iw] + mu) * numpy.identity(2) - h)
+            akw[iw] = -numpy.trace(g).imag / numpy.pi
+            gloc[iw] += weights[ik] * g[0, 0]
+        dos += weights[ik] * akw
+        assert numpy.allclose(res[ires]['akw'][ik], akw)
+    assert numpy.allclose(res[ires]['dos'], dos)
+    assert numpy.allclose(res[ires]['gloc'][0][:, 0, 0], gloc)
+
+#
+# Two equivalent shells of two orbitals related by a rotation (rot_mat of the second shell).
+# Sigma_imp is in the global coordinate system, while dc_imp is in the local one.
+#
+numpy.random.seed(1)
+rot = numpy.linalg.qr(numpy.random.randn(2, 2) + 1j * numpy.random.randn(2, 2))[0]
+sigma_loc = numpy.array([[0.8, 0.1 - 0.2j], [0.1 + 0.2j, 0.3]])
+dc = numpy.array([[0.5, 0.05j], [-0.05j, 0.4]])
+for time_inv in [False, True]:
+    if time_inv:
+        sigma_glob = numpy.dot(rot.conjugate(), numpy.dot(sigma_loc.transpose(), rot.transpose()))
+        expected = numpy.dot(rot.conjugate(), numpy.dot((sigma_loc - dc).transpose(), rot.transpose()))
+    else:
+        sigma_glob = numpy.dot(rot, numpy.dot(sigma_loc, rot.conjugate().transpose()))
+        expected = numpy.dot(rot, numpy.dot(sigma_loc - dc, rot.conjugate().transpose()))
+    assert numpy.allclose(sigma_glob - dc_to_global(dc, rot, time_inv), expected)
+    # No rotation for the identity
+    assert numpy.allclose(dc_to_global(dc, numpy.identity(2), time_inv),
+                          dc.transpose() if time_inv else dc)
+
+n_orb = 4
+hopping = numpy.zeros((n_k, n_orb, n_orb), numpy.complex_)
+for i in range(n_orb):
+    hopping[:, i, i] = -2.0 * numpy.cos(k) + 0.1 * i
+hopping[:, 0, 2] = hopping[:, 2, 0] = 0.2
+proj_mat = numpy.zeros((n_k, 2, 2, n_orb), numpy.complex_)
+proj_mat[:, 0, :, 0:2] = numpy.identity(2)
+proj_mat[:, 1, :, 2:4] = numpy.identity(2)
+rot_mat = [numpy.identity(2), rot]
+sigma = []
+for icrsh in range(2):
+    sigma_glob = numpy.dot(rot_mat[icrsh], numpy.dot(sigma_loc, rot_mat[icrsh].conjugate().transpose()))
+    sigma.append(numpy.tile(sigma_glob - dc_to_global(dc, rot_mat[icrsh]), (len(omega), 1, 1)))
+res = spectral_ksum(hopping, proj_mat, [2, 2], omega, broadening, [(0.1, sigma)], weights=weights)
+#
+# Reference: Sigma - dc in the local coordinate system rotated to the global one
+#
+dos = numpy.zeros(len(omega))
+for ik in range(n_k):
+    h = hopping[ik].copy()
+    for icrsh in range(2):
+        h[2*icrsh:2*icrsh+2, 2*icrsh:2*icrsh+2] += numpy.dot(
+            rot_mat[icrsh], numpy.dot(sigma_loc - dc, rot_mat[icrsh].conjugate().transpose()))
+    for iw in range(len(omega)):
+        g = numpy.linalg.inv((z[iw] + 0.1) * numpy.identity(n_orb) - h)
+        dos[iw] -= weights[ik] * numpy.trace(g).imag / numpy.pi
+assert numpy.allclose(res[0]['dos'], dos)
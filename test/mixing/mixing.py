@@ -0,0 +1,58 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.mixing import mixing_coefficients
+
+#
+# Fixed point of a weakly nonlinear map whose Jacobian has an eigenvalue close to 1,
+# for which the linear mixing converges slowly
+#
+numpy.random.seed(0)
+n = 50
+q = numpy.linalg.qr(numpy.random.randn(n, n))[0]
+a = numpy.dot(q, numpy.dot(numpy.diag(numpy.linspace(-0.5, 0.97, n)), q.transpose()))
+b = numpy.random.randn(n)
+
+
+def func(x):
+    return numpy.dot(a, x) + 0.05 * numpy.tanh(x) + b
+
+alpha = 0.5
+n_history = 8
+iterations = {}
+for method in ['linear', 'anderson', 'broyden']:
+    x = numpy.zeros(n)
+    history = []
+    for itr in range(300):
+        history.append((x, func(x)))
+        history = history[-n_history:]
+        residuals = [x_out - x_in for x_in, x_out in history]
+        if numpy.linalg.norm(residuals[-1]) < 1.0e-8:
+            break
+        theta = mixing_coefficients(residuals, method)
+        assert numpy.allclose(numpy.sum(theta), 1.0)
+        x = numpy.zeros(n)
+        for t, (x_in, x_out) in zip(theta, history[-len(theta):]):
+            x += t * (alpha * x_out + (1.0 - alpha) * x_in)
+    iterations[method] = itr
+    print(method, itr, numpy.linalg.norm(residuals[-1]))
+
+assert iterations['anderson'] < 150
+assert iterations['broyden'] < 150
+assert iterations['linear'] == 299
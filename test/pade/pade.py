@@ -0,0 +1,50 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.applications.dcore.pade import pade_coefficients, pade_evaluate, pade_evaluate_mpi
+#
+# 2x2 Green's function with three poles (the off-diagonal elements vanish)
+#
+beta = 20.0
+poles = numpy.array([-1.0, 0.5, 2.0])
+weights = numpy.array([[0.2, 0.5], [0.3, 0.0], [0.5, 0.5]])
+
+
+def green(z):
+    g = numpy.zeros((len(z), 2, 2), numpy.complex_)
+    for e, w in zip(poles, weights):
+        g[:, 0, 0] += w[0] / (z - e)
+        g[:, 1, 1] += w[1] / (z - e)
+    return g
+
+iw = 1j * (2 * numpy.arange(10) + 1) * numpy.pi / beta
+a = pade_coefficients(iw, green(iw))
+assert a.shape == (10, 2, 2)
+#
+# The rational function is recovered exactly
+#
+omega = numpy.linspace(-3.0, 3.0, 31) + 0.05j
+g_pade = pade_evaluate(iw, a, omega)
+print(numpy.amax(numpy.abs(g_pade - green(omega))))
+assert numpy.allclose(g_pade, green(omega))
+assert numpy.all(g_pade[:, 0, 1] == 0.0)
+#
+# Distributed evaluation
+#
+assert numpy.allclose(pade_evaluate_mpi(iw, a, omega), g_pade)
@@ -0,0 +1,45 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+from pytriqs.applications.dcore.shell_scheduler import ShellScheduler
+#
+# Before the first measurement, the shells are distributed according to the number of spin-orbitals
+#
+scheduler = ShellScheduler([10, 6, 6, 4, 14])
+owner = scheduler.assign(2)
+print(owner)
+assert owner == [1, 1, 1, 1, 0]
+#
+# Every shell is solved when there are more processes than shells
+#
+assert sorted(scheduler.assign(8)) == [0, 1, 2, 3, 4]
+#
+# Shells which were not solved keep the estimated cost
+#
+scheduler.update([1.0, 0.0, 2.0, 3.0, 0.5])
+assert scheduler.costs()[1] == 8.0**6
+#
+# After all shells are measured, the measured times are used
+#
+scheduler.update([1.0, 5.0, 2.0, 3.0, 0.5])
+owner = scheduler.assign(2)
+print(owner)
+assert owner == [0, 0, 1, 1, 1]
+owner = scheduler.assign(3)
+print(owner)
+assert owner == [2, 0, 2, 1, 1]
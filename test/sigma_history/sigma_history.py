@@ -0,0 +1,46 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import os
+import numpy
+from pytriqs.applications.dcore.output_archive import OutputArchive, sigma_iterations
+
+filename = 'sigma_history.out.h5'
+params = {'control': {'restart': False}}
+sigma = [numpy.arange(4.0)]
+
+
+def run(policy, n=1):
+    """
+    Iterations of Sigma kept after 10 iterations
+    """
+    if os.path.exists(filename):
+        os.remove(filename)
+    output = OutputArchive(filename, 'dmft_out', sigma_history=policy, sigma_history_n=n)
+    output.prepare(params)
+    for itr in range(1, 11):
+        output.save_iteration(itr, 0.1, sigma)
+    iterations = sigma_iterations(output.group)
+    output.close()
+    os.remove(filename)
+    return iterations
+
+assert run('all') == list(range(1, 11))
+assert run('last', 3) == [8, 9, 10]
+assert run('every', 4) == [4, 8, 10]
+assert run('final') == [10]
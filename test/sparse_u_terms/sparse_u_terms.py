@@ -0,0 +1,84 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import numpy
+from pytriqs.operators import *
+from pytriqs.applications.dcore.dmft_core import sparse_u_terms, build_h_int
+
+
+def h_int_dense(u_mat, index_name):
+    """
+    Straightforward construction with the loops over all the n^4 elements
+    """
+    n = u_mat.shape[0]
+    ham = Operator()
+    for i1 in range(n):
+        for i2 in range(n):
+            for i3 in range(n):
+                for i4 in range(n):
+                    ham += 0.5 * u_mat[i1, i2, i3, i4] \
+                        * c_dag(*index_name[i1]) * c_dag(*index_name[i2]) * c(*index_name[i4]) * c(*index_name[i3])
+    return ham
+
+
+def is_zero(op, tol=1.0e-10):
+    return all(abs(coeff) < tol for monomial, coeff in op)
+
+
+def antisymmetrize(u_mat):
+    return 0.5 * (u_mat - u_mat.transpose(1, 0, 2, 3) - u_mat.transpose(0, 1, 3, 2) + u_mat.transpose(1, 0, 3, 2))
+
+
+numpy.random.seed(100)
+dim = 2
+n = 2 * dim
+u_random = numpy.random.rand(n, n, n, n) + 1j * numpy.random.rand(n, n, n, n)
+u_anti = antisymmetrize(u_random)
+
+index_names = {
+    'without SO': [('up', i) for i in range(dim)] + [('down', i) for i in range(dim)],
+    'with SO': [('ud', i) for i in range(n)],
+}
+
+for label, index_name in index_names.items():
+    print(label)
+    #
+    # Random antisymmetric U: one term for each pair i<j and k<l,
+    # which merges the four terms (1/2) U_{ijkl}, -(1/2) U_{jikl}, -(1/2) U_{ijlk} and (1/2) U_{jilk}
+    #
+    terms = sparse_u_terms(u_anti)
+    assert len(terms) == (n * (n - 1) // 2)**2
+    for i, j, k, l, coeff in terms:
+        assert i < j and k < l
+        assert numpy.allclose(coeff, 2 * u_anti[i, j, k, l])
+    assert is_zero(build_h_int(u_anti, index_name) - h_int_dense(u_anti, index_name))
+
+    #
+    # Only the antisymmetric part of a general U contributes
+    #
+    assert is_zero(build_h_int(u_random, index_name) - h_int_dense(u_random, index_name))
+
+    #
+    # The elements below tol are dropped
+    #
+    u_sparse = u_anti.copy()
+    u_sparse[numpy.abs(u_sparse) < 0.3] = 0.0
+    u_sparse = antisymmetrize(u_sparse)
+    n_terms = len(sparse_u_terms(u_sparse))
+    assert n_terms < len(terms)
+    assert is_zero(build_h_int(u_sparse, index_name) - h_int_dense(u_sparse, index_name))
@@ -0,0 +1,74 @@
+#
+# DCore -- Integrated DMFT software for correlated electrons
+# Copyright (C) 2017 The University of Tokyo
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from __future__ import print_function
+import time
+import numpy
+from pytriqs.applications.dcore.timing import TimerRegistry, total_timings, print_timings
+
+timer = TimerRegistry()
+#
+# A phase entered twice is accumulated
+#
+for i in range(2):
+    with timer.phase('sleep'):
+        time.sleep(0.05)
+with timer.phase('busy'):
+    x = 0.0
+    t0 = time.time()
+    while time.time() - t0 < 0.2:
+        x += 1.0
+timings = timer.summary()
+print_timings(timings)
+assert list(timings.keys()) == ['sleep', 'busy']
+assert 0.09 < timings['sleep']['wall_mean'] < 0.5
+assert timings['sleep']['cpu_mean'] < 0.05
+assert timings['busy']['cpu_mean'] > 0.1
+for stat in timings.values():
+    assert stat['wall_min'] <= stat['wall_mean'] <= stat['wall_max']
+    assert stat['peak_rss'] >= 0.0
+
+#
+# Memory is measured for each phase
+#
+with timer.phase('allocate'):
+    a = numpy.ones(200 * 1024**2 // 8)
+del a
+with timer.phase('small'):
+    b = numpy.ones(10)
+memory = timer.summary()
+print_timings(memory)
+assert memory['allocate']['peak_rss'] > memory['sleep']['peak_rss'] + 150.0
+assert memory['small']['peak_rss'] < memory['allocate']['peak_rss'] - 150.0
+
+#
+# Time is measured even if an exception is raised
+#
+timer.reset()
+try:
+    with timer.phase('error'):
+        raise RuntimeError("Error ! test")
+except RuntimeError:
+    pass
+assert list(timer.summary().keys()) == ['error']
+
+#
+# Sum over iterations sorted by the wall time
+#
+total = total_timings([timings, timings])
+assert list(total.keys()) == ['busy', 'sleep']
+assert abs(total['sleep']['wall_mean'] - 2 * timings['sleep']['wall_mean']) < 1.0e-10
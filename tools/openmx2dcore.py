@@ -19,6 +19,7 @@
 from __future__ import print_function
 import sys
 import numpy
+from pytriqs.applications.dcore.hr_reader import read_openmx_hwr
 
 
 def openmx2dcore(system_name, seedname):
@@ -36,48 +37,18 @@ def openmx2dcore(system_name, seedname):
     # Input
     #
     with open(system_name + ".HWR", 'r') as f:
-        line = f.readline()  # Skip
-        print(line, end="")
-        #
-        line = f.readline()
-        itemlist = line.split()
-        nwan = int(itemlist[4])
-        #
-        line = f.readline()
-        itemlist = line.split()
-        ncell = int(itemlist[4])
-        #
-        # Allocate
-        #
-        cell = numpy.zeros([ncell, 3], numpy.int_)
-        eqcell = numpy.zeros(ncell, numpy.int_)
-        hopping = numpy.zeros([ncell, nwan, nwan], numpy.complex_)
-        #
-        for ii in range(5):
+        for ii in range(8):
             line = f.readline()
-            print(line, end="")
-        line = f.readline()
-        itemlist = line.split()
-        efermi = float(itemlist[2])
-        efermi *= 13.60569228 * 2.0  # Hartree -> eV
-        #
-        for icell in range(ncell):
-            #
-            line = f.readline()
-            itemlist = line.split()
-            for ii in range(3):
-                cell[icell, ii] = int(itemlist[2+ii])
-            eqcell[icell] = int(itemlist[6])
-            #
+            if ii in [0, 3, 4, 5, 6, 7]:
+                print(line, end="")
+    cell, eqcell, hopping, efermi = read_openmx_hwr(system_name + ".HWR")
+    ncell, nwan = hopping.shape[0], hopping.shape[1]
+    efermi *= 13.60569228 * 2.0  # Hartree -> eV
+    hopping *= 13.60569228 * 2.0  # Hartree -> eV
+    for icell in range(ncell):
+        if cell[icell, 0] == 0 and cell[icell, 1] == 0 and cell[icell, 2] == 0:
             for iwan in range(nwan):
-                for jwan in range(nwan):
-                    line = f.readline()
-                    itemlist = line.split()
-                    hopping[icell, iwan, jwan] = float(itemlist[2]) + 1j * float(itemlist[3])
-                    hopping[icell, iwan, jwan] *= 13.60569228 * 2.0  # Hartree -> eV
-            if cell[icell, 0] == 0 and cell[icell, 1] == 0 and cell[icell, 2] == 0:
-                for iwan in range(nwan):
-                    hopping[icell, iwan, iwan] += -efermi
+                hopping[icell, iwan, iwan] += -efermi
     #
     # Output
     #
@@ -19,6 +19,7 @@
 from __future__ import print_function
 import sys
 import numpy
+from pytriqs.applications.dcore.hr_reader import read_respack
 
 
 def res2wan(name_in, name_out):
@@ -31,36 +32,11 @@ def res2wan(name_in, name_out):
         for ii in range(3):
             line = f.readline()  # Skip
             print("    "+line, end="")
-        line = f.readlines()
-    #
-    # Parse from RESPACK format
-    #
-    temp1 = [[]]
-    nr = 0
-    for iline in range(len(line)):
-        if line[iline] == "\n" or line[iline] == " \n":
-            temp1.append([])
-            nr += 1
-        else:
-            temp1[nr].append(line[iline].split())
+    irvec, hopping = read_respack(name_in)
+    nr, norb = hopping.shape[0], hopping.shape[1]
     #
     print("        Number of R : ", nr)
-    norb = int(numpy.sqrt(len(temp1[0])-1)+0.1)
     print("    Number of bands : ", norb)
-
-    irvec = numpy.zeros((nr, 3), numpy.int_)
-    hopping = numpy.zeros((nr, norb, norb), numpy.complex_)
-
-    for ir in range(nr):
-        for ii in range(3):
-            irvec[ir, ii] = int(temp1[ir][0][ii])
-
-        ii = 0
-        for iorb in range(norb):
-            for jorb in range(norb):
-                ii += 1
-                hopping[ir, int(int(temp1[ir][ii][0]))-1, int(int(temp1[ir][ii][1]))-1] = \
-                    float(temp1[ir][ii][2]) + 1.0j * float(temp1[ir][ii][3])
     #
     # Output to wannier90 format
     #